@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+pycdf-like interface to netCDF-4 (HDF5) files through netCDF4-python
+
+Only the part of the pycdf CDF and CDFVar interface that ncutil uses is
+provided, so ncutil reads and writes netCDF-4 files the same way it
+does netCDF-3 files with pycdf.  netCDF4 is imported only when a file
+is opened this way.
+
+Storage options for new files (see CDF4 and the 'nc_storage' key of
+sensor_info in config files):
+
+    format : 'NETCDF4_CLASSIC' (default) or 'NETCDF4'.  Several files
+        are read as one (netCDF4.MFDataset) only if classic.
+    zlib : True to compress variables (default False)
+    complevel : 1 to 9 (default 4)
+    shuffle : True (default) to shuffle bytes before compression
+    chunk_records : records per chunk of record variables (default 1024)
+    chunksizes : {varName : chunk shape} for any variable
+
+Example
+-------
+
+>>> nc = CDF4('b1_met_2014_02.nc', NC.WRITE|NC.CREATE|NC.TRUNC,
+...           storage={'zlib' : True, 'chunk_records' : 1440})
+
+"""
+
+import numpy
+from pycdf import NC, CDFError
+
+# numpy type of each netCDF type
+NC_DTYPES = {
+    NC.BYTE : 'i1',
+    NC.CHAR : 'S1',
+    NC.SHORT : 'i2',
+    NC.INT : 'i4',
+    NC.FLOAT : 'f4',
+    NC.DOUBLE : 'f8',
+    }
+
+def is_netcdf4(ncFile):
+    """Whether file is netCDF-4 (HDF5), which pycdf cannot open"""
+    try:
+        f = open(ncFile, 'rb')
+        magic = f.read(4)
+        f.close()
+    except IOError:
+        return False
+    return magic == '\x89HDF'
+
+def nc_type(dtype):
+    """netCDF type of numpy dtype"""
+    for typ, dt in NC_DTYPES.items():
+        if numpy.dtype(dt) == numpy.dtype(dtype):
+            return typ
+    if numpy.dtype(dtype).kind == 'S':
+        return NC.CHAR
+    return NC.DOUBLE
+
+class CDF4Dim(object):
+    """pycdf CDFDim-like dimension of CDF4 file"""
+    def __init__(self, cdf, name):
+        self._cdf = cdf
+        self._name = name
+
+    def rename(self, newname):
+        self._cdf._ds.renameDimension(self._name, newname)
+        self._name = newname
+
+    def inq_len(self):
+        return len(self._cdf._ds.dimensions[self._name])
+
+class CDF4Var(object):
+    """pycdf CDFVar-like variable of CDF4 file"""
+    def __init__(self, cdf, name):
+        object.__setattr__(self, '_cdf', cdf)
+        object.__setattr__(self, '_var', cdf._ds.variables[name])
+
+    def __getitem__(self, key):
+        try:
+            return self._var[key]
+        except (RuntimeError, IndexError), msg:
+            raise CDFError(str(msg))
+
+    def __setitem__(self, key, value):
+        try:
+            self._var[key] = value
+        except (RuntimeError, IndexError, ValueError), msg:
+            raise CDFError(str(msg))
+
+    def __getattr__(self, name):
+        try:
+            return self._var.getncattr(name)
+        except (AttributeError, KeyError, RuntimeError):
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._var.setncattr(name, value)
+
+    def attributes(self):
+        return dict([(a, self._var.getncattr(a)) for a in self._var.ncattrs()])
+
+    def dimensions(self):
+        return self._var.dimensions
+
+    def shape(self):
+        return self._var.shape
+
+    def isrecord(self):
+        ds = self._cdf._ds
+        dims = self._var.dimensions
+        return bool(dims) and ds.dimensions[dims[0]].isunlimited()
+
+    def inq_type(self):
+        return nc_type(self._var.dtype)
+
+class CDF4(object):
+    """pycdf CDF-like netCDF-4 file
+
+    :Parameters:
+        ncFile : string or tuple of strings
+            Path and name of file (tuple of names to read several
+            files as one, like pycdf CDFMF)
+
+    :Other Parameters:
+        mode : pycdf NC mode flags
+            NC.NOWRITE (default), NC.WRITE, or
+            NC.WRITE|NC.CREATE|NC.TRUNC to create new file
+        storage : dict
+            Format, compression and chunking of new file (see module
+            docstring)
+    """
+    def __init__(self, ncFile, mode=NC.NOWRITE, storage=None):
+        try:
+            import netCDF4
+        except ImportError:
+            raise CDFError('netCDF4 module needed for %s' % (ncFile,))
+        if storage is None:
+            storage = {}
+        object.__setattr__(self, '_storage', storage)
+        try:
+            if not isinstance(ncFile, str):
+                ds = netCDF4.MFDataset(list(ncFile))
+            elif mode & NC.CREATE:
+                ds = netCDF4.Dataset(ncFile, 'w', clobber=bool(mode & NC.TRUNC),
+                                     format=storage.get('format', 'NETCDF4_CLASSIC'))
+            elif mode & NC.WRITE:
+                ds = netCDF4.Dataset(ncFile, 'a')
+            else:
+                ds = netCDF4.Dataset(ncFile, 'r')
+        except (RuntimeError, IOError, ValueError), msg:
+            raise CDFError(str(msg))
+        # same as pycdf, no masked arrays or automatic scaling
+        ds.set_auto_maskandscale(False)
+        object.__setattr__(self, '_ds', ds)
+
+    def __getattr__(self, name):
+        try:
+            return self._ds.getncattr(name)
+        except (AttributeError, KeyError, RuntimeError):
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        try:
+            self._ds.setncattr(name, value)
+        except (RuntimeError, AttributeError), msg:
+            raise CDFError(str(msg))
+
+    # netCDF4 switches between define and data mode by itself
+    def automode(self):
+        pass
+
+    def definemode(self):
+        pass
+
+    def datamode(self):
+        pass
+
+    def close(self):
+        self._ds.close()
+
+    def attributes(self):
+        return dict([(a, self._ds.getncattr(a)) for a in self._ds.ncattrs()])
+
+    def def_dim(self, name, length):
+        # pycdf NC.UNLIMITED is 0
+        if length == NC.UNLIMITED:
+            length = None
+        self._ds.createDimension(name, length)
+        return CDF4Dim(self, name)
+
+    def def_var(self, name, typ, dims):
+        """Define variable with chunking and compression of storage"""
+        storage = self._storage
+        kwargs = {}
+        if storage.get('zlib', False):
+            kwargs['zlib'] = True
+            kwargs['complevel'] = storage.get('complevel', 4)
+            kwargs['shuffle'] = storage.get('shuffle', True)
+        dims = tuple(dims)
+        chunksizes = storage.get('chunksizes', {}).get(name)
+        if chunksizes is None and dims and \
+               self._ds.dimensions[dims[0]].isunlimited():
+            # chunk record variables along time, whole extent of other dims
+            chunksizes = (storage.get('chunk_records', 1024),) + \
+                         tuple([len(self._ds.dimensions[d]) for d in dims[1:]])
+        if chunksizes is not None:
+            kwargs['chunksizes'] = tuple(chunksizes)
+        try:
+            self._ds.createVariable(name, NC_DTYPES[typ], dims, **kwargs)
+        except (RuntimeError, ValueError), msg:
+            raise CDFError(str(msg))
+        return CDF4Var(self, name)
+
+    def var(self, name):
+        try:
+            return CDF4Var(self, name)
+        except KeyError:
+            raise CDFError('no variable %s' % (name,))
+
+    def dim(self, name):
+        return CDF4Dim(self, name)
+
+    def variables(self):
+        """{varName : (dimNames, shape, type, index)} as from pycdf"""
+        ncvars = {}
+        for idx, (name, v) in enumerate(self._ds.variables.items()):
+            ncvars[name] = (v.dimensions, v.shape, nc_type(v.dtype), idx)
+        return ncvars
+
+    def dimensions(self, full=0):
+        """{dimName : length} or, if full, {dimName : (length, index, isUnlimited)}"""
+        ncdims = {}
+        for idx, (name, d) in enumerate(self._ds.dimensions.items()):
+            if full:
+                ncdims[name] = (len(d), idx, d.isunlimited())
+            else:
+                ncdims[name] = len(d)
+        return ncdims
+
+    def inq_unlimlen(self):
+        for d in self._ds.dimensions.values():
+            if d.isunlimited():
+                return len(d)
+        return -1
@@ -5,10 +5,50 @@ Create, update and load utilities for netcdf files
 """
 
 from pycdf import *
+from nc4compat import CDF4, CDF4Var, is_netcdf4
 import os
 import numpy
 
-def nc_create(ncFile, (global_atts, var_atts, dim_inits, var_inits, var_data)):
+# numpy type of each netCDF type so arrays are cast once and handed
+# to pycdf as contiguous buffers (no nested list copy)
+NC_NUMPY_TYPES = {
+    NC.BYTE : 'int8',
+    NC.SHORT : 'int16',
+    NC.INT : 'int32',
+    NC.FLOAT : 'float32',
+    NC.DOUBLE : 'float64',
+    }
+
+def nc_array(ncvar, varData):
+    """Array of varData as type of ncvar, ready to write
+
+    If pycdf was not built with numpy, fall back to nested lists.
+    """
+    if not isinstance(ncvar, CDF4Var) and pycdfArrayPkg() != 'numpy':
+        return varData.tolist()
+    dtype = NC_NUMPY_TYPES.get(ncvar.inq_type())
+    return numpy.ascontiguousarray(varData, dtype=dtype)
+
+def nc_open(ncFile, mode=NC.NOWRITE, storage=None):
+    """
+    Open netcdf file with pycdf, or netCDF4 for netCDF-4 (HDF5)
+
+    :Parameters:
+        ncFile : string
+           Path and name of file
+
+    :Other Parameters:
+        mode : pycdf NC mode flags
+           By default NC.NOWRITE
+        storage : dict
+           If given, file is netCDF-4 with this format, chunking and
+           compression (see nc4compat).  Used when creating file.
+    """
+    if storage or is_netcdf4(ncFile):
+        return CDF4(ncFile, mode, storage)
+    return CDF(ncFile, mode)
+
+def nc_create(ncFile, (global_atts, var_atts, dim_inits, var_inits, var_data), storage=None):
     """
     Create new netcdf file
 
@@ -18,10 +58,15 @@ def nc_create(ncFile, (global_atts, var_atts, dim_inits, var_inits, var_data)):
         (global_atts, var_atts, dim_inits, var_inits, var_data) : tuple
            Global Attributes, Variable Attributes, Dimensions, Variable Dimensions, and Data 
            Everything you need to create a netCDF file.
+
+    :Other Parameters:
+        storage : dict
+           Create netCDF-4 file with this chunking and compression
+           (see nc4compat), otherwise netCDF-3 with pycdf
     """
     try:
         # Open new netCDF file, overwrite if it exists, create if does not
-        nc = CDF(ncFile, NC.WRITE|NC.CREATE|NC.TRUNC)
+        nc = nc_open(ncFile, NC.WRITE|NC.CREATE|NC.TRUNC, storage)
         # Automatically set define and data modes.
         nc.automode()
         #
@@ -57,9 +102,9 @@ def nc_create(ncFile, (global_atts, var_atts, dim_inits, var_inits, var_data)):
             if type(varData) == numpy.ndarray:
                 if ncvar.isrecord():
                     # time, ens, u, v
-                    ncvar[nrecs:nrecs+len(varData)] = varData.tolist()
+                    ncvar[nrecs:nrecs+len(varData)] = nc_array(ncvar, varData)
                 else:
-                    ncvar[:] = varData.tolist() # z
+                    ncvar[:] = nc_array(ncvar, varData) # z
             else:
                 # if tuple, sequence or scalar
                 ncvar[:] = varData
@@ -84,7 +129,7 @@ def nc_update(ncFile, (global_atts, var_atts, var_data)):
     """
     try:
         # Open netCDF in write mode
-        nc = CDF(ncFile, NC.WRITE)
+        nc = nc_open(ncFile, NC.WRITE)
         # Automatically set define and data modes.
         nc.automode()
         #
@@ -110,9 +155,9 @@ def nc_update(ncFile, (global_atts, var_atts, var_data)):
             if type(varData) == numpy.ndarray:
                 if ncvar.isrecord():
                     # time, ens, u, v (with unlimited dimension)
-                    ncvar[nrecs:nrecs+len(varData)] = varData.tolist()
+                    ncvar[nrecs:nrecs+len(varData)] = nc_array(ncvar, varData)
                 else:
-                    ncvar[:] = varData.tolist() # z (limited dimension)
+                    ncvar[:] = nc_array(ncvar, varData) # z (limited dimension)
             else:
                 # if tuple, sequence or scalar
                 ncvar[:] = varData
@@ -127,7 +172,7 @@ def nc_update(ncFile, (global_atts, var_atts, var_data)):
 def nc_get_time(ncFile):
     """Get time array from file """
     try:
-        nc = CDF(ncFile)
+        nc = nc_open(ncFile)
         ncvars = nc.variables()
         if 'time' in ncvars.keys():
             es = nc.var('time')[:]
@@ -139,11 +184,61 @@ def nc_get_time(ncFile):
     except CDFError, msg:
         print "CDFError:", msg
 
+def nc_get_last_time(ncFile, cache=True):
+    """Get last time value from file without reading whole time array
+
+    Only the final record of time is read.  If cache, the result is
+    also kept in a sidecar file (.<ncFile>.last) which is used as long
+    as size and mtime of ncFile do not change.
+
+    :Returns:
+        (es, units) : tuple
+           Last time as int (None if no records, no time variable or
+           file cannot be read) and its units (None if no time variable)
+    """
+    es = units = None
+    cfn = os.path.join(os.path.dirname(ncFile), '.%s.last' % os.path.basename(ncFile))
+    st = os.stat(ncFile)
+    if cache and os.path.exists(cfn):
+        try:
+            f = open(cfn, 'r')
+            (size, mtime, es, units) = f.read().rstrip('\n').split(' ', 3)
+            f.close()
+            if (int(size), float(mtime)) == (st.st_size, st.st_mtime):
+                if es == 'None':
+                    return (None, units)
+                return (int(float(es)), units)
+        except (IOError, ValueError):
+            pass
+        es = units = None
+    try:
+        nc = nc_open(ncFile)
+        ncvars = nc.variables()
+        if 'time' in ncvars.keys():
+            var = nc.var('time')
+            n = var.shape()[0]
+            if n > 0:
+                es = int(var[n-1:n][0])
+            units = var.units
+        else:
+            print "time variable not found in ", ncFile
+        nc.close()
+    except CDFError, msg:
+        print "CDFError:", msg
+        return (None, None)
+    if cache and units is not None:
+        try:
+            f = open(cfn, 'w')
+            f.write('%d %r %r %s\n' % (st.st_size, st.st_mtime, es, units))
+            f.close()
+        except IOError:
+            pass
+    return (es, units)
                     
 def nc_find_record_vars(ncFile):
     """Find which variable are record variables"""
     try:
-        nc = CDF(ncFile)
+        nc = nc_open(ncFile)
         ncvars = nc.variables()
         # list which variables is a record variable
         var_list = [varName for varName in ncvars.keys() if nc.var(varName).isrecord()]
@@ -153,6 +248,19 @@ def nc_find_record_vars(ncFile):
         print "CDFError:", msg
                     
 
+def nc_var_names(ncFile):
+    """Names of variables in file
+
+    Unlike the other getters, an error opening the file (CDFError) is
+    raised, not printed.
+    """
+    nc = nc_open(ncFile)
+    try:
+        names = nc.variables().keys()
+    finally:
+        nc.close()
+    return names
+
 def nc_replace_fillvalue(ncFile, newfillvalue=-99999.0):
     """
     Replaces any occurrence of old _FillValue with new one
@@ -171,7 +279,7 @@ def nc_replace_fillvalue(ncFile, newfillvalue=-99999.0):
     
     """
     try:
-        nc = CDF(ncFile, NC.WRITE)
+        nc = nc_open(ncFile, NC.WRITE)
         nc.automode()
         oldfillvalue = nc._FillValue
         nc._FillValue = newfillvalue
@@ -191,7 +299,7 @@ def nc_replace_fillvalue(ncFile, newfillvalue=-99999.0):
 def nc_rename_dimension(ncFile, oldname, newname):
     """ Rename dimension name """
     try:
-        nc = CDF(ncFile, NC.WRITE)
+        nc = nc_open(ncFile, NC.WRITE)
         nc.definemode()
         for d in nc.dimensions().keys():
             if d==oldname: nc.dim(d).rename(newname)
@@ -205,7 +313,7 @@ def nc_file_check(fns):
     If it is not, remove a file or files from the list"""
     if isinstance(fns, str):
         try:
-            nc = CDF(fns)
+            nc = nc_open(fns)
             nc.close()
             new_fns = fns
         except CDFError, msg:
@@ -216,7 +324,7 @@ def nc_file_check(fns):
         new_fns = []
         for fn in fns:
             try:
-                nc = CDF(fn)
+                nc = nc_open(fn)
                 nc.close()
                 new_fns.append(fn)
             except CDFError, msg:
@@ -226,7 +334,7 @@ def nc_file_check(fns):
     
 
 def nc_load(ncFile, varsLoad='all', nameType='variable_name',
-            ga_flag=True, va_flag=True):
+            ga_flag=True, va_flag=True, recs=None):
     """
     Load netcdf file
 
@@ -249,6 +357,9 @@ def nc_load(ncFile, varsLoad='all', nameType='variable_name',
             By default, load the global file attributes
         va_flag : boolean flag
             By default, load the variable file attributes
+        recs : slice
+            Records to load of record variables (e.g. last two days).
+            By default, all records.
             
     :Returns:
         (global_atts, var_atts, dim_inits, var_inits, var_data) : tuple
@@ -260,10 +371,14 @@ def nc_load(ncFile, varsLoad='all', nameType='variable_name',
     try:
         if isinstance(ncFile, str):
             # if only one file and it is a string
-            nc = CDF(ncFile)
+            nc = nc_open(ncFile)
         else:
             # if multiple filenames 
-            nc = CDFMF(tuple(set(ncFile)))
+            fns = tuple(set(ncFile))
+            if [fn for fn in fns if is_netcdf4(fn)]:
+                nc = CDF4(fns)
+            else:
+                nc = CDFMF(fns)
 
         ncdims = nc.dimensions(full=1)
         ncvars = nc.variables()
@@ -317,7 +432,11 @@ def nc_load(ncFile, varsLoad='all', nameType='variable_name',
         if len(ncvars)>0:
             for varName in varNames:
                 val,shape,typ,idx = ncvars[varName]
-                var_data[idx] = (varName, nc.var(varName)[:])
+                ncvar = nc.var(varName)
+                if recs is not None and ncvar.isrecord():
+                    var_data[idx] = (varName, ncvar[recs])
+                else:
+                    var_data[idx] = (varName, ncvar[:])
 
         var_data = [v for v in var_data if v != None]
 
@@ -34,6 +34,10 @@ from raw2proc import *
 from procutil import *
 from ncutil import *
 
+# z is the bin depth, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('z',)
+
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
@@ -63,44 +67,35 @@ def parser(platform_info, sensor_info, lines):
 
     """
     import numpy
-    from datetime import datetime
-    from time import strptime
-
-    # get sample datetime from filename
-    fn = sensor_info['fn']
-    sample_dt_start = filt_datetime(fn)[0]
-
-    # how many profiles in one file, count number of "Profile Time:" in lines
-    nprof = 0
-    for line in lines:
-        m=re.search("Profile Time:", line)
-        if m:
-            nprof=nprof+1
-
-    # remove first occurrence of blank line if within first 10-40 lines
-    # and put it on the end to signal end of profile after last profile
-    for i in range(len(lines[0:40])):
-        if re.search("^ \r\n", lines[i]):
-            # print str(i) + " " + lines[i] + " " + lines[i+1]
-            blank_line = lines.pop(i)
-            lines.append(blank_line)
-    
+
     bin_size = sensor_info['bin_size'] # Bin Size (meters)
     nominal_depth = platform_info['water_depth']  # Mean sea level at station (meters) or nominal water depth
     z = numpy.arange(0, -1*nominal_depth, -1*bin_size, dtype=float)
     
-    N = nprof
     nbins = len(z)
 
     if nbins != sensor_info['nbins']:
         print 'Number of bins computed from water_depth and bin_size ('+ \
               str(nbins)+') does not match config number ('+ \
               str(sensor_info['nbins'])+')'
-    
+
+    # one pass over lines, only casts with profile date, time and depth
+    headers = []
+    blocks = []
+    for (header, block) in avp_casts(lines, 14):
+        es = avp_profile_es(header, sensor_info['utc_offset'])
+        if 'profile depth' not in header or es < 0:
+            print 'skipping profile, ill-formed header ... ' + str(header)
+            continue
+        header['es'] = es
+        headers.append(header)
+        blocks.append(block)
+
+    N = len(headers)
+
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
         'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
-        'z' : numpy.array(numpy.ones((nbins,), dtype=float)*numpy.nan),
+        'z' : z,
         #
         'wd' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
         'wtemp' : numpy.array(numpy.ones((N,nbins), dtype=float)*numpy.nan),
@@ -112,88 +107,38 @@ def parser(platform_info, sensor_info, lines):
         'do' : numpy.array(numpy.ones((N,nbins), dtype=float)*numpy.nan),
         }
 
-    # current profile count
-    i = 0 
-
-    for line in lines:
-        ysi = []
-        # split line and parse float and integers
-        sw = re.split('[\s/\:]*', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                ysi.append(float(m.groups()[0]))
-
-        if re.search("Profile Time:", line):
-            HH=ysi[0]
-            MM=ysi[1]
-            SS=ysi[2]
-        elif re.search("Profile Date:", line):
-            mm=ysi[0]
-            dd=ysi[1]
-            yyyy=ysi[2]
-        elif re.search("Profile Depth:", line):
-            wd = ysi[0]/100.  # cm to meters
-            sample_str = '%02d-%02d-%4d %02d:%02d:%02d' % (mm,dd,yyyy,HH,MM,SS)
-            if  sensor_info['utc_offset']:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S') + \
-                             timedelta(hours=sensor_info['utc_offset'])
-            else:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S')
-
-            # initialize for new profile at zero for averaging samples within each bin
-            wtemp = numpy.zeros(nbins)
-            cond = numpy.zeros(nbins)
-            salin = numpy.zeros(nbins)
-            turb = numpy.zeros(nbins)
-            ph = numpy.zeros(nbins)
-            chl = numpy.zeros(nbins)
-            do = numpy.zeros(nbins)
-            Ns = numpy.zeros(nbins) # count samples per bin for averaging
-        elif len(ysi)==14:                                                                             
-            # get sample datetime from data
-            # sample_str = '%02d-%02d-%2d %02d:%02d:%02d' % tuple(ysi[0:6])
-            # if  sensor_info['utc_offset']:
-            #     sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S') + \
-            #                 timedelta(hours=sensor_info['utc_offset'])
-            # else:
-            # sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%y %H:%M:%S')
-
-            depth = -1*ysi[9] # depth (m, positive up)
-            ibin = ((z)<=depth)*(depth<(z+bin_size))
-
-            Ns[ibin] = Ns[ibin]+1
-            wtemp[ibin] = wtemp[ibin]+ysi[6] # water temperature (C)
-            cond[ibin] = cond[ibin]+ysi[7]   # conductivity (mS/cm)
-            salin[ibin] = salin[ibin]+ysi[8] # salinity (ppt or PSU??)
-            #
-            ph[ibin] = ph[ibin]+ysi[10]      # ph
-            turb[ibin] = turb[ibin]+ysi[11]  # turbidity (NTU)
-            chl[ibin] = chl[ibin]+ysi[12]    # chlorophyll (ug/l)
-            do[ibin] = do[ibin]+ysi[13]      # dissolved oxygen (mg/l)
-
-        elif (len(ysi)==0):  # each profile separated by empty line
-            # average summations by sample count per bin
-            # where count is zero make it NaN so average is not divide by zero
-            Ns[Ns==0]=numpy.nan*Ns[Ns==0]
-            
-            data['dt'][i] = sample_dt # sample datetime
-            data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-            data['wd'][i] = wd
-            data['z'] = z
-            # divide by counts 
-            data['wtemp'][i] =  wtemp/Ns
-            data['cond'][i] = cond/Ns
-            data['salin'][i] = salin/Ns
-            data['turb'][i] = turb/Ns
-            data['ph'][i] = ph/Ns
-            data['chl'][i] = chl/Ns
-            data['do'][i] = do/Ns
-            
-            i=i+1
-            
-        # if-elif
-    # for line
+    for (i, header) in enumerate(headers):
+        data['time'][i] = header['es'] # profile time in epoch seconds
+        data['wd'][i] = (avp_numbers(header['profile depth']) + [numpy.nan])[0]/100.  # cm to meters
+
+    if not N:
+        return data
+
+    # samples of all profiles at once as (profile, sample) arrays, every
+    # sample binned whatever its date stamp (see avp_samples() for that)
+    ysi = numpy.concatenate(blocks)
+    i = numpy.repeat(numpy.arange(N), [len(b) for b in blocks])
+    j = numpy.arange(len(i)) - numpy.searchsorted(i, i)
+    nsamp = len(j) and j.max()+1 or 0
+    depth = numpy.ones((N, nsamp), dtype=float)*numpy.nan
+    depth[i,j] = -1*ysi[:,9] # depth (m, positive up)
+    values = {}
+    for (name, col) in (('wtemp', 6),  # water temperature (C)
+                        ('cond', 7),   # conductivity (mS/cm)
+                        ('salin', 8),  # salinity (ppt or PSU??)
+                        ('ph', 10),    # ph
+                        ('turb', 11),  # turbidity (NTU)
+                        ('chl', 12),   # chlorophyll (ug/l)
+                        ('do', 13)):   # dissolved oxygen (mg/l)
+        values[name] = numpy.ones((N, nsamp), dtype=float)*numpy.nan
+        values[name][i,j] = ysi[:,col]
+
+    # average samples within each bin, z <= depth < z+bin_size
+    # (increasing edges, so bins come out bottom first)
+    edges = numpy.append(z[::-1], z[0]+bin_size)
+    (zbin, grid) = bin_profiles(depth, values, edges)
+    for name in grid:
+        data[name] = grid[name][0][:,::-1]
 
     return data
  
@@ -226,9 +171,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -373,7 +318,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -20,7 +20,8 @@ updator : z, stime, (time, water_depth), water_temp, cond, salin, ph,
           turb, chl, do
 
 using fixed profiler CDL but modified to have raw data for each cast
-along each column
+along each column, plus mean, count and std of each cast gridded
+into depth bins (zbin)
 
 
 Examples
@@ -43,6 +44,9 @@ from raw2proc import *
 from procutil import *
 from ncutil import *
 
+# variables also gridded into depth bins (see procutil.bin_profiles())
+GRID_VARS = ('wtemp', 'cond', 'salin', 'turb', 'ph', 'chl', 'do')
+
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
@@ -82,43 +86,32 @@ def parser(platform_info, sensor_info, lines):
     images, I bin the data every 10 cm and take the average of however
     many observations fell within that bin.'
 
+3.  So each param of GRID_VARS is also gridded into regular depth
+    bins (every bin_size of sensor_info, or its bin_edges) as
+    param_mean, param_n and param_std along zbin (see
+    procutil.bin_profiles()).
+
     """
     import numpy
-    from datetime import datetime
-    from time import strptime
-
-    # get sample datetime from filename
-    fn = sensor_info['fn']
-    sample_dt_start = filt_datetime(fn)
-
-    # how many profiles in one file, count number of "Profile Time:" in lines
-    nprof = 0
-    for line in lines:
-        m=re.search("Profile Time:", line)
-        if m:
-            nprof=nprof+1
-
-    # remove first occurrence of blank line if within first 40 lines
-    for i in range(len(lines[0:40])):
-       if re.search("^ \r\n", lines[i]):
-           # print str(i) + " " + lines[i] + " " + lines[i+1]
-           blank_line = lines.pop(i)
-           # lines.append(blank_line)
-
-    # ensure signal end of profile after last profile by appending a blank line to data file
-    lines.append(' \r\n')
-    
-    # ensure blank line between profile casts
-    for i, line in enumerate(lines):
-        if re.search(r"Profile Time", line, re.IGNORECASE):
-            if not re.search("^ \r\n", lines[i-1]):
-                lines.insert(i, " \r\n")
-    
-    N = nprof
+
     nbins = sensor_info['nbins']
 
+    # one pass over lines, only casts with all the header stuff
+    headers = []
+    blocks = []
+    for (header, block) in avp_casts(lines, 14):
+        have_head = 'profile depth' in header and 'profile location' in header
+        es = avp_profile_es(header, sensor_info['utc_offset'])
+        if not have_head or es < 0:
+            print 'skipping profile, ill-formed header ... ' + str(header)
+            continue
+        header['es'] = es
+        headers.append(header)
+        blocks.append(block)
+
+    N = len(headers)
+
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
         'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
         'z' : numpy.array(numpy.ones((N,nbins), dtype=float)*numpy.nan),
         #
@@ -137,131 +130,38 @@ def parser(platform_info, sensor_info, lines):
         'do' : numpy.array(numpy.ones((N,nbins), dtype=float)*numpy.nan),
         }
 
-    # current profile count
-    i = 0
-    have_date = have_time = have_wd = have_location = have_head = False
-
-    for line in lines:
-        # if line has weird ascii chars -- skip it and iterate to next line
-        if re.search(r"[\x1a]", line):
-            # print 'skipping bad data line ... ' + str(line)
-            continue
-            
-        ysi = []
-        # split line and parse float and integers
-        sw = re.split('[\s/\:]*', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                ysi.append(float(m.groups()[0]))
-
-        if re.search("Profile Time:", line):
-            have_time = True
-            HH=ysi[0]
-            MM=ysi[1]
-            SS=ysi[2]
-        elif re.search("Profile Date:", line):
-            have_date = True
-            mm=ysi[0]
-            dd=ysi[1]
-            yyyy=ysi[2]
-        elif re.search("Profile Depth:", line):
-            have_wd = True
-            wd = ysi[0]/100.  # cm to meters
-            profile_str = '%02d-%02d-%4d %02d:%02d:%02d' % (mm,dd,yyyy,HH,MM,SS)
-            if  sensor_info['utc_offset']:
-                profile_dt = scanf_datetime(profile_str, fmt='%m-%d-%Y %H:%M:%S') + \
-                             timedelta(hours=sensor_info['utc_offset'])
-            else:
-                profile_dt = scanf_datetime(profile_str, fmt='%m-%d-%Y %H:%M:%S')
-        elif re.search("Profile Location:", line):
-            have_location = True
-            # Profile Location: Stones Bay Serial No: 00016B79, ID: AVP1_SERDP
-            sw = re.findall(r'\w+:\s(\w+)*', line)
-            # ysi_sn = sw[1]
-            # ysi_id = sw[2]
-            # initialize for new profile at zero for averaging samples within each bin
-            wtemp = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            depth =numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            cond = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            salin = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            turb = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            ph = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            chl = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            do = numpy.array(numpy.ones(nbins,), dtype=float)*numpy.nan
-            stime = numpy.array(numpy.ones(nbins,), dtype=long)*numpy.nan
-            # keep track of number of samples in one profile so not to exceed nbins
-            j = 0
-            # have all the headers stuff
-            head = numpy.array([have_date, have_time, have_wd, have_location])
-            have_head = head.all()
-
-        elif (len(ysi)==14 and have_head):
-            if j>=nbins:
-                print 'Sample number (' + str(j) + \
-                      ') in profile exceeds maximum value ('+ \
-                      str(nbins) + ') in config'
-        
-            # get sample datetime from data
-            sample_str = '%02d-%02d-%02d %02d:%02d:%02d' % tuple(ysi[0:6])
-            # month, day, year
-            try:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%y %H:%M:%S')
-            except ValueError:
-                # day, month, year (month and day switched in some cases)
-                try:
-                    sample_dt = scanf_datetime(sample_str, fmt='%d-%m-%y %H:%M:%S')
-                except:
-                    sample_dt = datetime(1970,1,1)
-
-            if sample_dt is not None:
-                if sensor_info['utc_offset']:
-                    sample_dt = sample_dt + timedelta(hours=sensor_info['utc_offset'])
-                #
-                if j<nbins:
-                    stime[j] = dt2es(sample_dt) # sample time
-                    wtemp[j] = ysi[6] # water temperature (C)
-                    cond[j] = ysi[7]  # conductivity (mS/cm)
-                    salin[j] = ysi[8] # salinity (ppt or PSU??)
-                    #
-                    depth[j] = ysi[9] # depth (m, positive up)
-                    #
-                    ph[j] = ysi[10]   # ph
-                    turb[j] = ysi[11] # turbidity (NTU)
-                    chl[j] = ysi[12]  # chlorophyll (ug/l)
-                    do[j] = ysi[13]   # dissolved oxygen (mg/l)
-                    #
-                    j = j+1
-            else:
-                print 'skipping line, ill-formed date ... ' + str(line)
-
-
-        elif (len(ysi)==0 and have_head and i<N):  # each profile separated by empty line
-            
-            data['dt'][i] = profile_dt # profile datetime
-            data['time'][i] = dt2es(profile_dt) # profile time in epoch seconds
-            data['wd'][i] = -1.*wd
-            data['wl'][i] = platform_info['mean_water_depth'] - (-1*wd)
-            # data['ysi_sn'][i] = ysi_sn
-            # data['ysi_id'][i] = ysi_id
-
-            data['stime'][i] =  stime # sample time in epoch seconds
-            data['z'][i] = -1.*depth
-
-            data['wtemp'][i] =  wtemp
-            data['cond'][i] = cond
-            data['salin'][i] = salin
-            data['turb'][i] = turb
-            data['ph'][i] = ph
-            data['chl'][i] = chl
-            data['do'][i] = do
-            
-            i=i+1
-            have_date = have_time = have_wd = have_location = False
-        else:
-            print 'skipping bad data line ... ' + str(line)
-        # if-elif
-    # for line
+    for (i, header) in enumerate(headers):
+        # Profile Location: Stones Bay Serial No: 00016B79, ID: AVP1_SERDP
+        # sw = re.findall(r'\w+:\s(\w+)*', header['profile location'])
+        # ysi_sn = sw[0]
+        # ysi_id = sw[1]
+        wd = (avp_numbers(header['profile depth']) + [numpy.nan])[0]/100.  # cm to meters
+        data['time'][i] = header['es'] # profile time in epoch seconds
+        data['wd'][i] = -1.*wd
+        data['wl'][i] = platform_info['mean_water_depth'] - (-1*wd)
+
+    # samples of all profiles at once, month and day switched in some cases
+    (i, j, stime, ysi) = avp_samples(blocks, 14, nbins, sensor_info['utc_offset'], dmy=True)
+
+    data['stime'][i,j] = stime    # sample time in epoch seconds
+    data['wtemp'][i,j] = ysi[:,6] # water temperature (C)
+    data['cond'][i,j] = ysi[:,7]  # conductivity (mS/cm)
+    data['salin'][i,j] = ysi[:,8] # salinity (ppt or PSU??)
+    #
+    data['z'][i,j] = -1.*ysi[:,9] # depth (m, positive up)
+    #
+    data['ph'][i,j] = ysi[:,10]   # ph
+    data['turb'][i,j] = ysi[:,11] # turbidity (NTU)
+    data['chl'][i,j] = ysi[:,12]  # chlorophyll (ug/l)
+    data['do'][i,j] = ysi[:,13]   # dissolved oxygen (mg/l)
+
+    # regularly gridded profiles, mean, count and std of samples in each bin
+    # (bin centers from config, not data, see creator)
+    edges = depth_bins(sensor_info, platform_info.get('mean_water_depth'))
+    values = dict([(name, data[name]) for name in GRID_VARS])
+    (zbin, grid) = bin_profiles(data['z'], values, edges)
+    for name in GRID_VARS:
+        (data[name+'_mean'], data[name+'_n'], data[name+'_std']) = grid[name]
 
     return data
  
@@ -270,7 +170,6 @@ def creator(platform_info, sensor_info, data):
     #
     # subset data only to month being processed (see raw2proc.process())
     i = data['in']
-    dt = data['dt'][i]
     # 
     title_str = sensor_info['description']+' at '+ platform_info['location']
     global_atts = { 
@@ -297,9 +196,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : dt[0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : dt[-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -411,12 +310,38 @@ def creator(platform_info, sensor_info, data):
                         },
         }
 
+    # gridded profiles
+    edges = depth_bins(sensor_info, platform_info.get('mean_water_depth'))
+    zbin = (edges[:-1]+edges[1:])/2.
+    var_atts['zbin'] = {'short_name': 'zbin',
+                        'long_name': 'Height of Bin Center',
+                        'standard_name': 'height',
+                        'reference':'zero at sea-surface',
+                        'positive' : 'up',
+                        'units': 'm',
+                        'axis': 'Z',
+                        }
+    for name in GRID_VARS:
+        atts = var_atts[name]
+        var_atts[name+'_mean'] = dict(atts, short_name=name+'_mean',
+                                      long_name=atts['long_name']+' Bin Mean',
+                                      cell_methods='zbin: mean')
+        var_atts[name+'_n'] = {'short_name': name+'_n',
+                               'long_name': 'Number of '+atts['long_name']+' Samples in Bin',
+                               'standard_name': 'number_of_observations',
+                               'units': '1',
+                               }
+        var_atts[name+'_std'] = dict(atts, short_name=name+'_std',
+                                     long_name=atts['long_name']+' Bin Standard Deviation',
+                                     cell_methods='zbin: standard_deviation')
+
     # dimension names use tuple so order of initialization is maintained
     dim_inits = (
         ('time', NC.UNLIMITED),
         ('lat', 1),
         ('lon', 1),
         ('z', sensor_info['nbins']),
+        ('zbin', len(zbin)),
         )
     
     # using tuple of tuples so order of initialization is maintained
@@ -442,7 +367,14 @@ def creator(platform_info, sensor_info, data):
         ('ph', NC.FLOAT, ('time', 'z')),
         ('chl', NC.FLOAT, ('time', 'z')),
         ('do', NC.FLOAT, ('time', 'z')),
+        ('zbin', NC.FLOAT, ('zbin',)),
         )
+    for name in GRID_VARS:
+        var_inits = var_inits + (
+            (name+'_mean', NC.FLOAT, ('time', 'zbin')),
+            (name+'_n', NC.INT, ('time', 'zbin')),
+            (name+'_std', NC.FLOAT, ('time', 'zbin')),
+            )
 
     # var data 
     var_data = (
@@ -463,7 +395,15 @@ def creator(platform_info, sensor_info, data):
         ('ph', data['ph'][i]),
         ('chl', data['chl'][i]),
         ('do', data['do'][i]),
+        ('zbin', zbin),
         )
+    # gridded profiles
+    for name in GRID_VARS:
+        var_data = var_data + (
+            (name+'_mean', data[name+'_mean'][i]),
+            (name+'_n', data[name+'_n'][i]),
+            (name+'_std', data[name+'_std'][i]),
+            )
 
     return (global_atts, var_atts, dim_inits, var_inits, var_data)
 
@@ -471,12 +411,11 @@ def updater(platform_info, sensor_info, data):
     #
     # subset data only to month being processed (see raw2proc.process())
     i = data['in']
-    dt = data['dt'][i]
     #
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : dt[-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -512,6 +451,14 @@ def updater(platform_info, sensor_info, data):
         ('chl', data['chl'][i]),
         ('do', data['do'][i]),
         )
+    # gridded profiles (left out of a file created before they were
+    # added, see raw2proc.write_records())
+    for name in GRID_VARS:
+        var_data = var_data + (
+            (name+'_mean', data[name+'_mean'][i]),
+            (name+'_n', data[name+'_n'][i]),
+            (name+'_std', data[name+'_std'][i]),
+            )
 
     return (global_atts, var_atts, var_data)
 #
@@ -72,28 +72,20 @@ def parser(platform_info, sensor_info, lines):
 
     """
     import numpy
-    from datetime import datetime
-    from time import strptime
-
-    # get sample datetime from filename
-    fn = sensor_info['fn']
-    sample_dt_start = filt_datetime(fn)
-
-    # how many samples
-    nsamp = 0
-    for line in lines:
-        # if line has weird ascii chars -- skip it and iterate to next line
-        if re.search(r"[\x1a]", line):
-            # print 'skipping bad data line ... ' + str(line)
-            continue
-        m=re.search("^\d{2}\/\d{2}\/\d{2}", line)
-        if m:
-            nsamp=nsamp+1
-
-    N = nsamp
+
+    # one pass over lines, every sample is a record
+    headers = []
+    blocks = []
+    for (header, block) in avp_casts(lines, 14):
+        headers.append(header)
+        blocks.append(block)
+
+    # samples of all profiles at once, month and day switched in some cases
+    (icast, j, stime, ysi) = avp_samples(blocks, 14, dmy=True)
+
+    N = len(stime)
 
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
         'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
         'z' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
         'wd' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
@@ -108,99 +100,34 @@ def parser(platform_info, sensor_info, lines):
         'do' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # setting all dates to this old data so eliminated for this month
-    for i in range(N):
-        data['dt'][i] = datetime(1970,1,1)
-
-    # sample count
-    i = 0
-
-    for line in lines:
-        # if line has weird ascii chars -- skip it and iterate to next line
-        if re.search(r"[\x1a]", line):
-            # print 'skipping bad data line ... ' + str(line)
-            continue
-
-        ysi = []
-        # split line and parse float and integers
-        sw = re.split('[\s/\:]*', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                ysi.append(float(m.groups()[0]))
-
-        if re.search("Profile Depth:", line) and i<N:
-            sw = re.match("Profile Depth: " + REAL_RE_STR + "(\\w+)", line)
-            if (ysi[0] is not None) and (sw is not None):
-                unit_str = sw.groups()[-1]
-                if unit_str is not None:
-                    (wd, unit_str) = udconvert(ysi[0], unit_str, 'm') # to meters
-                else:
+    data['time'][:] = stime          # sample time in epoch seconds
+    data['wtemp'][:] = ysi[:,6]      # water temperature (C)
+    data['cond'][:] = ysi[:,7]       # conductivity (mS/cm)
+    data['salin'][:] = ysi[:,8]      # salinity (ppt or PSU??)
+    data['z'][:] = -1*ysi[:,9]       # depth (m) relative to surface
+    #
+    data['ph'][:] = ysi[:,10]        # ph
+    data['turb'][:] = ysi[:,11]      # turbidity (NTU)
+    data['chl'][:] = ysi[:,12]       # chlorophyll (ug/l)
+    data['do'][:] = ysi[:,13]        # dissolved oxygen (ug/l)
+
+    # water depth and battery of each profile go with its first sample
+    for k in numpy.flatnonzero(j==0):
+        header = headers[icast[k]]
+        if 'profile depth' in header:
+            # Profile Depth: 255.0 cm
+            sw = header['profile depth'].split()
+            if len(sw)==2 and avp_numbers(sw[0]):
+                (wd, unit_str) = udconvert(avp_numbers(sw[0])[0], sw[1], 'm') # to meters
+                if wd is None:
                     wd = numpy.nan
             else:
                 wd = numpy.nan
-
-            wl = platform_info['mean_water_depth'] - (-1*wd)
-            data['wl'][i] = wl
-            data['wd'][i] = -1*wd
-
-        if re.search("Voltage", line) and i<N:
-            batt = ysi[0]  # volts
-            data['batt'][i] = batt
-
-        if re.search("Profile Location:", line):
-            # Profile Location: Stones Bay Serial No: 00016B79, ID: AVP1_SERDP
-            sw = re.findall(r'\w+:\s(\w+)*', line)
-            # ysi_sn = sw[1]
-            # ysi_id = sw[2]
-
-        if re.search("^\d{2}\/\d{2}\/\d{2}", line) and len(ysi)==14 and i<N:
-            # get sample datetime from data
-            sample_str = '%02d-%02d-%02d %02d:%02d:%02d' % tuple(ysi[0:6])
-
-            # month, day, year
-            try:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%y %H:%M:%S')
-            except ValueError:
-                # day, month, year (month and day switched in some cases)
-                try:
-                    sample_dt = scanf_datetime(sample_str, fmt='%d-%m-%y %H:%M:%S')
-                except:
-                    sample_dt = datetime(1970,1,1)
-
-            if sample_dt is not None:
-                wtemp = ysi[6] # water temperature (C)
-                cond  = ysi[7] # conductivity (mS/cm)
-                salin = ysi[8] # salinity (ppt or PSU??)
-                depth = ysi[9] # depth (m) 
-                #
-                ph = ysi[10]   # ph
-                turb = ysi[11] # turbidity (NTU)
-                chl = ysi[12]  # chlorophyll (ug/l)
-                do = ysi[13]   # dissolved oxygen (ug/l)
-            
-                data['dt'][i] = sample_dt # sample datetime
-                data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-                #
-                data['wtemp'][i] =  wtemp
-                data['cond'][i] = cond
-                data['salin'][i] = salin
-                data['z'][i] = -1*depth # relative to surface
-
-                data['turb'][i] = turb
-                data['ph'][i] = ph
-                data['chl'][i] = chl
-                data['do'][i] = do            
-                i=i+1
-                
-            else:
-                print 'skipping line, ill-formed date ... ' + str(line)
-
-        elif (len(ysi)>=6 and len(ysi)<14):
-            print 'skipping bad data line ... ' + str(line)
-
-        # if-elif
-    # for line
+            data['wl'][k] = platform_info['mean_water_depth'] - (-1*wd)
+            data['wd'][k] = -1*wd
+        for name in header:
+            if 'voltage' in name and avp_numbers(header[name]):
+                data['batt'][k] = avp_numbers(header[name])[0] # volts
 
     return data
  
@@ -209,7 +136,6 @@ def creator(platform_info, sensor_info, data):
     #
     # subset data only to month being processed (see raw2proc.process())
     i = data['in']
-    dt = data['dt'][i]
     # 
     title_str = sensor_info['description']+' at '+ platform_info['location']
     global_atts = { 
@@ -236,9 +162,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : dt[0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : dt[-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -399,12 +325,11 @@ def updater(platform_info, sensor_info, data):
     #
     # subset data only to month being processed (see raw2proc.process())
     i = data['in']
-    dt = data['dt'][i]
     #
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : dt[-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -8,8 +8,10 @@ CODAR SeaSonde Total Sea Surface Currents (LLUV TOT4)
 
 parser : sample date and time from header (%TimeStamp:)
          table time version (%TableType:)
-creator : lat, lon, z, time, u(time, lat, lon), v(time, lat, lon),
-updater : time, u(time, lat, lon), v(time, lat, lon),
+batch_parser : same as parser for many hourly files, totals of all
+         hours interpolated at once
+creator : lat, lon, z, time, u(time, lon, lat), v(time, lon, lat),
+updater : time, u(time, lon, lat), v(time, lon, lat),
 
 Check that grid that totals are calculated over has not changed.
 (%Origin, %GridAxis, %GridAxisType, %GridSpacing all the same)
@@ -42,123 +44,174 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
-def parser(platform_info, sensor_info, lines):
+# header line '%(k): (v)'
+LLUV_HEADER = re.compile(r'^(%.*):\s*(.*)$')
+
+def grid_axes(platform_info):
+    """ (lon, lat) axes of grid that totals are interpolated onto"""
+    import numpy
+    # define the lat/lon grid based on 6km resolution
+    minlat, maxlat = platform_info['lat'] # (34.5, 38)
+    minlon, maxlon = platform_info['lon'] # (-76, -73.)
+    yi = numpy.linspace(minlat, maxlat, int(platform_info['nlat']))
+    xi = numpy.linspace(minlon, maxlon, int(platform_info['nlon']))
+    return (xi, yi)
+
+def read_lluv(lines):
     """
-    parse and assign data to variables from CODAR Totals LLUV format
+    read header and first table of one CODAR LLUV file in one pass over lines
 
-    Notes
-    -----
-    1. Requires grid definition obtained from sensor_info
-    For best coverage of totals, this includes overlapping foot print of HATY, DUCK, LISL and CEDR
-    
+    LLUVSpec 1.17 and greater has two tables bracketed by %TableStart
+    and %TableEnd, only rows of the first table are read.
+
+    :Returns:
+       (header, d) : tuple
+           header is dict of '%(k): (v)' header lines of the first
+           table, d is numpy.array (nrow, ncol) of the table, None if
+           it has 2 rows or less or is not TOT4
     """
+    import numpy
 
+    header = {}; rows = []
+    for line in lines:
+        if not line.startswith('%'):
+            rows.append(line)
+            continue
+        m = LLUV_HEADER.match(line)
+        if m is None:
+            continue
+        if m.group(1) == '%TableEnd':
+            break
+        header[m.group(1)] = m.group(2)
+
+    try:
+        nrow = int(header.get('%TableRows'))
+        ncol = int(header.get('%TableColumns'))
+    except (TypeError, ValueError):
+        nrow = ncol = None
+    if not nrow or nrow<=2 or 'TOT4' not in header.get('%TableType', ''):
+        return (header, None)
+    return (header, read_block(rows, ncol))
+
+def grid_totals(platform_info, stamps, tables):
+    """
+    interpolate totals of many hours onto lon/lat grid
+
+    Hours with the same totals points are stacked and interpolated in
+    one call, so the triangulation is done once for them (see
+    procutil.griddata()).
+
+    :Parameters:
+       stamps : list of str
+           %TimeStamp of each hour (e.g. '2013 11 01 00 00 00')
+       tables : list of numpy.array (nrow, ncol)
+           TOT4 table of each hour, None if no totals
+
+    :Returns:
+       data : dict
+           time (nhour,), u and v (nhour, nlon, nlat).  Hours without
+           a valid time stamp are dropped.
+    """
     import numpy
-    from datetime import datetime
-    from time import strptime
-    from StringIO import StringIO
-    from matplotlib.mlab import griddata
 
-    # define the lat/lon grid based on 6km resolution
-    minlat, maxlat = platform_info['lat'] # (34.5, 38)
-    minlon, maxlon = platform_info['lon'] # (-76, -73.)
-    nlat = platform_info['nlat']
-    nlon = platform_info['nlon']
-    yi = numpy.linspace(minlat, maxlat, nlat)
-    xi = numpy.linspace(minlon, maxlon, nlon)
+    xi, yi = grid_axes(platform_info)
     xmesh, ymesh = numpy.meshgrid(xi, yi)
 
+    ymdhms = numpy.ones((len(stamps), 6), dtype=float)*numpy.nan
+    for (j, v) in enumerate(stamps):
+        try:
+            ymdhms[j] = [float(s) for s in v.split()][:6]
+        except (AttributeError, ValueError):
+            pass
+    ok = ~numpy.isnan(ymdhms).any(axis=1)
+    ok[ok] = ymd_ok(*ymdhms[ok].T)
+    hours = numpy.flatnonzero(ok)
+
     data = {
-        'dt' : numpy.array(numpy.ones((1,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((1,), dtype=long)*numpy.nan),
-        'lon' : numpy.array(numpy.ones((nlon,), dtype=float)*numpy.nan),
-        'lat' : numpy.array(numpy.ones((nlat,), dtype=float)*numpy.nan),
-        'u' : numpy.array(numpy.ones((1,nlon,nlat), dtype=float)*numpy.nan),
-        'v' : numpy.array(numpy.ones((1,nlon,nlat), dtype=float)*numpy.nan),
+        'time' : ymd2es(*ymdhms[ok].T),
+        'u' : numpy.ones((len(hours), len(xi), len(yi)), dtype=float)*numpy.nan,
+        'v' : numpy.ones((len(hours), len(xi), len(yi)), dtype=float)*numpy.nan,
         }
 
-    sample_dt, ftype, lluvspec, ncol, nrow = (None, None, None, None, None)
-    # read header that match '%(k): (v)\n' pairs on each line
-    m = re.findall(r'^(%.*):\s*(.*)$', ''.join(lines), re.MULTILINE)
-    for k,v in m:
-        if k == '%TimeStamp':
-            sample_dt = scanf_datetime(v, fmt='%Y %m %d %H %M %S')            
-        elif k == '%TableType':
-            ftype = v
-        elif k == '%LLUVSpec':
-            lluvspec = float(re.split('\s+', v)[0])
-        elif k == '%TableColumns':
-            ncol = int(v)
-        elif k == '%TableRows':
-            nrow = int(v)
-        elif k == '%TableEnd':
-            break
-            # LLUVSpec 1.17 and greater has two tables bracketed by TableStart and TableEnd
-            # get out of this search loop after the first table 
-
-    if nrow>2:
-        # read data from string of lines but make it behave like a file object with StringIO
-        s = StringIO(''.join(lines))
-        s.seek(0) # ensures start posn of file
-        d = numpy.loadtxt(s, comments='%')
-        # lat, lon, u, v = numpy.loadtxt(s, usecols=(0,1,2,3), comments='%', unpack=True)
-        
-        if 'TOT4' in ftype:
-            lon = d[:,0]
-            lat = d[:,1]
-            wu = d[:,2]
-            wv = d[:,3]
-            gridflag = d[:,4]
-            wu_std_qual = d[:,5]
-            wv_std_qual = d[:,6]
-            cov_qual = d[:,7]
-            x_dist = d[:,8]
-            y_dist = d[:,9]
-            rang = d[:,10]
-            bearing = d[:,11]
-            vel_mag = d[:,12]
-            vel_dir = d[:,13]
+    # hours (index into data) of each set of totals points
+    groups = OrderedDict()
+    for (i, j) in enumerate(hours):
+        d = tables[j]
+        if d is None:
+            continue
+        key = (d.shape[0], d[:,0].tostring(), d[:,1].tostring())
+        groups.setdefault(key, []).append(i)
+
+    for ii in groups.values():
+        d = tables[hours[ii[0]]]
+        lon = d[:,0]
+        lat = d[:,1]
+        # u, v (cm/s) of all hours as (hour, component, point)
+        wuv = numpy.array([tables[hours[i]][:,2:4].T for i in ii])
 
         # ibad = (wu_std_qual==999.) | (wv_std_qual==999.) | (cov_qual==999.) 
         # wu[ibad] = numpy.nan
         # wv[ibad] = numpy.nan
 
-        # SMH -- April 26, 2013 -- commenting out these columns for now until figure out how to handle
-        # new dynamic form of LLUVSpec 1.17 in TOT4 format, prior versions were static with 6 fields
-        # will have to use %LLUVSpec header info and second table at bottom of file to get dynamic ncols 
-            # s1 = d[:,14]
-            # s2 = d[:,15]
-            # s3 = d[:,16]
-            # s4 = d[:,17]
-            # s5 = d[:,18]
-            # s6 = d[:,19]
-
-            try: 
-                uim = griddata(lon, lat, wu, xmesh, ymesh)
-                vim = griddata(lon, lat, wv, xmesh, ymesh)
-                # returned masked array as an ndarray with masked values filled with fill_value
-                ui = uim.filled(fill_value=numpy.nan)
-                vi = vim.filled(fill_value=numpy.nan)
-                # print ui.shape
-            except IndexError:
-                print "raw2proc:  IndexError in griddata() -- skipping data"
-
-    # ---------------------------------------------------------------
-    i = 0
-    data['dt'][i] =  sample_dt # 
-    data['time'][i] =  dt2es(sample_dt) # 
-    data['lon'] = xi # new longitude grid
-    data['lat'] = yi # new latitude grid
-
-    if nrow and nrow>2:
+        # NaN outside convex hull of the points
+        try: 
+            uvi = griddata(lon, lat, wuv, xmesh, ymesh)
+        except (IndexError, ValueError, RuntimeError), e:
+            print "raw2proc:  %s in griddata() -- skipping data" % e.__class__.__name__
+            continue
         # use transpose so order is (time, x, y) for netcdf convention
-        data['u'][i] = ui.T # u-component of water velocity (cm/s)
-        data['v'][i] = vi.T # v-component of water velocity 
+        data['u'][ii] = uvi[:,0].transpose((0,2,1)) # u-component of water velocity (cm/s)
+        data['v'][ii] = uvi[:,1].transpose((0,2,1)) # v-component of water velocity 
 
     return data
 
+def parser(platform_info, sensor_info, lines):
+    """
+    parse and assign data to variables from CODAR Totals LLUV format
+
+    Notes
+    -----
+    1. Requires grid definition obtained from sensor_info
+    For best coverage of totals, this includes overlapping foot print of HATY, DUCK, LISL and CEDR
+    2. TOT4 columns are lon, lat, u, v, gridflag, u_std_qual, v_std_qual,
+    cov_qual, x_dist, y_dist, range, bearing, vel_mag, vel_dir, only
+    lon, lat, u and v are used
+
+    SMH -- April 26, 2013 -- columns s1-s6 that follow are not used until
+    figure out how to handle new dynamic form of LLUVSpec 1.17 in TOT4
+    format, prior versions were static with 6 fields
+
+    """
+    (header, d) = read_lluv(lines)
+    return grid_totals(platform_info, [header.get('%TimeStamp')], [d])
+
+def batch_parser(platform_info, sensor_info, filenames):
+    """
+    parse many CODAR LLUV files (one hour each) and interpolate totals
+    of all hours onto lon/lat grid at once
+
+    Files that cannot be read are skipped.
+
+    :Returns:
+       data : dict
+           Same keys as from parser(), one record per hour
+    """
+    stamps = []; tables = []
+    for fn in filenames:
+        lines = load_data(fn)
+        if not lines:
+            continue
+        (header, d) = read_lluv(lines)
+        stamps.append(header.get('%TimeStamp'))
+        tables.append(d)
+    return grid_totals(platform_info, stamps, tables)
+
 def creator(platform_info, sensor_info, data):
     #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+    # grid is from config, not data (see grid_axes())
+    (lon, lat) = grid_axes(platform_info)
     # 
     title_str = sensor_info['description']+' at '+ platform_info['location']
     global_atts = { 
@@ -184,8 +237,8 @@ def creator(platform_info, sensor_info, data):
         'project' : 'North Carolina Coastal Ocean Observing System (NCCOOS)',
         'project_url' : 'http://nccoos.org',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -246,8 +299,8 @@ def creator(platform_info, sensor_info, data):
     # dimension names use tuple so order of initialization is maintained
     dim_inits = (
         ('ntime', NC.UNLIMITED),
-        ('nlat', platform_info['nlat']),
-        ('nlon', platform_info['nlon']),
+        ('nlat', len(lat)),
+        ('nlon', len(lon)),
         ('nz', 1),
         )
     
@@ -266,13 +319,10 @@ def creator(platform_info, sensor_info, data):
         ('v', NC.FLOAT, ('ntime','nlon','nlat')),
         )
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # var data 
     var_data = (
-        ('lat', data['lat']),
-        ('lon', data['lon']),
+        ('lat', lat),
+        ('lon', lon),
         ('z', 0.),
         #
         ('time', data['time'][i]),
@@ -283,11 +333,14 @@ def creator(platform_info, sensor_info, data):
     return (global_atts, var_atts, dim_inits, var_inits, var_data)
 
 def updater(platform_info, sensor_info, data):
+    #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
     #
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -305,9 +358,6 @@ def updater(platform_info, sensor_info, data):
     #          },
     #    }
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # data 
     var_data = (
         ('time', data['time'][i]),
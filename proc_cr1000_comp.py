@@ -35,6 +35,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     Example compass data
@@ -59,13 +63,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'hdg' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'hdg_std' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'pitch' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -76,61 +79,25 @@ def parser(platform_info, sensor_info, lines):
         'roll_max' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace any "NAN" text with a number
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-        
-        if len(csi)==9:
-            # 
-            # data['samplenum'][i] = csi[0] # sample number assigned by datalogger in table
-            data['hdg'][i] =  csi[1] # Honeywell compass Heading avg (deg Mag North) (60 samples for 1 min) 
-            data['hdg_std'][i] = csi[2] # heading std (deg)
-            data['pitch'][i] = csi[3] # 1 min avg of pitch (deg)
-            data['pitch_std'][i] = csi[4] # pitch std (deg )
-            data['pitch_max'][i] = csi[5] # pitch angle max (deg)
-            data['roll'][i] = csi[6] # avg roll (deg) 
-            data['roll_std'][i] = csi[7] # roll std (deg) 
-            data['roll_max'][i] = csi[8] # roll max (deg)
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue
-
-        # if re.search
-    # for line
+    if block.shape[1]==9:
+        # data['samplenum'] = block[:,0] # sample number assigned by datalogger in table
+        data['hdg'] =  block[:,1] # Honeywell compass Heading avg (deg Mag North) (60 samples for 1 min) 
+        data['hdg_std'] = block[:,2] # heading std (deg)
+        data['pitch'] = block[:,3] # 1 min avg of pitch (deg)
+        data['pitch_std'] = block[:,4] # pitch std (deg )
+        data['pitch_max'] = block[:,5] # pitch angle max (deg)
+        data['roll'] = block[:,6] # avg roll (deg) 
+        data['roll_std'] = block[:,7] # roll std (deg) 
+        data['roll_max'] = block[:,8] # roll max (deg)
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
+        for param in data.keys():
+            data[param] = data[param][:0]
 
     # Specific to buoys using CR1000 in Fall of 2011
     # prior to Jan 01, 2012, nothing different in compass
     # but can be handled here if there was difference
-    if data['dt'][0] < datetime(2012, 1, 1):
+    if len(data['time']) and data['time'][0] < dt2es(datetime(2012, 1, 1)):
         pass
     
     # some QC
@@ -141,13 +108,6 @@ def parser(platform_info, sensor_info, lines):
     # data['hdg'][bad] = numpy.nan 
     # data['hdg_std'][bad] = numpy.nan 
 
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
-        for param in data.keys():
-            data[param] = data[param][keep]
-
     return data
  
 
@@ -182,9 +142,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][i][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -343,7 +303,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -34,6 +34,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     "TOA5","CR1000_B1","CR1000","37541","CR1000.Std.21","CPU:NCWIND_12_Buoy_All.CR1","58723","CTD1_6Min"
@@ -57,13 +61,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'wtemp' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'cond' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'press' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -72,71 +75,22 @@ def parser(platform_info, sensor_info, lines):
         'depth' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d -- %s' % (i,line)
-            continue
-
-        # replace "NAN"
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:6]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if len(sw)>=6:
-            dstr = re.sub('"', '', sw[0])
-            # print dstr
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue            
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(dstr, fmt='%Y-%m-%d %H:%M:%S') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(dstr, fmt='%Y-%m-%d %H:%M:%S')
-
-        # ***** TO DO: need to adjust any drift of offset in CTD sample time to CR1000 clock
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-
-        if len(csi)==5:
-            #
-            # (pg 31 SBE IMP Microcat User Manual)
-            # "#iiFORMAT=1 (default) Output converted to data
-            # date format dd mmm yyyy,
-            # conductivity = S/m,
-            # temperature precedes conductivity"
-            sn = csi[1] # ctd serial number == check against platform configuration
-            data['wtemp'][i] =  csi[2] # water temperature (C)
-            data['cond'][i] = csi[3] # specific conductivity (S/m)
-            data['press'][i] = csi[4]   # pressure decibars 
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue            
-            
-        # if re.search
-    # for line
-
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
+    # ***** TO DO: need to adjust any drift of offset in CTD sample time to CR1000 clock
+    if block.shape[1]>=5:
+        #
+        # (pg 31 SBE IMP Microcat User Manual)
+        # "#iiFORMAT=1 (default) Output converted to data
+        # date format dd mmm yyyy,
+        # conductivity = S/m,
+        # temperature precedes conductivity"
+        sn = block[:,1] # ctd serial number == check against platform configuration
+        data['wtemp'] =  block[:,2] # water temperature (C)
+        data['cond'] = block[:,3] # specific conductivity (S/m)
+        data['press'] = block[:,4]   # pressure decibars 
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
         for param in data.keys():
-            data[param] = data[param][keep]
+            data[param] = data[param][:0]
 
     # Quality Control steps for temp, depth, and cond 
     # (1) within range
@@ -197,9 +151,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][i][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -336,7 +290,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -36,6 +36,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     From FSL (CSI datalogger program files):
@@ -63,13 +67,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'rain' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'sontek_wl' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'sontek_flow' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -80,61 +83,25 @@ def parser(platform_info, sensor_info, lines):
         'press_csi_cfs' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace any "NAN" text with a number
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-        
-        # SMH -- 2009-12-05 modification
-        # press_csi water level and flow conversion on the data logger is not correct
-        # this will be reverted to original pressure reading and wl and flow recomputed.
-        if len(csi)==6:
-            # MOW has all six fields but no sontek now
-            data['rain'][i] =  csi[1] # 15 min rain count (inches)
-            # data['sontek_wl'][i] = csi[2] # sontek water level (ft) 
-            # data['sontek_flow'][i] = csi[3] # sontek flow (cfs)
-            data['press_csi_ft'][i] = csi[4] # csi reported pressure water level (ft) 
-            data['press_csi_cfs'][i] = csi[5] # csi reported flow (cfs)
-            i=i+1
-        elif len(csi)==4:
-            # CBC is not reporting pressure level and flow -- no pressure sensor!
-            data['rain'][i] =  csi[1] # 15 min rain count (inches)
-            data['sontek_wl'][i] = csi[2] # sontek water level (ft) 
-            data['sontek_flow'][i] = csi[3] # sontek flow (cfs)
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue
-
-        # if re.search
-    # for line
+    # SMH -- 2009-12-05 modification
+    # press_csi water level and flow conversion on the data logger is not correct
+    # this will be reverted to original pressure reading and wl and flow recomputed.
+    if block.shape[1]==6:
+        # MOW has all six fields but no sontek now
+        data['rain'] =  block[:,1] # 15 min rain count (inches)
+        # data['sontek_wl'] = block[:,2] # sontek water level (ft) 
+        # data['sontek_flow'] = block[:,3] # sontek flow (cfs)
+        data['press_csi_ft'] = block[:,4] # csi reported pressure water level (ft) 
+        data['press_csi_cfs'] = block[:,5] # csi reported flow (cfs)
+    elif block.shape[1]==4:
+        # CBC is not reporting pressure level and flow -- no pressure sensor!
+        data['rain'] =  block[:,1] # 15 min rain count (inches)
+        data['sontek_wl'] = block[:,2] # sontek water level (ft) 
+        data['sontek_flow'] = block[:,3] # sontek flow (cfs)
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
+        for param in data.keys():
+            data[param] = data[param][:0]
 
     # revert  press_csi_ft back  to raw  pressure  reading (eventually
     # want csi to just report the  raw pressure reading so we can just
@@ -150,13 +117,6 @@ def parser(platform_info, sensor_info, lines):
     # SMH does not know what equation is based on or how these values are derived
     data['press_flow'] = ((data['press_wl']*12))*10.81 - 8.81 # cfs
 
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
-        for param in data.keys():
-            data[param] = data[param][keep]
-
     return data
  
 
@@ -190,9 +150,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://ehs.unc.edu/environment/water_quality',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -318,7 +278,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -35,6 +35,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     Example gps data
@@ -77,16 +81,31 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
-
-    N = nsamp
+    # whole table at once, all GPS fields are text
+    (names, cells) = split_toa5(lines)
+    es = str2es(cells[:,0], sensor_info['utc_offset'])
+
+    if cells.shape[1]==14:
+        # >>> cells[0]
+        # ['2014-02-01 00:52:01', '77', '$GPRMC', '005155', 'A',
+        #        '3443.3939', 'N', '07645.1690', 'W', '000.0', '000.0', '010214', '010.0', 'W']
+        # quality of fix
+        active = cells[:,4]=='A'
+        if (~active).any():
+            print '... Invalid GPS Fix -- skipping %d lines' % ((~active).sum(),)
+        keep = active & (es>=0)
+        es = es[keep]
+        cells = cells[keep]
+    else:
+        print ' ... skipping all lines -- %d fields per line' % (cells.shape[1],)
+        es = es[:0]
+        cells = numpy.zeros((0, 14), dtype=str)
+
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
-        'gps_dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan), # gps fix datetime object    
+        'time' : es,
         'gps_time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan), # gps fix time (epoch secs)  
-        'gps_active' : numpy.array(numpy.ones((N,), dtype=int)*numpy.nan),       # quality of fix (1 == Active, 0 == Void)
+        'gps_active' : numpy.array(numpy.ones((N,), dtype=int)),       # quality of fix (1 == Active, 0 == Void)
         'gps_lat' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),     # lat of fix                 
         'gps_lon' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),     # lon of fix                 
         'gps_mvar' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),    # magnetic variation at fix  
@@ -94,98 +113,24 @@ def parser(platform_info, sensor_info, lines):
         'gps_cog' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),     # course over ground or track deg True
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace any "NAN" text with a number
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        # for s in sw[1:]:
-        #     m = re.search(REAL_RE_STR, s)
-        #     if m:
-        #         csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-
-        
-        if len(sw)==14:
-            # remove all the double quotes (")
-            for index, str in enumerate(sw):
-                sw[index] = re.sub('\"', '', str)
-                
-            # >>> sw
-            # ['2014-02-01 00:52:01', '77', '$GPRMC', '005155', 'A',
-            #        '3443.3939', 'N', '07645.1690', 'W', '000.0', '000.0', '010214', '010.0', 'W']
-            # quality of fix
-
-            if sw[4] != 'A':
-                data['gps_active'][i] = 0
-                print '... Invalid GPS Fix -- skipping line %d' % (i,) 
-                continue
-
-            gps_dt_str = sw[11] + ' ' + sw[3] # ddmmyy HHMMSS or ddmmyy HHMMSS.f
-            gps_dt = scanf_datetime(gps_dt_str, fmt='%d%m%y %H%M%S')
-            if gps_dt == None:
-                gps_dt = scanf_datetime(gps_dt_str, fmt='%d%m%y %H%M%S.%f')
-                           
-            gps_dt.replace(microsecond=0)
-            data['gps_dt'][i] = gps_dt # gps fix datetime object    
-            data['gps_time'][i] = dt2es(gps_dt) # gps fix time (epoch secs)
-
-            # lat of fix                 
-            m = re.search('^(\d{2})(\d+\.\d+)', sw[5])
-            if m:
-                latdeg = float(m.groups()[0])
-                latmin = float(m.groups()[1])
-                if sw[6]=='N':
-                    data['gps_lat'][i]=latdeg + latmin/60
-                else:
-                    data['gps_lat'][i]=-1*(latdeg + latmin/60)
-            # lon of fix                 
-            m = re.search('^(\d{3})(\d+\.\d+)', sw[7])
-            if m:
-                londeg = float(m.groups()[0])
-                lonmin = float(m.groups()[1])
-                if sw[8]=='E':
-                    data['gps_lon'][i]=londeg + lonmin/60
-                else:
-                    data['gps_lon'][i]=-1*(londeg + lonmin/60)
-            # magnetic variation at fix
-            if sw[13]=='E':
-                data['gps_mvar'][i] = float(sw[12])
-            else:
-                data['gps_mvar'][i] = -1*float(sw[12])
-            # speed over ground (kts)
-            data['gps_sog'][i] = float(sw[9])
-            # course over ground or track (deg True N)
-            data['gps_cog'][i] = float(sw[10])
-            i=i+1
-            
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue
-
-        # if re.search
-    # for line
+    # gps fix time from ddmmyy and HHMMSS or HHMMSS.f (fraction dropped)
+    gps_stamps = ['20%s-%s-%s %s:%s:%s' % (d[4:6], d[2:4], d[0:2], t[0:2], t[2:4], t[4:6]) \
+                  for d, t in zip(cells[:,11], cells[:,3])]
+    data['gps_time'] = str2es(gps_stamps) # gps fix time (epoch secs)
+
+    # lat of fix (ddmm.mmmm), lon of fix (dddmm.mmmm)
+    lat = str2float(cells[:,5])
+    latdeg = numpy.floor(lat/100)
+    data['gps_lat'] = numpy.where(cells[:,6]=='N', 1, -1)*(latdeg + (lat-100*latdeg)/60)
+    lon = str2float(cells[:,7])
+    londeg = numpy.floor(lon/100)
+    data['gps_lon'] = numpy.where(cells[:,8]=='E', 1, -1)*(londeg + (lon-100*londeg)/60)
+    # magnetic variation at fix
+    data['gps_mvar'] = numpy.where(cells[:,13]=='E', 1, -1)*str2float(cells[:,12])
+    # speed over ground (kts)
+    data['gps_sog'] = str2float(cells[:,9])
+    # course over ground or track (deg True N)
+    data['gps_cog'] = str2float(cells[:,10])
 
     # return the -99999 back into Nan's
     # for vn in ['gps_lat', 'gps_lon', 'gps_mvar', 'gps_cog', 'gps_sog']:
@@ -197,13 +142,6 @@ def parser(platform_info, sensor_info, lines):
         bad = data[vn]==0
         data[vn][bad] = numpy.nan 
 
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
-        for param in data.keys():
-            data[param] = data[param][keep]
-
     return data
  
 
@@ -238,9 +176,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][i][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -384,7 +322,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -35,6 +35,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     Example met data
@@ -58,13 +62,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'air_press' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'rh' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'rh_std' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -77,65 +80,29 @@ def parser(platform_info, sensor_info, lines):
         'pir_std' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace any "NAN" text with a number
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-        
-        if len(csi)==11:
-            # 
-            # data['samplenum'][i] = csi[0] # sample number assigned by datalogger in table
-            data['air_press'][i] =  csi[1] # Campbell Sci (Viasala) CS106 barometer (mbar)
-            # Before Jan 2012, Heise Barometer (psi) to mbar
-            data['rh'][i] = csi[2] # relative humidity avg (60 samples for 1 min)
-            data['rh_std'][i] = csi[3] # relative humidity std
-            data['air_temp'][i] = csi[4] # air temperature avg (deg C)
-            data['air_temp_std'][i] = csi[5] # air temperature std (deg C)
-            data['rain'][i] = csi[6] # precip gauge cummulative (mm) 
-            data['psp'][i] = csi[7] # PSP avg 
-            data['psp_std'][i] = csi[8] # PSP std
-            data['pir'][i] = csi[9] # PIR avg (W m-2)
-            data['pir_std'][i] = csi[10] # PIR std (W m-2)
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue
-
-        # if re.search
-    # for line
+    if block.shape[1]==11:
+        # data['samplenum'] = block[:,0] # sample number assigned by datalogger in table
+        data['air_press'] =  block[:,1] # Campbell Sci (Viasala) CS106 barometer (mbar)
+        # Before Jan 2012, Heise Barometer (psi) to mbar
+        data['rh'] = block[:,2] # relative humidity avg (60 samples for 1 min)
+        data['rh_std'] = block[:,3] # relative humidity std
+        data['air_temp'] = block[:,4] # air temperature avg (deg C)
+        data['air_temp_std'] = block[:,5] # air temperature std (deg C)
+        data['rain'] = block[:,6] # precip gauge cummulative (mm) 
+        data['psp'] = block[:,7] # PSP avg 
+        data['psp_std'] = block[:,8] # PSP std
+        data['pir'] = block[:,9] # PIR avg (W m-2)
+        data['pir_std'] = block[:,10] # PIR std (W m-2)
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
+        for param in data.keys():
+            data[param] = data[param][:0]
 
     # Specific to buoys using CR1000 in Fall of 2011
     # prior to Jan 01, 2012, pressure sensor was a Heise with units psi
     # afterwards, Campbell Sci CS106 in units mbar,
     # also handle b1/b2 PSP data for each buoy
-    if data['dt'][0] < datetime(2012, 1, 1):
+    if len(data['time']) and data['time'][0] < dt2es(datetime(2012, 1, 1)):
         data['air_press'] = udconvert(data['air_press'], 'psi', 'mbar')[0]
         data['rain'] = data['rain']/100 # precip gauge cummulative (mm)
                     
@@ -174,18 +141,6 @@ def parser(platform_info, sensor_info, lines):
     # data['pir'][bad] = numpy.nan 
     # data['pir_std'][bad] = numpy.nan
 
-    # return the -99999 back into Nan's
-    for vn in ['air_temp', 'air_temp_std', 'rain', 'rh', 'rh_std', 'psp', 'psp_std', 'pir', 'pir_std']:
-        bad = data[vn]==-99999
-        data[vn][bad] = numpy.nan 
-
-    # check that each value in data['dt'] is type datetime, 
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
-        for param in data.keys():
-            data[param] = data[param][keep]
-
     return data
  
 
@@ -220,9 +175,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][i][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -388,7 +343,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -35,6 +35,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     Example wind data
@@ -63,13 +67,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'wspd1' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'wspd1_std' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'wgust1' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -80,56 +83,20 @@ def parser(platform_info, sensor_info, lines):
         'wdir2' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace any "NAN" text with a number
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-        
-        if len(csi)==9:
-            # 
-            # data['samplenum'][i] = csi[0] # sample number assigned by datalogger in table
-            data['wspd1'][i] = csi[1] # 
-            data['wdir1'][i] = csi[2] # 
-            data['wgust1'][i] = csi[3] # 
-            data['wspd1_std'][i] = csi[4] # 
-            data['wspd2'][i] = csi[5] # 
-            data['wdir2'][i] = csi[6] # 
-            data['wgust2'][i] = csi[7] # 
-            data['wspd2_std'][i] = csi[8] # 
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue
-
-        # if re.search
-    # for line
+    if block.shape[1]==9:
+        # data['samplenum'] = block[:,0] # sample number assigned by datalogger in table
+        data['wspd1'] = block[:,1] # 
+        data['wdir1'] = block[:,2] # 
+        data['wgust1'] = block[:,3] # 
+        data['wspd1_std'] = block[:,4] # 
+        data['wspd2'] = block[:,5] # 
+        data['wdir2'] = block[:,6] # 
+        data['wgust2'] = block[:,7] # 
+        data['wspd2_std'] = block[:,8] # 
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
+        for param in data.keys():
+            data[param] = data[param][:0]
 
     # cannot figure out how to combine the two operations
     # for some reason, this one liner does not work
@@ -138,12 +105,6 @@ def parser(platform_info, sensor_info, lines):
     bad = data['wdir2']==0    # print ' ... ... Number of zero wdir1 = %d' % numpy.sum(bad)
     data['wdir2'][bad] = numpy.nan
 
-    # return the -99999 back into Nan's
-    for vn in ['wspd1', 'wspd1_std', 'wgust1', 'wdir1', 'wspd2', 'wspd2_std', 'wgust2', 'wdir2']:
-        bad = data[vn]==-99999
-        data[vn][bad] = numpy.nan 
-
-
     # apply any known data offsets (correction) as provided in config file
     # use the config file, so we don't have to have lots of conditional statements
     # for which platform and date ranges.  Let the configs take care of that.
@@ -158,13 +119,6 @@ def parser(platform_info, sensor_info, lines):
     data['wdir1'] = numpy.mod(data['wdir1'] + platform_info['mvar'] + 360., 360.)
     data['wdir2'] = numpy.mod(data['wdir2'] + platform_info['mvar'] + 360., 360.)
                                    
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
-        for param in data.keys():
-            data[param] = data[param][keep]
-
     return data
  
 
@@ -199,9 +153,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][i][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -372,7 +326,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][i][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
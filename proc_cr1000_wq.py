@@ -36,6 +36,10 @@ from ncutil import *
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# TOA5 header lines repeated before new lines when a growing file is
+# read from its last offset (see raw2proc.RawReader)
+raw_header_lines = 4
+
 def parser(platform_info, sensor_info, lines):
     """
     "TOA5","CR1000_CBC","CR1000","5498","CR1000.Std.11","CPU:UNC_CrowBranch.CR1","1554","DataHourly"
@@ -57,13 +61,12 @@ def parser(platform_info, sensor_info, lines):
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
-    # how many samples (don't count header 4 lines)
-    nsamp = len(lines[4:])
+    # whole table at once, "NAN" comes back as NaN
+    (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
 
-    N = nsamp
+    N = len(es)
     data = {
-        'dt' : numpy.array(numpy.ones((N,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((N,), dtype=long)*numpy.nan),
+        'time' : es,
         'wtemp' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'cond' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'do_sat' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
@@ -71,65 +74,21 @@ def parser(platform_info, sensor_info, lines):
         'ph' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'turb' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
         'battvolts' : numpy.array(numpy.ones((N,), dtype=float)*numpy.nan),
-
         }
 
-    # sample count
-    i = 0
-
-    for line in lines[4:]:
-        csi = []
-        # split line
-        sw = re.split(',', line)
-        if len(sw)<=0:
-            print ' ... skipping line %d ' % (i,)
-            continue
-
-        # replace "NAN"
-        for index, s in enumerate(sw):
-            m = re.search(NAN_RE_STR, s)
-            if m:
-                sw[index] = '-99999'
-
-        # parse date-time, and all other float and integers
-        for s in sw[1:]:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                csi.append(float(m.groups()[0]))
-
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sw[0], fmt='"%Y-%m-%d %H:%M:%S"')
-
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-
-        if len(csi)==8:
-            # 
-            data['wtemp'][i] =  csi[1] # water temperature (C)
-            data['cond'][i] = csi[2] # specific conductivity (mS/cm)
-            data['ph'][i] = csi[3]   # ph
-            data['turb'][i] = csi[5] # turbidity (NTU)
-            data['do_sat'][i] = csi[6]   # saturated dissolved oxygen (% air sat)
-            data['do_mg'][i] = csi[4]   # dissolved oxygen (mg/l)
-            data['battvolts'][i] = csi[7]   # battery (volts)
-            i=i+1
-        else:
-            print ' ... skipping line %d -- %s ' % (i,line)
-            continue            
-            
-
-        # if re.search
-    # for line
-
-    # check that no data[dt] is set to Nan or anything but datetime
-    # keep only data that has a resolved datetime
-    keep = numpy.array([type(datetime(1970,1,1)) == type(dt) for dt in data['dt'][:]])
-    if keep.any():
+    if block.shape[1]==8:
+        data['wtemp'] =  block[:,1] # water temperature (C)
+        data['cond'] = block[:,2] # specific conductivity (mS/cm)
+        data['ph'] = block[:,3]   # ph
+        data['turb'] = block[:,5] # turbidity (NTU)
+        data['do_sat'] = block[:,6]   # saturated dissolved oxygen (% air sat)
+        data['do_mg'] = block[:,4]   # dissolved oxygen (mg/l)
+        data['battvolts'] = block[:,7]   # battery (volts)
+    else:
+        print ' ... skipping all lines -- %d values per line' % (block.shape[1],)
         for param in data.keys():
-            data[param] = data[param][keep]
+            data[param] = data[param][:0]
+
 
     return data
 
@@ -163,9 +122,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://ehs.unc.edu/environment/water_quality',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -301,7 +260,7 @@ def updater(platform_info, sensor_info, data):
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -9,158 +9,35 @@ import numpy as n
 import pycdf
 import datetime
 import procutil
-from spongenet.parse import Data
 
 nowDt = datetime.datetime.utcnow().replace(microsecond=0)
 
+# variables of package read from each Device (see procutil.read_andi())
+POINTS = (
+    ('voltage',  float),
+    ('memory',   int),
+    ('interval', int),
+    )
+
 def parser(platform_info, sensor_info, lines):
     """
     Parse and assign sponge data from XML file.
     """
     
-    _data = Data(''.join(lines))
-    
-    # Each Device tag represents a time sample.
-    num_samples = len(_data.devices)
-    
-    data = {
-        'dt'       : n.array(n.ones((num_samples,)) * n.nan, dtype=object),
-        'time'     : n.array(n.ones((num_samples,)) * n.nan, dtype=long),
-        'pdt'      : n.array(n.ones((num_samples,)) * n.nan, dtype=object),
-        'ptime'    : n.array(n.ones((num_samples,)) * n.nan, dtype=long),
-        'ds'       : n.array(n.ones((num_samples,)) * n.nan, dtype=object),
-        'session'  : n.array(n.ones((num_samples,)) * n.nan, dtype=long),
-        'pds'      : n.array(n.ones((num_samples,)) * n.nan, dtype=object),
-        'psession' : n.array(n.ones((num_samples,)) * n.nan, dtype=long),
-        'record'   : n.array(n.ones((num_samples,)) * n.nan, dtype=int),
-        'status'   : n.array(n.ones((num_samples,)) * n.nan, dtype=int),
-        'pstatus'  : n.array(n.ones((num_samples,)) * n.nan, dtype=int),
-        'voltage'  : n.array(n.ones((num_samples,)) * n.nan, dtype=float),
-        'memory'   : n.array(n.ones((num_samples,)) * n.nan, dtype=int),
-        'interval' : n.array(n.ones((num_samples,)) * n.nan, dtype=int),
-           }
-    
-    for (sample_index, sample) in enumerate(_data.devices):
-        # sample time at the platform
-        dt = {'month' : int(sample['time'][5:7]),
-              'day'   : int(sample['time'][8:10]),
-              'year'  : int(sample['time'][0:4]),
-              'hour'  : int(sample['time'][11:13]),
-              'min'   : int(sample['time'][14:16]),
-              'sec'   : int(sample['time'][17:19]),
-             }
-        dt = '%(month)02d-%(day)02d-%(year)04d %(hour)02d:%(min)02d:%(sec)02d' \
-             % dt
-        dt = procutil.scanf_datetime(dt, fmt='%m-%d-%Y %H:%M:%S')
-        if sensor_info['utc_offset']:
-            dt = dt + datetime.timedelta(hours=sensor_info['utc_offset'])
-        data['dt'][sample_index] = dt        
-        data['time'][sample_index] = procutil.dt2es(dt)
-
-        # sample time at the package
-        package_dt = {'month' : int(sample['data_time'][5:7]),
-                      'day'   : int(sample['data_time'][8:10]),
-                      'year'  : int(sample['data_time'][0:4]),
-                      'hour'  : int(sample['data_time'][11:13]),
-                      'min'   : int(sample['data_time'][14:16]),
-                      'sec'   : int(sample['data_time'][17:19]),
-                     }
-        package_dt = ('%(month)02d-%(day)02d-%(year)04d ' +
-                      '%(hour)02d:%(min)02d:%(sec)02d') \
-                     % package_dt
-        package_dt = procutil.scanf_datetime(package_dt, fmt='%m-%d-%Y %H:%M:%S')
-        if sensor_info['utc_offset']:
-            package_dt = package_dt + \
-                        datetime.timedelta(hours=sensor_info['utc_offset'])
-        data['pdt'][sample_index] = package_dt
-        data['ptime'][sample_index] = procutil.dt2es(package_dt)
-
-        # platform session time
-        ds = {'month' : int(sample['sessionid'][14:16]),
-              'day'   : int(sample['sessionid'][17:19]),
-              'year'  : int(sample['sessionid'][9:13]),
-              'hour'  : int(sample['sessionid'][20:22]),
-              'min'   : int(sample['sessionid'][23:25]),
-              'sec'   : int(sample['sessionid'][26:28]),
-             }
-        ds = '%(month)02d-%(day)02d-%(year)04d %(hour)02d:%(min)02d:%(sec)02d' \
-             % ds
-        ds = procutil.scanf_datetime(ds, fmt='%m-%d-%Y %H:%M:%S')
-        if sensor_info['utc_offset']:
-            ds = ds + datetime.timedelta(hours=sensor_info['utc_offset'])
-        data['ds'][sample_index] = ds        
-        data['session'][sample_index] = procutil.dt2es(ds)
-
-        # package session time
-        package_ds = {'month' : int(sample['data_sessionid'][5:7]),
-                      'day'   : int(sample['data_sessionid'][8:10]),
-                      'year'  : int(sample['data_sessionid'][0:4]),
-                      'hour'  : int(sample['data_sessionid'][11:13]),
-                      'min'   : int(sample['data_sessionid'][14:16]),
-                      'sec'   : int(sample['data_sessionid'][17:19]),
-                     }
-        package_ds = ('%(month)02d-%(day)02d-%(year)04d ' +
-                      '%(hour)02d:%(min)02d:%(sec)02d') \
-                     % package_ds
-        package_ds = procutil.scanf_datetime(package_ds, fmt='%m-%d-%Y %H:%M:%S')
-        if sensor_info['utc_offset']:
-            package_ds = package_ds + \
-                        datetime.timedelta(hours=sensor_info['utc_offset'])
-        data['pds'][sample_index] = package_ds
-        data['psession'][sample_index] = procutil.dt2es(package_ds)
+    return procutil.read_andi([procutil.LineFile(lines)], sensor_info, POINTS)
 
-        # platform variables
-        try:
-            data['record'][sample_index] = int(sample["recordnumber"])
-        except KeyError:
-            pass
-
-        try:
-            data['status'][sample_index] = int(sample["status"].
-                                               partition(":")[0])
-        except (KeyError, AttributeError, ):
-            pass
-
-        # package variables
-        try:
-            data['pstatus'][sample_index] = int(sample.sensors
-                                                [sensor_info["id_number"]]
-                                                ["status"].
-                                                partition(":")[0])
-        except (KeyError, AttributeError, ):
-            pass
-
-        try:
-            data['voltage'][sample_index] = float(sample.sensors
-                                                  [sensor_info["id_number"]].
-                                                  points[sensor_info
-                                                         ["voltage_description"]]
-                                                  ["value"])
-        except (KeyError, AttributeError, ):
-            pass
-
-        try:
-            data['memory'][sample_index] = int(sample.sensors
-                                               [sensor_info["id_number"]].
-                                               points[sensor_info
-                                                      ["memory_description"]]
-                                               ["value"])
-        except (KeyError, AttributeError, ):
-            pass
-
-        try:
-            data['interval'][sample_index] = int(sample.sensors
-                                                 [sensor_info["id_number"]].
-                                                 points[sensor_info
-                                                        ["interval_description"]]
-                                                 ["value"])
-        except (KeyError, AttributeError, ):
-            pass
-
-    return data
+def batch_parser(platform_info, sensor_info, filenames):
+    """
+    Parse and assign sponge data from many XML files, each streamed
+    from disk.
+    """
+    
+    return procutil.read_andi(filenames, sensor_info, POINTS)
 
 def creator(platform_info, sensor_info, data):
     #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
     # 
     title_str = sensor_info['description']+' at '+ sensor_info['location']
     global_atts = { 
@@ -194,9 +71,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : platform_info['project_url'],
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : procutil.es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : procutil.es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : nowDt.strftime("%Y-%m-%d %H:%M:%S"),
         'creation_date' : nowDt.strftime("%Y-%m-%d %H:%M:%S"),
         'modification_date' : nowDt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -353,9 +230,6 @@ def creator(platform_info, sensor_info, data):
         ('interval', pycdf.NC.INT, ('ntime',)),
                 )
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-    
     # var data 
     var_data = (
         ('time',     data['time'][i]),
@@ -376,11 +250,14 @@ def creator(platform_info, sensor_info, data):
     return (global_atts, var_atts, dim_inits, var_inits, var_data)
 
 def updater(platform_info, sensor_info, data):
+    #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
     #
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : procutil.es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : nowDt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : nowDt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -390,9 +267,6 @@ def updater(platform_info, sensor_info, data):
     # update any variable attributes like range, min, max
     var_atts = {}
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-    
     # data 
     var_data = (
         ('time',     data['time'][i]),
@@ -52,10 +52,19 @@ or
 from raw2proc import *
 from procutil import *
 from ncutil import *
+from waveutil import *
 
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
+# .wds of a long deployment can be larger than memory, so raw2proc
+# passes it memory-mapped (see raw2proc.RawMap) instead of read whole
+raw_mmap = True
+
+# dirs and freqs are the spectral axes, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('dirs', 'freqs')
+
 def parser(platform_info, sensor_info, lines):
     """
     parse and assign wave spectra data from RDI ADCP Dspec
@@ -87,7 +96,6 @@ def parser(platform_info, sensor_info, lines):
 
     import numpy
     from datetime import datetime
-    from time import strptime
 
     # get sample datetime from filename
     fn = sensor_info['fn']
@@ -96,308 +104,74 @@ def parser(platform_info, sensor_info, lines):
     # try getting sample date/times from .wap
     wap_fn = os.path.splitext(fn)[0] + ".wap"
     if os.path.exists(wap_fn):
-        wap_lines = load_data(wap_fn)
-
+        # columns month, day, year, hour, minute, second, ... pressure [17]
+        wap = read_block(load_mmap(wap_fn))
+        es = ymd2es(wap[:,2], wap[:,0], wap[:,1], wap[:,3], wap[:,4], wap[:,5])
+        es = utc_shift(es, sensor_info['utc_offset'])
         data = {
-            'dt' : numpy.array(numpy.ones((len(wap_lines),), dtype=object)*numpy.nan),
-            'time' : numpy.array(numpy.ones((len(wap_lines),), dtype=long)*numpy.nan),
-            'press' : numpy.array(numpy.ones((len(wap_lines),), dtype=float)*numpy.nan),
+            'time' : es,
+            # pressure (dbar) at tranducer height (?)
+            'press' : wap[:,17],
             }
-        i=0
-        
-        for line in wap_lines:
-            # split line and parse float and integers
-            wap = []
-            sw = re.split(' ', line)
-            for s in sw:
-                m = re.search(REAL_RE_STR, s)
-                if m:
-                    wap.append(float(m.groups()[0]))
-            
-            # get sample datetime from data
-            sample_str = '%02d-%02d-%4d %02d:%02d:%02d' % tuple(wap[0:6])
-            if  sensor_info['utc_offset']:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S') + \
-                            timedelta(hours=sensor_info['utc_offset'])
-            else:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S')
-
-            # these items can also be teased out of raw adcp but for now get from config file
-            # th = sensor_info['transducer_ht']  # Transducer height above bottom (meters)
-            
-            # pressure (dbar) converted to water depth
-            pressure = wap[17] # pressure (dbar) at tranducer height (?)
-            # water_depth = th + sw_dpth(pressure, lat)
-
-            data['dt'][i] = sample_dt
-            data['time'][i] = dt2es(sample_dt)
-            data['press'][i] = pressure # dbar
-            i=i+1
-
     else:
         print "error: No corresponding .wap file"
         print " .... skipping %s" % (fn,)
-        return data
+        return {'time' : numpy.array([], dtype='int64')}
 
     # assign specific fields
-    nbursts = len(data['dt'])
+    nbursts = len(data['time'])
     Df = 0.01 # (Hz)
     f = numpy.arange(0.02, 0.99, Df)
     nfreq = len(f)       # Number of frequencies (no units)
-
-    # Did we get the number of data rows that we expected?  Should equal nfreq
-    n = int(len(lines)/nfreq)
-    if n != nbursts:
-        print "Number of data rows %d does not match expected number %d" % (n, nbursts)
-        print " .... skipping %s" % (fn,)
-        return data
-                            
     Dtheta = 1.0 # degrees 
     D = numpy.arange(0.0, 360.0, 4)
     D = numpy.mod(D,360)
     ndir = len(D)  # Number of directions (no units)
 
+    # each directional burst in .wds is nfreq rows (one per freq) of
+    # ndir columns (one per direction) of Normalized-Energy/degree
+    wds = read_block(lines, ndir)
+    # Did we get the number of data rows that we expected?  Should equal nfreq
+    n = int(len(wds)/nfreq)
+    if n != nbursts or len(wds) != nbursts*nfreq:
+        print "Number of data rows %d does not match expected number %d" % (len(wds), nbursts*nfreq)
+        print " .... skipping %s" % (fn,)
+        return {'time' : numpy.array([], dtype='int64')}
+    wds = wds.reshape((nbursts, nfreq, ndir))
+
     # now get power spectra from .was 
     was_fn = os.path.splitext(fn)[0] + ".was"
     was_Sf = numpy.array(numpy.ones((nbursts,nfreq), dtype=float)*numpy.nan)
     if os.path.exists(was_fn):
-        was_lines = load_data(was_fn)
-
-        i=0
-        # first line is freq label for each column start at [1]
-        for line in was_lines[1:]: 
-            # split line and parse float and integers
-            was = []
-            sw = re.split(' ', line)
-            for s in sw:
-                m = re.search(REAL_RE_STR, s)
-                if m:
-                    was.append(float(m.groups()[0]))
-            
-            # just the frequencies we have in directional spectra [0:nfreq]
-            was_Sf[i] = was[0:nfreq] # (m^2/Hz) non-directional power spectrum for each sample time
-
-            i=i+1
-
+        # first line is freq label for each column
+        was_lines = load_mmap(was_fn)
+        was = read_block(was_lines, len(was_lines[0].split()), start=1)
+        # just the frequencies we have in directional spectra [0:nfreq]
+        # (m^2/Hz) non-directional power spectrum for each sample time
+        was_Sf[:len(was)] = was[:nbursts,:nfreq]
     else:
         print "error: No corresponding .was file"
         print " .... skipping %s" % (fn,)
-        return data
-        
+        return {'time' : numpy.array([], dtype='int64')}
+
+    # use power (m^2/Hz) at same time and freq from .was to get units of m^2/Hz/deg
+    Sxx = wds*was_Sf[:,:,numpy.newaxis]  # cross spectrum as m^2/Hz/deg
+
     # add these keys, value pairs to dictionary "data" already setup after reading .wap
-    data['dirs'] = numpy.array(numpy.ones((ndir,), dtype=float)*numpy.nan)
-    data['freqs'] = numpy.array(numpy.ones((nfreq,), dtype=float)*numpy.nan)
-    data['Sxx'] = numpy.array(numpy.ones((nbursts,nfreq,ndir), dtype=float)*numpy.nan)
-    data['Sf'] = numpy.array(numpy.ones((nbursts,nfreq), dtype=float)*numpy.nan)
-    data['Stheta'] = numpy.array(numpy.ones((nbursts,ndir), dtype=float)*numpy.nan)
-    data['Stheta_swell'] = numpy.array(numpy.ones((nbursts,ndir), dtype=float)*numpy.nan)
-    data['Stheta_wind'] = numpy.array(numpy.ones((nbursts,ndir), dtype=float)*numpy.nan)
-    data['Hs'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Hs_swell'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Hs_wind'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tm'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tm_swell'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tm_wind'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tp'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tp_swell'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Tp_wind'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dm'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dm_swell'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dm_wind'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dp'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dp_swell'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-    data['Dp_wind'] = numpy.array(numpy.ones((nbursts,), dtype=float)*numpy.nan)
-
-    # for each burst read nfreq lines
-    for j in range(nbursts):
-    
-        i = 0
-        Sxx = numpy.array(numpy.ones((nfreq,ndir), dtype=float)*numpy.nan)
-        # each line is a freq, each column is a direction
-        for line in lines[j*nfreq:nfreq*(j+1)]:
-            wds = []
-            # split line and parse float and integers
-            sw = re.split(' ', line)
-            for s in sw:
-                m = re.search(REAL_RE_STR, s)
-                if m:
-                    wds.append(float(m.groups()[0]))
-            
-            # wds[] is in units of Normalized-Energy/degree from .wds
-            # use power (m^2/Hz) at same time and freq from .was to get units of m^2/Hz/deg
-            if len(wds) == ndir:
-                Sxx[i,:] =  numpy.array(wds[:])*was_Sf[j,i]  # cross spectrum as m^2/Hz/deg
-                i = i+1
-
-        # Did we get the number of data rows that we expected?  Should equal nfreq
-        if i != nfreq:
-            print "Number of data rows %d does not match expected number %d" % (i, nfreq)
-
-
-        # NOTE make fupper location dependent?? (add to config_files??)
-        fupper = 0.65   # upper freq limit 0.65 Hz or wave periods less than T~1.538s
-        iswell = f<=1/10.               # swell band for T>10s
-        iwind = (f>1/10.) * (f<=fupper) # wind band 1/fupper<T<10s
-        # NOTE about python boolean overloaded operator '*' == and == bitwise_and()
-        iall = f<=fupper                # all wave freq upper limit
-
-        # compute non-directional spectrum by integrating over all angles
-        # Sxx(freq, dir)  sum axis=1 is along direction
-        Sf = Sxx.sum(axis=1)*Dtheta
-        # Sxx(freq, dir)  axis=0 is along freq 
-        Stheta = Sxx[iall].sum(axis=0)*Df
-        Stheta_s = Sxx[iswell].sum(axis=0)*Df
-        Stheta_w = Sxx[iwind].sum(axis=0)*Df
-
-        # compute zeroth-, first- and second-moment from the non-directional spectrum
-        # all frequency ranges
-        m0 = Sf[iall].sum()*Df
-        m1 = (f[iall]*Sf[iall]).sum()*Df
-        m2 = ((f[iall]**2)*Sf[iall]).sum()*Df
-        # swell band
-        m0s = Sf[iswell].sum()*Df
-        m1s = (f[iswell]*Sf[iswell]).sum()*Df
-        m2s = ((f[iswell]**2)*Sf[iswell]).sum()*Df
-        # wind band
-        m0w = Sf[iwind].sum()*Df
-        m1w = (f[iwind]*Sf[iwind]).sum()*Df
-        m2w = ((f[iwind]**2)*Sf[iwind]).sum()*Df
-        
-        # Significant Wave Height (Hs)
-        Hs = 4*numpy.sqrt(m0)
-        Hss = 4*numpy.sqrt(m0s)
-        Hsw = 4*numpy.sqrt(m0w)
-
-        # Mean Wave Period (Tm)
-        Tm = m0/m1
-        Tms = m0s/m1s
-        Tmw = m0w/m1w
-        
-        # Peak Wave Period (Tp)
-        # imax = Sf[iall]==Sf[iall].max()
-        # Fp = f(imax)
-        # Tp = 1/Fp[0]
-        # This wave parameters added by SH (not in GV's matlab script)
-        # one-liner version of above
-        # Tp = 1/(f[Sf[iall]==Sf[iall].max()][0])
-        # Tps = 1/(f[Sf[iswell]==Sf[iswell].max()][0])
-        # Tpw = 1/(f[Sf[iwind]==Sf[iwind].max()][0])
-        imax = Sf[iall]==Sf[iall].max()
-        Tp = 1/(f[imax][0])
-        imax = Sf[iswell]==Sf[iswell].max()
-        Tps = 1/(f[imax][0])
-    
-        imax = Sf[iwind]==Sf[iwind].max()
-        # account for offset of iwind by iswell in finding peak wind freq
-        nswell = len(f[iswell])
-        false_swell = numpy.array([False for i in range(nswell)])
-        imax = numpy.concatenate((false_swell,imax))
-        Tpw = 1/(f[imax][0])
-        
-        # mean direction of wave approach used by Kuik et al (1989)
-        # Mean wave direction as a function of frequency
-        # for all freq, wind and swell bands as adapted from GV's code
-        # (polar_waves_cur_wds.m, version 8)
-        pi = numpy.pi
-        ac1 = numpy.cos(D*pi/180)
-        as1 = numpy.sin(D*pi/180)
-        
-        ch0 = (ac1*Stheta*Dtheta).sum()
-        sh0 = (as1*Stheta*Dtheta).sum()
-        Dm = numpy.arctan2(sh0,ch0)*180/pi
-        if Dm<0: Dm = Dm+360. 
-        
-        ch0s = (ac1*Stheta_s*Dtheta).sum()
-        sh0s = (as1*Stheta_s*Dtheta).sum()
-        Dms = numpy.arctan2(sh0s,ch0s)*180/pi
-        if Dms<0: Dms = Dms+360.
-        
-        ch0w = (ac1*Stheta_w*Dtheta).sum()
-        sh0w = (as1*Stheta_w*Dtheta).sum()
-        Dmw = numpy.arctan2(sh0w,ch0w)*180/pi
-        if Dmw<0: Dmw = Dmw+360.
-
-        # Peak Wave Direction (Dp) defined as the direction which
-        # corresponds to the "Peak frequency", or Fp.  Peak frequency is the
-        # frequency at which the "Spectral density function" is at a
-        # maximum.  The spectral density function gives the dependence
-        # with frequency of the energy of the waves considered.  also
-        # known as the one-dimensional spectrum or energy spectrum.
-        # Definitions from Metocean Glossary
-        # http://www.ifremer.fr/web-com/glossary
-        #
-        # This wave parameter added by SH (not in GV's matlab script)
-        imax = Sf[iall]==Sf[iall].max()
-        idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-        if len(idir.shape)==2: idir = idir[0]
-        if idir.any(): Dp = D[idir][0]
-        else: Dp = numpy.nan
-        
-        imax = Sf[iswell]==Sf[iswell].max()
-        idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-        if len(idir.shape)==2: idir = idir[0]
-        if idir.any(): Dps = D[idir][0]
-        else: Dps = numpy.nan
-        
-        imax = Sf[iwind]==Sf[iwind].max()
-        idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-        if len(idir.shape)==2: idir = idir[0]
-        if idir.any(): Dpw = D[idir][0]
-        else: Dpw = numpy.nan
-        
-        # ---------------------------------------------------------------
-        # data['dt'][j] =  sample_dt # already have
-        data['dirs'] = D
-        data['freqs'] = f
-        
-        data['Sxx'][j] = Sxx # full directional spectrum (m^2/Hz/deg)
-        data['Sf'][j] = Sf   # non-directional spectrum (m^2/Hz)
-        data['Stheta'][j] = Stheta # Energy from all freq from each direction
-        data['Stheta_swell'][j] = Stheta_s
-        data['Stheta_wind'][j] = Stheta_w
-        
-        data['Hs'][j] = Hs
-        data['Hs_swell'][j] = Hss    
-        data['Hs_wind'][j] = Hsw
-        
-        data['Tm'][j] = Tm
-        data['Tm_swell'][j] = Tms    
-        data['Tm_wind'][j] = Tmw
-        
-        data['Tp'][j] = Tp
-        data['Tp_swell'][j] = Tps    
-        data['Tp_wind'][j] = Tpw
-        
-        data['Dm'][j] = Dm
-        data['Dm_swell'][j] = Dms    
-        data['Dm_wind'][j] = Dmw
-        
-        data['Dp'][j] = Dp
-        data['Dp_swell'][j] = Dps    
-        data['Dp_wind'][j] = Dpw
-        
-        # if j==0:
-        #     print " Hs(m)\t Tp(s)\t Tm(s)\t Dp(N)\t Dm(N)"
-        # else: 
-        #     print "%.2g\t %.2g\t %.2g\t %g\t %g" % (Hs, Tp, Tm, Dp, Dm)
-        #     print "%.2g\t %.2g\t %.2g\t %g\t %g" % (Hss, Tps, Tms, Dps, Dms)
-        #     print "%.2g\t %.2g\t %.2g\t %g\t %g" % (Hsw, Tpw, Tmw, Dpw, Dmw)
-           
-        # print "  Waves: All / Swell / Wind -- burst %d, start %d, end %d" % (j, j*nfreq, nfreq*(j+1))
-        # print " Hs (m): %g /%g /%g" % (Hs, Hss, Hsw)
-        # print " Tp (s): %g /%g /%g" % (Tp, Tps, Tpw)
-        # print " Tm (s): %g /%g /%g" % (Tm, Tms, Tmw)
-        # print " Dp (N): %g /%g /%g" % (Dp, Dps, Dpw)
-        # print " Dm (N): %g /%g /%g" % (Dm, Dms, Dmw)
-
-        del Sxx, Sf, Stheta, Stheta_w, Stheta_s
-    # for each burst
+    data['dirs'] = D
+    data['freqs'] = f
+    data['Sxx'] = Sxx # full directional spectrum (m^2/Hz/deg)
+    (fswell, fupper) = wave_bands(sensor_info)
+    data.update(wave_stats(f, D, Sxx, Df, Dtheta, fswell, fupper))
 
     return data
 
 def creator(platform_info, sensor_info, data):
     #
     # 
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     title_str = sensor_info['description']+' at '+ platform_info['location']
     global_atts = { 
         'title' : title_str,
@@ -422,8 +196,8 @@ def creator(platform_info, sensor_info, data):
         'project' : 'North Carolina Coastal Ocean Observing System (NCCOOS)',
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -651,9 +425,6 @@ def creator(platform_info, sensor_info, data):
         ('Dm_wind', NC.FLOAT, ('ntime',)),
         )
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # var data 
     var_data = (
         ('lat',  platform_info['lat']),
@@ -688,11 +459,14 @@ def creator(platform_info, sensor_info, data):
     return (global_atts, var_atts, dim_inits, var_inits, var_data)
 
 def updater(platform_info, sensor_info, data):
+    #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
     #
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -710,9 +484,6 @@ def updater(platform_info, sensor_info, data):
     #          },
     #    }
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # data 
     var_data = (
         ('time', data['time'][i]),
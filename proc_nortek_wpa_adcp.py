@@ -32,7 +32,9 @@ from raw2proc import *
 from procutil import *
 from ncutil import *
 
-import seawater
+# z is the bin elevation, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('z',)
 
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
@@ -69,29 +71,13 @@ def parser(platform_info, sensor_info, lines):
 
 
     """
+    import seawater
 
     # get sample datetime from filename
     fn = sensor_info['fn']
     sample_dt_start = filt_datetime(fn)
 
     nbins = sensor_info['nbins']  # Number of bins in data
-    nbursts = len(lines)/(nbins+1)
-
-    data = {
-        'dt' : numpy.array(numpy.ones((nbursts,), dtype=object)*numpy.nan),
-        'time' : numpy.array(numpy.ones((nbursts,), dtype=long)*numpy.nan),
-        'z' : numpy.array(numpy.ones((nbins,), dtype=float)*numpy.nan),
-        'u' : numpy.array(numpy.ones((nbursts,nbins), dtype=float)*numpy.nan),
-        'v' : numpy.array(numpy.ones((nbursts,nbins), dtype=float)*numpy.nan),
-        'w' : numpy.array(numpy.ones((nbursts,nbins), dtype=float)*numpy.nan),
-        'e1' : numpy.array(numpy.ones((nbursts,nbins), dtype=int)*numpy.nan),
-        'e2' : numpy.array(numpy.ones((nbursts,nbins), dtype=int)*numpy.nan),
-        'e3' : numpy.array(numpy.ones((nbursts,nbins), dtype=int)*numpy.nan),
-        'wd' : numpy.array(numpy.ones((nbursts), dtype=float)*numpy.nan),
-        'wl' : numpy.array(numpy.ones((nbursts), dtype=float)*numpy.nan),
-        'water_temp' : numpy.array(numpy.ones((nbursts), dtype=float)*numpy.nan),
-        'pressure' : numpy.array(numpy.ones((nbursts), dtype=float)*numpy.nan),
-        }
 
     # these items can also be teased out of raw adcp but for now get from config file
     th = sensor_info['transducer_ht']  # Transducer height above bottom (meters)
@@ -115,121 +101,112 @@ def parser(platform_info, sensor_info, lines):
     # are adjusted for beam angle in ascii output.
     iaboveblank = bin_habs > th+bh+(bin_size)
 
-    # current profile count
-    i = 0 
-
-    wpa = []
-    for line in lines:
-        wpa = []
-        # split line and parse float and integers
-        sw = re.split(' ', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                wpa.append(float(m.groups()[0]))
-
-        if len(wpa)==19:                                                                             
-            # get sample datetime from data
-            sample_str = '%02d-%02d-%4d %02d:%02d:%02d' % tuple(wpa[0:6])
-            if  sensor_info['utc_offset']:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S') + \
-                            timedelta(hours=sensor_info['utc_offset'])
-            else:
-                sample_dt = scanf_datetime(sample_str, fmt='%m-%d-%Y %H:%M:%S')
-            
-            # these items can also be teased out of raw adcp but for now get from config file
-            # th = sensor_info['transducer_ht']  # Transducer height above bottom (meters)
-            
-            error_code = int(wpa[6])
-            status_code = int(wpa[7])
-            battery_voltage = wpa[8] # volts
-            sound_speed = wpa[9]     # m/s
-            heading = wpa[10]        # deg
-            pitch = wpa[11]          # deg
-            roll = wpa[12]           # deg
-            
-            pressure = wpa[13]       # dbar
-            # pressure (dbar) converted to water depth
-            wd = th + seawater.depth(pressure, platform_info['lat']) # m
-            temperature = wpa[14]       # deg C
-
-            start_bin = int(wpa[17])     # first good bin from transducer (?)
-            wpa_nbins = int(wpa[18])     # Number of bins
-            # check this is same as in sensor_info
-
-            # initialize for new profile
-            hab = numpy.ones(nbins)*numpy.nan
-            spd = numpy.ones(nbins)*numpy.nan
-            dir = numpy.ones(nbins)*numpy.nan
-            u = numpy.ones(nbins)*numpy.nan
-            v = numpy.ones(nbins)*numpy.nan
-            w = numpy.ones(nbins)*numpy.nan
-            e1 = numpy.array(numpy.ones((nbins), dtype=int)*numpy.nan)
-            e2 = numpy.array(numpy.ones((nbins), dtype=int)*numpy.nan)
-            e3 = numpy.array(numpy.ones((nbins), dtype=int)*numpy.nan)
-
-        elif len(wpa)==10:
-            # current profile data at  each bin
-            bin_number = wpa[0]
-            j = wpa[0]-1
-            # print j
-            hab[j] = wpa[1]
-            
-            spd[j] = wpa[2] # m/s
-            dir[j] = wpa[3] # deg N
-
-            u[j] = wpa[4] # m/s
-            v[j] = wpa[5] # m/s
-            w[j] = wpa[6] # m/s
-
-            e1[j] = int(wpa[7]) # echo dB ??
-            e2[j] = int(wpa[8]) # 
-            e3[j] = int(wpa[9]) #
-
-            # ibad = (current_spd==-32768) | (current_dir==-32768)
-            # current_spd[ibad] = numpy.nan
-            # current_dir[ibad] = numpy.nan
-
-            # if done reading profile, just read data for last bin
-            if bin_number==nbins:
-                # compute water mask
-                # if positive is up, in water is less than zero depth
-                bin_depths =  (bin_habs)-(wd)
-                iwater = bin_depths+bin_size/2 < 0
-                iwater = iwater*iaboveblank
-                
-                # use nominal water depth (MSL) averaged from full pressure record
-                #  this should be checked/recalulated every so often
-                z = bin_habs+platform_info['mean_water_depth']
-                
-                data['dt'][i] = sample_dt # sample datetime
-                data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-                data['z'] =  z
-                data['wd'][i] = -1*wd
-                data['wl'][i] = platform_info['mean_water_depth'] - (-1*wd)
-                data['water_temp'][i] = temperature
-                data['pressure'][i] = pressure
-                
-                data['u'][i][iwater] =  u[iwater]
-                data['v'][i][iwater] =  v[iwater]
-                data['w'][i][iwater] =  w[iwater]
-
-                data['e1'][i] =  e1
-                data['e2'][i] =  e2
-                data['e3'][i] =  e3
-
-                # ready for next burst
-                i = i+1
-            # if j+1==nbins
-        # if len(wpa)==19 elif ==10
-    # for line
+    # split lines into header rows (19 fields) and bin rows (10 fields)
+    # by number of fields, in one pass
+    (hdr_idx, hdr, bin_idx, rows) = wpa_rows(lines)
+
+    # profile of each bin row is the last header before it
+    owner = numpy.searchsorted(hdr_idx, bin_idx, side='right') - 1
+    j = rows[:,0].astype(int) - 1
+    ok = (owner >= 0) & (j >= 0) & (j < nbins)
+
+    # current profile data at each bin (nprofile, nbins, 10)
+    #  NBIN  DEPTH   SPEED    DIR       U         V       W    E1? E2? E3?
+    wpa = numpy.ones((len(hdr), nbins, 10), dtype=float)*numpy.nan
+    wpa[owner[ok], j[ok]] = rows[ok]
+
+    # profile is done when data for last bin is read
+    done = wpa[:,nbins-1,0]==nbins
+    hdr = hdr[done]
+    wpa = wpa[done]
+
+    # get sample datetime from data
+    #  MM DD YYYY HH MM SS  ERR STATUS BATT SNDSPD HDG  PITCH  ROLL  PRESS   WTEMP    ??  ?? TBIN BBIN
+    es = ymd2es(hdr[:,2], hdr[:,0], hdr[:,1], hdr[:,3], hdr[:,4], hdr[:,5])
+    es = utc_shift(es, sensor_info['utc_offset'])
+
+    # error_code = hdr[:,6]
+    # status_code = hdr[:,7]
+    # battery_voltage = hdr[:,8] # volts
+    # sound_speed = hdr[:,9]     # m/s
+    # heading = hdr[:,10]        # deg
+    # pitch = hdr[:,11]          # deg
+    # roll = hdr[:,12]           # deg
+    pressure = hdr[:,13]       # dbar
+    temperature = hdr[:,14]    # deg C
+    # start_bin = hdr[:,17]    # first good bin from transducer (?)
+    # wpa_nbins = hdr[:,18]    # Number of bins
+
+    # pressure (dbar) converted to water depth
+    wd = th + seawater.depth(pressure, platform_info['lat']) # m
+
+    # compute water mask
+    # if positive is up, in water is less than zero depth
+    bin_depths =  bin_habs[numpy.newaxis,:]-wd[:,numpy.newaxis]
+    iwater = (bin_depths+bin_size/2 < 0) & iaboveblank
+
+    # use nominal water depth (MSL) averaged from full pressure record
+    #  this should be checked/recalulated every so often
+    z = bin_habs+platform_info['mean_water_depth']
+
+    data = {
+        'time' : es, # sample time in epoch seconds
+        'z' : z,
+        'u' : numpy.where(iwater, wpa[:,:,4], numpy.nan), # m/s
+        'v' : numpy.where(iwater, wpa[:,:,5], numpy.nan), # m/s
+        'w' : numpy.where(iwater, wpa[:,:,6], numpy.nan), # m/s
+        'e1' : numpy.trunc(wpa[:,:,7]), # echo dB ??
+        'e2' : numpy.trunc(wpa[:,:,8]),
+        'e3' : numpy.trunc(wpa[:,:,9]),
+        'wd' : -1*wd,
+        'wl' : platform_info['mean_water_depth'] - (-1*wd),
+        'water_temp' : temperature,
+        'pressure' : pressure,
+        }
 
     return data
  
+# line of numbers only, so split on blanks gives same fields as REAL_RE_STR
+NUMBERS_RE = re.compile('^[\s\d.eE+-]*$')
+
+def wpa_rows(lines):
+    """
+    split .wpa lines into header rows (19 fields) and bin rows (10
+    fields) in one pass
+
+    Lines of numbers are split on blanks and each kind read as one
+    block.  Any other line is read as before, each token searched for
+    a number and tokens without one skipped.
+
+    :Returns:
+       (hdr_idx, hdr, bin_idx, rows) : tuple of numpy.array
+           Line index and numbers of header rows (nhdr, 19) and of bin
+           rows (nrows, 10)
+    """
+    kinds = {19 : [], 10 : []}
+    for k, line in enumerate(lines):
+        f = line.split()
+        if not NUMBERS_RE.match(line):
+            f = []
+            for s in re.split(' ', line):
+                m = re.search(REAL_RE_STR, s)
+                if m:
+                    f.append(m.groups()[0])
+        if len(f) in kinds:
+            kinds[len(f)].append((k, f))
+    out = ()
+    for n in (19, 10):
+        idx = numpy.array([k for (k, f) in kinds[n]], dtype=int)
+        rows = numpy.array([f for (k, f) in kinds[n]], dtype=float)
+        out = out + (idx, rows.reshape((len(idx), n)))
+    return out
 
 def creator(platform_info, sensor_info, data):
     #
     # 
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     title_str = sensor_info['description']+' at '+ platform_info['location']
 
     if 'mean_water_depth' in platform_info.keys():
@@ -265,9 +242,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         # 
         'mean_water_depth' : msl_str,
@@ -409,9 +386,6 @@ def creator(platform_info, sensor_info, data):
         ('water_temp', NC.FLOAT, ('ntime',)),
         )
 
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-    
     # var data 
     var_data = (
         ('lat',  platform_info['lat']),
@@ -435,10 +409,13 @@ def creator(platform_info, sensor_info, data):
 
 def updater(platform_info, sensor_info, data):
     #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -456,9 +433,6 @@ def updater(platform_info, sensor_info, data):
     #          },
     #    }
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # data 
     var_data = (
         ('time', data['time'][i]),
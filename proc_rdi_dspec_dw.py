@@ -49,38 +49,26 @@ or
 from raw2proc import *
 from procutil import *
 from ncutil import *
+from waveutil import *
+
+# dirs and freqs are the spectral axes, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('dirs', 'freqs')
 
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
-def parser(platform_info, sensor_info, lines):
+def read_dspec(sensor_info, fn, lines):
     """
-    parse and assign wave spectra data from RDI ADCP Dspec
-    and compute wave statistics and parameters
-
-    Notes
-    -----
-    1. adapted from polar_waves_cur_rdi.m  (Version 8 - February 14, 2005)
-       by George Voulgaris
-       Coastal Processes & Sediment Dynamics Lab
-       Department of Geological Sciences
-       University of South Carolina, Columbia, SC 29205
-       Email: gvoulgaris@geol.sc.edu
-    1. should only be one line in each file of comma-delimited data
+    read frequencies, directions and directional spectrum from lines
+    of one RDI Dspec file
 
+    :Returns:
+       (D, f, Df, Dtheta, Sxx) : tuple
+           Sxx (nfreq, ndir) in m^2/Hz/deg, None if number of data rows
+           does not match number of frequencies in header
     """
     import numpy
-    from datetime import datetime
-    from time import strptime
-
-    # get sample datetime from filename
-    fn = sensor_info['fn']
-    # print " ... %s" % (fn,)
-    if  sensor_info['utc_offset']:
-        sample_dt = filt_datetime(fn) + \
-                    timedelta(hours=sensor_info['utc_offset'])
-    else:
-        sample_dt = filt_datetime(fn)
 
     # extract header (first 6 lines)
     rdi = []
@@ -94,8 +82,8 @@ def parser(platform_info, sensor_info, lines):
 
     # assign specific fields
     n = len(rdi)
-    ndir = float(rdi[0])  # Number of directions (no units)
-    nfreq = float(rdi[1]) # Number of frequencies (no units)
+    ndir = int(rdi[0])  # Number of directions (no units)
+    nfreq = int(rdi[1]) # Number of frequencies (no units)
     freq_bw = float(rdi[2])    # Frequency bandwidth (Hz)
     Do = float(rdi[3])  # Starting direction (degrees from True North)
 
@@ -120,9 +108,52 @@ def parser(platform_info, sensor_info, lines):
         # frequency resolution should be the same as freq_bw
         print "Df (%f) not equal to freq_bw (%f)" % (Df, freq_bw)
 
+    # each line is a freq, each column is a direction
+    Sxx = read_block(lines, ndir, start=6)
+
+    # Did we get the number of data rows that we expected?  Should equal nfreq
+    if len(Sxx) != nfreq:
+        print "Number of data rows %d does not match expected number %d" % (len(Sxx), nfreq)
+        print " .... skipping %s" % (fn,)
+        return (D, f, Df, Dtheta, None)
+
+    Sxx = Sxx/360./1000./1000. # convert cross spectrum to units of m^2/Hz/deg
+    return (D, f, Df, Dtheta, Sxx)
+
+def parser(platform_info, sensor_info, lines):
+    """
+    parse and assign wave spectra data from RDI ADCP Dspec
+    and compute wave statistics and parameters
+
+    Notes
+    -----
+    1. adapted from polar_waves_cur_rdi.m  (Version 8 - February 14, 2005)
+       by George Voulgaris
+       Coastal Processes & Sediment Dynamics Lab
+       Department of Geological Sciences
+       University of South Carolina, Columbia, SC 29205
+       Email: gvoulgaris@geol.sc.edu
+    1. should only be one line in each file of comma-delimited data
+
+    """
+    import numpy
+    from datetime import datetime
+
+    # get sample datetime from filename
+    fn = sensor_info['fn']
+    # print " ... %s" % (fn,)
+    if  sensor_info['utc_offset']:
+        sample_dt = filt_datetime(fn) + \
+                    timedelta(hours=sensor_info['utc_offset'])
+    else:
+        sample_dt = filt_datetime(fn)
+
+    (D, f, Df, Dtheta, Sxx) = read_dspec(sensor_info, fn, lines)
+    ndir = len(D)
+    nfreq = len(f)
+
     # set up dict of data
     data = {
-        'dt' : numpy.array(numpy.ones((1,), dtype=object)*numpy.nan),
         'time' : numpy.array(numpy.ones((1,), dtype=long)*numpy.nan),
         'dirs' : numpy.array(numpy.ones((ndir,), dtype=float)*numpy.nan),
         'freqs' : numpy.array(numpy.ones((nfreq,), dtype=float)*numpy.nan),
@@ -148,179 +179,80 @@ def parser(platform_info, sensor_info, lines):
         'Dp_wind' : numpy.array(numpy.ones((1,), dtype=float)*numpy.nan),
         }
 
-    # throw a dummy datetime into dt so we can return data with no data
-    # if we encounter an unrecoverable error while parsing the file
-    data['dt'][:] = datetime(1970,1,1,0,0,0)
-
-    j = 0
-    Sxx = numpy.array(numpy.ones((nfreq,ndir), dtype=float)*numpy.nan)
-    # each line is a freq, each column is a direction
-    for line in lines[6:]:
-        rdi = []
-        # split line and parse float and integers
-        sw = re.split(' ', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                rdi.append(float(m.groups()[0]))
-
-        if len(rdi) == ndir:
-            Sxx[j][:] =  numpy.array(rdi[:])  # cross spectrum as mm^2/Hz/deg
-            j = j+1
-
-    # Did we get the number of data rows that we expected?  Should equal nfreq
-    if j != nfreq:
-        print "Number of data rows %d does not match expected number %d" % (j, nfreq)
-        print " .... skipping %s" % (fn,)
+    # no time (NaN) so record is not in any month if we encounter an
+    # unrecoverable error while parsing the file
+    if Sxx is None:
         return data
 
-    Sxx = Sxx/360./1000./1000. # convert cross spectrum to units of m^2/Hz/deg
-    # NOTE make fupper location dependent?? (add to config_files??)
-    fupper = 0.65   # upper freq limit 0.65 Hz or wave periods less than T~1.538s
-    iswell = f<=1/10.               # swell band for T>10s
-    iwind = (f>1/10.) * (f<=fupper) # wind band 1/fupper<T<10s
-    # NOTE about python boolean overloaded operator '*' == and == bitwise_and()
-    iall = f<=fupper                # all wave freq upper limit
-
-    # compute non-directional spectrum by integrating over all angles
-    # Sxx(freq, dir)  sum axis=1 is along direction
-    Sf = Sxx.sum(axis=1)*Dtheta
-    # Sxx(freq, dir)  axis=0 is along freq 
-    Stheta = Sxx[iall].sum(axis=0)*Df
-    Stheta_s = Sxx[iswell].sum(axis=0)*Df
-    Stheta_w = Sxx[iwind].sum(axis=0)*Df
-
-    # compute zeroth-, first- and second-moment from the non-directional spectrum
-    # all frequency ranges
-    m0 = Sf[iall].sum()*Df
-    m1 = (f[iall]*Sf[iall]).sum()*Df
-    m2 = ((f[iall]**2)*Sf[iall]).sum()*Df
-    # swell band
-    m0s = Sf[iswell].sum()*Df
-    m1s = (f[iswell]*Sf[iswell]).sum()*Df
-    m2s = ((f[iswell]**2)*Sf[iswell]).sum()*Df
-    # wind band
-    m0w = Sf[iwind].sum()*Df
-    m1w = (f[iwind]*Sf[iwind]).sum()*Df
-    m2w = ((f[iwind]**2)*Sf[iwind]).sum()*Df
-
-    # Significant Wave Height (Hs)
-    Hs = 4*numpy.sqrt(m0)
-    Hss = 4*numpy.sqrt(m0s)
-    Hsw = 4*numpy.sqrt(m0w)
-
-    # Mean Wave Period (Tm)
-    Tm = m0/m1
-    Tms = m0s/m1s
-    Tmw = m0w/m1w
-
-    # Peak Wave Period (Tp)
-    # imax = Sf[iall]==Sf[iall].max()
-    # Fp = f(imax)
-    # Tp = 1/Fp[0]
-    # This wave parameters added by SH (not in GV's matlab script)
-    # one-liner version of above
-    Tp = 1/(f[Sf[iall]==Sf[iall].max()][0])
-    Tps = 1/(f[Sf[iswell]==Sf[iswell].max()][0])
-
-    # account for offset of iwind by iswell in finding peak wind freq
-    nswell = len(f[iswell])
-    false_swell = numpy.array([False for i in range(nswell)])
-    imax = Sf[iwind]==Sf[iwind].max()
-    imax = numpy.concatenate((false_swell,imax))
-    Tpw = 1/(f[imax][0])
-
-    # mean direction of wave approach used by Kuik et al (1989)
-    # Mean wave direction as a function of frequency
-    # for all freq, wind and swell bands as adapted from GV's code
-    # (polar_waves_cur_rdi.m, version 8)
-    pi = numpy.pi
-    ac1 = numpy.cos(D*pi/180)
-    as1 = numpy.sin(D*pi/180)
-
-    ch0 = (ac1*Stheta*Dtheta).sum()
-    sh0 = (as1*Stheta*Dtheta).sum()
-    Dm = numpy.arctan2(sh0,ch0)*180/pi
-    if Dm<0: Dm = Dm+360. 
-
-    ch0s = (ac1*Stheta_s*Dtheta).sum()
-    sh0s = (as1*Stheta_s*Dtheta).sum()
-    Dms = numpy.arctan2(sh0s,ch0s)*180/pi
-    if Dms<0: Dms = Dms+360.
-
-    ch0w = (ac1*Stheta_w*Dtheta).sum()
-    sh0w = (as1*Stheta_w*Dtheta).sum()
-    Dmw = numpy.arctan2(sh0w,ch0w)*180/pi
-    if Dmw<0: Dmw = Dmw+360.
-
-    # Peak Wave Direction (Dp) defined as the direction which
-    # corresponds to the "Peak frequency", or Fp.  Peak frequency is the
-    # frequency at which the "Spectral density function" is at a
-    # maximum.  The spectral density function gives the dependence
-    # with frequency of the energy of the waves considered.  also
-    # known as the one-dimensional spectrum or energy spectrum.
-    # Definitions from Metocean Glossary
-    # http://www.ifremer.fr/web-com/glossary
-    #
-    # This wave parameter added by SH (not in GV's matlab script)
-    imax = Sf[iall]==Sf[iall].max()
-    idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-    # print idir.shape
-    Dp = D[idir][0]
-    
-    imax = Sf[iswell]==Sf[iswell].max()
-    idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-    Dps = D[idir][0]
-    
-    imax = Sf[iwind]==Sf[iwind].max()
-    # account for swell offset of swell freq in finding max wind freq
-    imax = numpy.concatenate((false_swell, imax))
-    idir = numpy.squeeze(Sxx[imax,:]==Sxx[imax,:].max())
-    Dpw = D[idir][0]
-
     #---------------------------------------------------------------
-    data['dt'][0] =  sample_dt
     data['time'][0] = dt2es(sample_dt) # sample time in epoch seconds
     data['dirs'] = D
     data['freqs'] = f
 
     data['Sxx'][0] = Sxx # full directional spectrum (m^2/Hz/deg)
-    data['Sf'][0] = Sf   # non-directional spectrum (m^2/Hz)
-    data['Stheta'][0] = Stheta # Energy from all freq from each direction
-    data['Stheta_swell'][0] = Stheta_s
-    data['Stheta_wind'][0] = Stheta_w
-
-    data['Hs'][0] = Hs
-    data['Hs_swell'][0] = Hss    
-    data['Hs_wind'][0] = Hsw
-
-    data['Tm'][0] = Tm
-    data['Tm_swell'][0] = Tms    
-    data['Tm_wind'][0] = Tmw
-
-    data['Tp'][0] = Tp
-    data['Tp_swell'][0] = Tps    
-    data['Tp_wind'][0] = Tpw
-
-    data['Dm'][0] = Dm
-    data['Dm_swell'][0] = Dms    
-    data['Dm_wind'][0] = Dmw
-
-    data['Dp'][0] = Dp
-    data['Dp_swell'][0] = Dps    
-    data['Dp_wind'][0] = Dpw
-
-    # print "  Waves: All / Swell / Wind"
-    # print " Hs (m): %g /%g /%g" % (Hs, Hss, Hsw)
-    # print " Tm (s): %g /%g /%g" % (Tm, Tms, Tmw)
-    # print " Dm (N): %g /%g /%g" % (Dm, Dms, Dmw)
-    # print " Dp (N): %g /%g /%g" % (Dp, Dps, Dpw)
- 
+    (fswell, fupper) = wave_bands(sensor_info)
+    data.update(wave_stats(f, D, data['Sxx'], Df, Dtheta, fswell, fupper))
+
+    return data
+
+def batch_parser(platform_info, sensor_info, filenames):
+    """
+    parse many Dspec files (one burst each) into one stack of spectra
+    and compute wave statistics of all bursts at once
+
+    Sample time of each burst is from its file name (see
+    filt_datetime()).  Files that cannot be read or whose frequencies
+    and directions differ from the first file read are skipped.
+
+    :Returns:
+       data : dict
+           Same keys as from parser(), one record per burst
+    """
+    import numpy
+
+    es = []; stack = []
+    (D, f) = (None, None)
+    for fn in filenames:
+        lines = load_data(fn)
+        if not lines or len(lines)<6:
+            continue
+        sample_dt = filt_datetime(fn)
+        if sample_dt is None:
+            continue
+        (Di, fi, Df, Dtheta, Sxx) = read_dspec(sensor_info, fn, lines)
+        if Sxx is None:
+            continue
+        if D is None:
+            (D, f) = (Di, fi)
+        elif Di.shape!=D.shape or fi.shape!=f.shape or \
+                 (Di!=D).any() or (fi!=f).any():
+            print " .... freq or dir differ from %s, skipping %s" % (filenames[0], fn)
+            continue
+        es.append(dt2es(sample_dt))
+        stack.append(Sxx)
+
+    if not stack:
+        # nothing in month, so no records
+        return {'time' : numpy.array([], dtype='int64')}
+
+    data = {
+        'time' : utc_shift(numpy.array(es, dtype='int64'), sensor_info['utc_offset']),
+        'dirs' : D,
+        'freqs' : f,
+        'Sxx' : numpy.array(stack),
+        }
+    del stack
+    (fswell, fupper) = wave_bands(sensor_info)
+    data.update(wave_stats(f, D, data['Sxx'], 1./len(f), 360./len(D), fswell, fupper))
+
     return data
 
 def creator(platform_info, sensor_info, data):
     #
     # 
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     title_str = sensor_info['description']+' at '+ platform_info['location']
     global_atts = { 
         'title' : title_str,
@@ -345,8 +277,8 @@ def creator(platform_info, sensor_info, data):
         'project' : 'North Carolina Coastal Ocean Observing System (NCCOOS)',
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'creation_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -574,9 +506,6 @@ def creator(platform_info, sensor_info, data):
         ('Dm_wind', NC.FLOAT, ('ntime',)),
         )
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # var data 
     var_data = (
         ('lat',  platform_info['lat']),
@@ -612,10 +541,13 @@ def creator(platform_info, sensor_info, data):
 
 def updater(platform_info, sensor_info, data):
     #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -633,9 +565,6 @@ def updater(platform_info, sensor_info, data):
     #          },
     #    }
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # data 
     var_data = (
         ('time', data['time'][i]),
@@ -32,128 +32,156 @@ from raw2proc import *
 from procutil import *
 from ncutil import *
 
+# z is the bin elevation, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('z',)
+
 now_dt = datetime.utcnow()
 now_dt.replace(microsecond=0)
 
-def parser(platform_info, sensor_info, lines):
-    """
-    parse and assign currents data from RDI ADCP Log Data
+# {(transducer_ht, blanking_ht, bin_size, nbins, mean_water_depth) : (bin_habs, z)}
+bin_geometry_cache = {}
 
+def bin_geometry(platform_info, sensor_info, nbins):
     """
- 
-    i = 0
-   
-    for line in lines:
-        # split line and parse float and integers
-        rdi = []
-        sw = re.split(',', line)
-        for s in sw:
-            m = re.search(REAL_RE_STR, s)
-            if m:
-                rdi.append(float(m.groups()[0]))
-
-        # assign specific fields
-        n = len(rdi)
-        burst_num = int(rdi[0]) # Ensemble Number
-
-        # get sample datetime from data
-        sample_str = '%02d-%02d-%02d %02d:%02d:%02d' % tuple(rdi[1:7])
-        if  sensor_info['utc_offset']:
-            sample_dt = scanf_datetime(sample_str, fmt='%y-%m-%d %H:%M:%S') + \
-                        timedelta(hours=sensor_info['utc_offset'])
-        else:
-            sample_dt = scanf_datetime(sample_str, fmt='%y-%m-%d %H:%M:%S')
-        #   datetime(*strptime(sample_str, "%y-%m-%d %H:%M:%S")[0:6])
-
-        # get sample datetime from filename
-        # compare with datetime from filename 
-
-        sig_wave_ht = rdi[8]         # Significant Wave Height (Hs, meters)
-        peak_wave_period = rdi[9]    # Peak Wave Period (Tp, sec)
-        peak_wave_dir = rdi[10]      # Peak Wave Direction (deg N)
-        max_wave_ht = rdi[12]        # Maximum Wave Height (Hmax, meters)
-        max_wave_period = rdi[13]    # Maximum Wave Period (Tmax, sec)
-
-        wd = rdi[11]/1000   # Water Depth (meters) (based on ADCP backscatter or input config??)
-                            # This includes height of transducer
-        nbins = int(rdi[14])         # Number of bins
-
-        current_spd = numpy.array(rdi[15::2]) # starting at idx=15 skip=2 to end
-        current_dir = numpy.array(rdi[16::2]) # starting at idx=16 skip=2 to end
-
-        if nbins!=sensor_info['nbins']:
-            print 'Number of bins reported in data ('+ \
-                  str(nbins)+') does not match config number ('+ \
-                  str(sensor_info['nbins'])+')'
-
-        if len(current_spd)!=nbins or len(current_dir)!=nbins:
-            print 'Data length does not match number of bins in data'
-
-        ibad = (current_spd==-32768) | (current_dir==-32768)
-        current_spd[ibad] = numpy.nan
-        current_dir[ibad] = numpy.nan
-
-        # these items can also be teased out of raw adcp but for now get from config file
-        th = sensor_info['transducer_ht']  # Transducer height above bottom (meters)
-        bh = sensor_info['blanking_ht']    # Blanking height above Transducer (meters)
-        bin_size = sensor_info['bin_size'] # Bin Size (meters)
+    height above bottom and z of each bin, computed once per config
 
+    :Returns:
+       (bin_habs, z) : tuple of numpy.array (nbins,)
+           Height of bins above bottom (meters) adjusted along beam to
+           nadir and height relative to nominal water level (MSL)
+    """
+    # these items can also be teased out of raw adcp but for now get from config file
+    th = sensor_info['transducer_ht']  # Transducer height above bottom (meters)
+    bh = sensor_info['blanking_ht']    # Blanking height above Transducer (meters)
+    bin_size = sensor_info['bin_size'] # Bin Size (meters)
+    key = (th, bh, bin_size, nbins, platform_info['mean_water_depth'])
+    if key not in bin_geometry_cache:
         # compute height for each bin above the bottom
         bins = numpy.arange(1,nbins+1)
         bin_habs = (bins*bin_size+bin_size/2)+th+bh
 
-        # compute water mask 
-        # Using George Voulgaris' method based on water depth
-        # minus half of the significant wave height (Hs)
-        # and computed habs
-        # if positive is up, what's less than zero depth?
-
         # added by SH -- 15 Oct 2008
         # raw2proc:ticket:27 adjust bin_habs along beam to nadir
         # adjustment is cos(20 deg) (which is  approx .95*height) assuming fixed 20 deg
         bin_habs =  bin_habs*numpy.cos(20.*numpy.pi/180)
-        bin_depths =  bin_habs-(wd)
-        iwater = bin_depths+bin_size/2 < 0
 
         # use nominal water depth (MSL) averaged from full pressure record
         #  this should be checked/recalulated every so often
         z = bin_habs + platform_info['mean_water_depth']  # meters, (+) up, (-) down
+        bin_geometry_cache[key] = (bin_habs, z)
+    return bin_geometry_cache[key]
 
-        # check that length of bin_depths is equal to nbins
-        u = numpy.ones(nbins)*numpy.nan
-        v = numpy.ones(nbins)*numpy.nan
-
-        u[iwater] = current_spd[iwater]*numpy.sin(current_dir[iwater]*numpy.pi/180)
-        v[iwater] = current_spd[iwater]*numpy.cos(current_dir[iwater]*numpy.pi/180)
-
-        # set up dict of data if first line
-        if i==0:
-            data = {
-                'en' : numpy.array(numpy.ones((len(lines),), dtype=int)*numpy.nan),
-                'dt' : numpy.array(numpy.ones((len(lines),), dtype=object)*numpy.nan),
-                'time' : numpy.array(numpy.ones((len(lines),), dtype=long)*numpy.nan),
-                'z' : numpy.array(numpy.ones((nbins,), dtype=float)*numpy.nan),
-                'u' : numpy.array(numpy.ones((len(lines),nbins), dtype=float)*numpy.nan),
-                'v' : numpy.array(numpy.ones((len(lines),nbins), dtype=float)*numpy.nan),
-                'wd' : numpy.array(numpy.ones((len(lines)), dtype=float)*numpy.nan),
-                'wl' : numpy.array(numpy.ones((len(lines)), dtype=float)*numpy.nan),
-                }
-        
-        data['en'][i] = burst_num
-        data['dt'][i] = sample_dt # sample datetime
-        data['time'][i] = dt2es(sample_dt) # sample time in epoch seconds
-        data['z'] =  z
-        data['u'][i] =  u
-        data['v'][i] =  v
-        data['wd'][i] = -1*wd
-        data['wl'][i] = platform_info['mean_water_depth'] - (-1*wd)  
-        i = i+1
+def parse_line(line):
+    """
+    fields of one Log Data line that cannot be read as a row of the
+    numeric block, any token without a number skipped
+    """
+    rdi = []
+    sw = re.split(',', line)
+    for s in sw:
+        m = re.search(REAL_RE_STR, s)
+        if m:
+            rdi.append(float(m.groups()[0]))
+    return rdi
+
+def parser(platform_info, sensor_info, lines):
+    """
+    parse and assign currents data from RDI ADCP Log Data
 
+    Lines with the same number of numeric fields are read as one 2-D
+    block and all ensembles decomposed at once.  Ragged lines (a field
+    without a number, or a different number of fields) are read one at
+    a time.
+
+    """
+    nlines = len(lines)
+    rows = [line.strip().rstrip(',').split(',') for line in lines]
+    ncol = rows and len(rows[0]) or 0
+    block = numpy.ones((nlines, ncol), dtype=float)*numpy.nan
+    same = numpy.array([len(row)==ncol for row in rows], dtype=bool)
+    if same.any():
+        block[same] = str2float(numpy.array([row for row in rows if len(row)==ncol]))
+    # fields that are not numbers shift all following fields when
+    # skipped, so read these lines one at a time
+    ragged = ~same | numpy.isnan(block).any(axis=1)
+    for k in numpy.flatnonzero(ragged):
+        rdi = parse_line(lines[k])
+        if len(rdi) == ncol:
+            block[k] = rdi
+        else:
+            print 'Line %d has %d fields not %d, skipping' % (k+1, len(rdi), ncol)
+            block[k] = numpy.nan
+
+    # assign specific fields
+    burst_num = block[:,0] # Ensemble Number
+
+    # get sample datetime from data (two-digit year as strptime %y)
+    yy = block[:,1]
+    year = numpy.where(yy<69, yy+2000, yy+1900)
+    good = ~numpy.isnan(block).any(axis=1)
+    es = numpy.ones((nlines,), dtype='int64')*-1
+    es[good] = ymd2es(year[good], block[good,2], block[good,3],
+                      block[good,4], block[good,5], block[good,6])
+    es = utc_shift(es, sensor_info['utc_offset'])
+
+    # sig_wave_ht = block[:,8]         # Significant Wave Height (Hs, meters)
+    # peak_wave_period = block[:,9]    # Peak Wave Period (Tp, sec)
+    # peak_wave_dir = block[:,10]      # Peak Wave Direction (deg N)
+    # max_wave_ht = block[:,12]        # Maximum Wave Height (Hmax, meters)
+    # max_wave_period = block[:,13]    # Maximum Wave Period (Tmax, sec)
+
+    wd = block[:,11]/1000   # Water Depth (meters) (based on ADCP backscatter or input config??)
+                            # This includes height of transducer
+    nbins = (ncol-15)//2    # bins in each line
+
+    current_spd = block[:,15::2] # starting at idx=15 skip=2 to end
+    current_dir = block[:,16::2] # starting at idx=16 skip=2 to end
+
+    nb = numpy.unique(block[good,14])
+    if len(nb) and (nb!=sensor_info['nbins']).any():
+        print 'Number of bins reported in data ('+ \
+              str(nb)+') does not match config number ('+ \
+              str(sensor_info['nbins'])+')'
+    if len(nb) and (nb!=nbins).any():
+        print 'Data length does not match number of bins in data'
+
+    ibad = (current_spd==-32768) | (current_dir==-32768)
+    current_spd[ibad] = numpy.nan
+    current_dir[ibad] = numpy.nan
+
+    (bin_habs, z) = bin_geometry(platform_info, sensor_info, nbins)
+    bin_size = sensor_info['bin_size'] # Bin Size (meters)
+
+    # compute water mask 
+    # Using George Voulgaris' method based on water depth
+    # minus half of the significant wave height (Hs)
+    # and computed habs
+    # if positive is up, what's less than zero depth?
+    bin_depths =  bin_habs[numpy.newaxis,:]-(wd[:,numpy.newaxis])
+    iwater = bin_depths+bin_size/2 < 0
+
+    rad = current_dir*numpy.pi/180
+    u = numpy.where(iwater, current_spd*numpy.sin(rad), numpy.nan)
+    v = numpy.where(iwater, current_spd*numpy.cos(rad), numpy.nan)
+
+    data = {
+        'en' : burst_num,
+        'time' : es, # sample time in epoch seconds
+        'z' : z,
+        'u' : u,
+        'v' : v,
+        'wd' : -1*wd,
+        'wl' : platform_info['mean_water_depth'] - (-1*wd),
+        }
     return data
 
 def creator(platform_info, sensor_info, data):
     #
     # 
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     title_str = sensor_info['description']+' at '+ platform_info['location']
 
     if 'mean_water_depth' in platform_info.keys():
@@ -189,9 +217,9 @@ def creator(platform_info, sensor_info, data):
         'project_url' : 'http://nccoos.unc.edu',
         # timeframe of data contained in file yyyy-mm-dd HH:MM:SS
         # first date in monthly file
-        'start_date' : data['dt'][0].strftime("%Y-%m-%d %H:%M:%S"),
+        'start_date' : es2dt(data['time'][i][0]).strftime("%Y-%m-%d %H:%M:%S"),
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         # 
         'mean_water_depth' : msl_str,
@@ -301,9 +329,6 @@ def creator(platform_info, sensor_info, data):
         ('wl', NC.FLOAT, ('ntime',)),
         )
 
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-    
     # var data 
     var_data = (
         ('lat',  platform_info['lat']),
@@ -322,10 +347,13 @@ def creator(platform_info, sensor_info, data):
 
 def updater(platform_info, sensor_info, data):
     #
+    # subset data only to month being processed (see raw2proc.process())
+    i = data['in']
+
     global_atts = { 
         # update times of data contained in file (yyyy-mm-dd HH:MM:SS)
         # last date in monthly file
-        'end_date' : data['dt'][-1].strftime("%Y-%m-%d %H:%M:%S"), 
+        'end_date' : es2dt(data['time'][i][-1]).strftime("%Y-%m-%d %H:%M:%S"), 
         'release_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
         #
         'modification_date' : now_dt.strftime("%Y-%m-%d %H:%M:%S"),
@@ -343,9 +371,6 @@ def updater(platform_info, sensor_info, data):
     #          },
     #    }
     
-    # subset data only to month being processed (see raw2proc.process())
-    i = data['in']
-
     # data 
     var_data = (
         ('time', data['time'][i]),
@@ -10,17 +10,21 @@ import numpy as n
 import pycdf
 import datetime
 import procutil
-from sodar.remtech import rawData
 
 INVALID       = '-9999'
 
 nowDt = datetime.datetime.utcnow().replace(microsecond=0)
 
+# z is the range gate elevation, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('z',)
+
 def parser(platform_info, sensor_info, lines):
     """
     Parse and assign wind profile data from raw Sodar file.
     """
     
+    from sodar.remtech import rawData
     rawDataObject = rawData.RawData(''.join(lines))
     
     numSamples       = len(rawDataObject)
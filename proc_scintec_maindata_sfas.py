@@ -9,16 +9,20 @@ import numpy as n
 import pycdf
 import datetime
 import procutil
-from sodar.scintec import maindata
 
 nowDt = datetime.datetime.utcnow().replace(microsecond=0)
 manual = ['z','speed','dir','error']
 
+# z is the range gate elevation, the same for all records (see
+# raw2proc.get_fixed_vars)
+fixed_vars = ('z',)
+
 def parser(platform_info, sensor_info, lines):
     """
     Parse and assign wind profile data from main Sodar file.
     """
     
+    from sodar.scintec import maindata
     main_data = maindata.MainData(''.join(lines))
     
     num_profiles       = len(main_data)
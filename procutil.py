@@ -10,11 +10,14 @@ __version__ = "v0.1"
 __author__ = "Sara Haines <sara_haines@unc.edu>"
 
 import os.path
+import re
+from collections import OrderedDict
 from datetime import datetime, timedelta, tzinfo
 from dateutil.tz import tzlocal, tzutc
 from dateutil.parser import parse
 import time
 import math
+import numpy
 
 from ncutil import *
 
@@ -70,6 +73,144 @@ def es2dt(es):
     dt = datetime(*time.gmtime(es)[0:6])
     return dt
 
+# Vectorized time functions
+#
+# Parsers keep sample time as numpy.array of epoch seconds (data['time'])
+# so no datetime object is needed per sample.  Use es2dt() only on
+# the few values that get formatted (e.g. start_date, end_date).
+
+def str2es(stamps, utc_offset=0):
+    """Convert array of date-time strings to epoch seconds
+
+    :Parameters:
+        stamps : sequence of str
+            ISO 8601 form YYYY-MM-DD hh:mm:ss or YYYY-MM-DDThh:mm:ss
+            (fraction of seconds dropped)
+
+    :Other Parameters:
+        utc_offset : float
+            Hours added to sample time to make it UTC (see utc_shift())
+
+    :Returns:
+        es : numpy.array of int64
+            Epoch seconds.  Strings that cannot be read are -1.
+    """
+    stamps = numpy.asarray(stamps)
+    try:
+        es = stamps.astype('datetime64[s]').astype('int64')
+    except ValueError:
+        # at least one bad stamp, so do them one at a time
+        es = numpy.ones((len(stamps),), dtype='int64')*-1
+        for i, ts in enumerate(stamps):
+            try:
+                es[i] = numpy.datetime64(ts, 's').astype('int64')
+            except ValueError:
+                pass
+    # empty string is NaT
+    es[es<0] = -1
+    return utc_shift(es, utc_offset)
+
+def ymd2es(year, month, day, hour=0, minute=0, second=0):
+    """Convert arrays of year, month, day, hour, minute, second to epoch seconds
+
+    >>> ymd2es(numpy.array([2011, 2012]), numpy.array([12, 2]), numpy.array([1, 29]))
+    array([1322697600, 1330473600])
+    """
+    year = numpy.asarray(year, dtype='int64')
+    month = numpy.asarray(month, dtype='int64')
+    day = numpy.asarray(day, dtype='int64')
+    days = ((year-1970).astype('datetime64[Y]') + \
+            (month-1).astype('timedelta64[M]')).astype('datetime64[D]') + \
+            (day-1).astype('timedelta64[D]')
+    return days.astype('int64')*86400 + \
+           numpy.asarray(hour, dtype='int64')*3600 + \
+           numpy.asarray(minute, dtype='int64')*60 + \
+           numpy.asarray(second, dtype='int64')
+
+def ymd_ok(year, month, day, hour=0, minute=0, second=0):
+    """Which of arrays of year, month, day, hour, minute, second are a valid date
+
+    Same dates as datetime() allows, so ymd2es() does not roll them
+    over (e.g. Feb 30 into Mar 2).
+    """
+    year = numpy.asarray(year, dtype='int64')
+    month = numpy.asarray(month, dtype='int64')
+    day = numpy.asarray(day, dtype='int64')
+    hour = numpy.asarray(hour, dtype='int64')
+    minute = numpy.asarray(minute, dtype='int64')
+    second = numpy.asarray(second, dtype='int64')
+    ok = (year>=1) & (year<=9999) & (month>=1) & (month<=12) & \
+         (day>=1) & (day<=31) & (hour>=0) & (hour<24) & \
+         (minute>=0) & (minute<60) & (second>=0) & (second<60)
+    # day past end of month is in next month
+    es = ymd2es(numpy.where(ok, year, 1970), numpy.where(ok, month, 1),
+                numpy.where(ok, day, 1))
+    months = (es//86400).astype('datetime64[D]').astype('datetime64[M]').astype('int64')
+    return ok & (months == (year-1970)*12 + month-1)
+
+def mdy2es(stamps, dmy=False):
+    """Convert array of month, day, two-digit year, hour, minute, second to epoch seconds
+
+    :Parameters:
+        stamps : numpy.array (nrows, 6)
+            Columns mm, dd, yy, HH, MM, SS (e.g. 08/18/08 00:30:06)
+
+    :Other Parameters:
+        dmy : bool
+            Read stamps that are not a valid mm/dd/yy as dd/mm/yy
+
+    :Returns:
+        es : numpy.array of int64
+            Epoch seconds, year as strptime %y (69-99 is 19yy).
+            Stamps that are not a valid date are -1.
+    """
+    stamps = numpy.asarray(stamps, dtype=float).reshape((-1, 6))
+    (mm, dd, yy, HH, MM, SS) = stamps.T
+    year = numpy.where(yy<69, yy+2000, yy+1900)
+    es = numpy.ones((len(stamps),), dtype='int64')*-1
+    good = ~numpy.isnan(stamps).any(axis=1)
+    ok = good.copy()
+    ok[good] = ymd_ok(year[good], mm[good], dd[good], HH[good], MM[good], SS[good])
+    es[ok] = ymd2es(year[ok], mm[ok], dd[ok], HH[ok], MM[ok], SS[ok])
+    if dmy:
+        # month and day switched in some cases
+        sw = good & ~ok
+        sw[sw] = ymd_ok(year[sw], dd[sw], mm[sw], HH[sw], MM[sw], SS[sw])
+        es[sw] = ymd2es(year[sw], dd[sw], mm[sw], HH[sw], MM[sw], SS[sw])
+    return es
+
+def utc_shift(es, utc_offset):
+    """ Add utc_offset (hours) to valid (>=0) epoch seconds"""
+    if utc_offset:
+        es = numpy.array(es)
+        good = es >= 0
+        es[good] = es[good] + int(round(utc_offset*3600))
+    return es
+
+def es_mask(es, start_dts, end_dts):
+    """Which epoch seconds are within all of the given time frames
+
+    :Parameters:
+        es : numpy.array of epoch seconds
+        start_dts : sequence of datetime
+            Earliest times allowed (inclusive)
+        end_dts : sequence of datetime
+            Latest times allowed (inclusive)
+
+    :Returns:
+        mask : numpy.array of bool
+
+    Example
+    -------
+    >>> data['in'] = es_mask(data['time'],
+    ...                      (pi['config_start_dt'], si['proc_start_dt']),
+    ...                      (pi['config_end_dt'], si['proc_end_dt']))
+    """
+    es = numpy.asarray(es)
+    es_start = max([dt2es(dt) for dt in start_dts])
+    es_end = min([dt2es(dt) for dt in end_dts])
+    return (es >= es_start) & (es <= es_end)
+
 def find_months(year, month=1):
     """Find which months to process
 
@@ -138,6 +279,639 @@ def scanf_datetime(ts, fmt='%Y-%m-%dT%H:%M:%S'):
 
     return dt
 
+def str2float(a):
+    """ str array to float, NaN for anything that is not a number ("NAN" included)"""
+    a = numpy.asarray(a)
+    try:
+        return a.astype(float)
+    except ValueError:
+        x = numpy.ones(a.shape, dtype=float)*numpy.nan
+        for i, s in enumerate(a.flat):
+            try:
+                x.flat[i] = float(s)
+            except ValueError:
+                pass
+        return x
+
+def read_block(lines, ncol=None, start=0):
+    """Read lines of blank separated numbers into a 2-D array in one pass
+
+    :Parameters:
+        lines : list of str or raw2proc.RawMap
+            Lines of numbers only (e.g. Nortek .wds, .was, .wap)
+
+    :Other Parameters:
+        ncol : int
+            Numbers per row (default number in line start)
+        start : int
+            First line to read (e.g. 1 to skip a label line)
+
+    :Returns:
+        block : numpy.array of float (nrows, ncol)
+            One row per line.  Lines without ncol numbers (e.g. cut
+            short) and blank lines are skipped.
+    """
+    if hasattr(lines, 'floats'):
+        x = lines.floats(start)
+    else:
+        x = numpy.fromstring(''.join(lines[start:]), dtype=float, sep=' ')
+    if ncol is None:
+        ncol = len(lines) > start and len(lines[start].split()) or 0
+    if not ncol:
+        return numpy.zeros((0, 0), dtype=float)
+    nrow = max(len(lines)-start, 0)
+    if x.size == nrow*ncol:
+        # every line has ncol numbers
+        return x.reshape((nrow, ncol))
+    # some line has more or fewer, so read line by line to find it
+    rows = []
+    nbad = 0
+    for i in range(start, len(lines)):
+        line = lines[i]
+        if not line.strip():
+            continue
+        row = numpy.fromstring(line, dtype=float, sep=' ')
+        if row.size == ncol:
+            rows.append(row)
+        else:
+            nbad += 1
+    if nbad:
+        print ' ... skipping %d lines without %d numbers' % (nbad, ncol)
+    return numpy.array(rows, dtype=float).reshape((len(rows), ncol))
+
+def split_toa5(lines):
+    """Split Campbell Scientific TOA5 table into a 2-D array of str
+
+    First of the 4 header lines gives station info, second the column
+    names, third units, and fourth processing (Avg, Smp, ...).  Data
+    lines with a different number of fields than named columns are
+    skipped.
+
+    :Returns:
+        names : list of str
+            Column names (e.g. ['TIMESTAMP', 'RECORD', 'W1_SpeedAvg', ...])
+        cells : numpy.array of str (nrows, ncols)
+            Fields with surrounding double quotes and blanks removed
+    """
+    names = [n.strip(' "') for n in lines[1].strip().split(',')]
+    ncol = len(names)
+    rows = [l for l in lines[4:] if l.count(',') == ncol-1]
+    if len(rows) < len(lines[4:]):
+        print ' ... skipping %d of %d lines' % (len(lines[4:])-len(rows), len(lines[4:]))
+    if rows:
+        cells = numpy.char.strip(numpy.array([l.strip().split(',') for l in rows]), ' "')
+    else:
+        cells = numpy.zeros((0, ncol), dtype=str)
+    return (names, cells)
+
+def read_toa5(lines, utc_offset=0):
+    """Read Campbell Scientific TOA5 table into a numeric block in one pass
+
+    The common case of quoted TIMESTAMP followed by only numbers (or
+    "NAN") per line is converted without splitting lines into fields.
+    Tables with text columns use split_toa5() and every non-number is
+    NaN.
+
+    :Parameters:
+        lines : list of str
+            Whole file including the 4 header lines
+
+    :Other Parameters:
+        utc_offset : float
+            Hours added to sample time to make it UTC
+
+    :Returns:
+        names : list of str
+            Column names from header line 2
+        es : numpy.array of int64 (nrows,)
+            TIMESTAMP in epoch seconds (only rows with valid time)
+        block : numpy.array of float (nrows, ncols-1)
+            Columns after TIMESTAMP, so block[:,0] is RECORD
+
+    Example
+    -------
+    >>> (names, es, block) = read_toa5(lines, sensor_info['utc_offset'])
+    >>> data['wspd1'] = block[:,1]
+
+    """
+    import warnings
+    names = [n.strip(' "') for n in lines[1].strip().split(',')]
+    ncol = len(names)
+    # only lines with right number of fields, all with "YYYY-MM-DD hh:mm:ss" stamp
+    rows = [l for l in lines[4:] if l.count(',') == ncol-1]
+    nrows = len(rows)
+    stamped = len([l for l in rows if l[0:1] == '"' and l[20:22] == '",'])
+
+    block = None
+    if nrows and stamped == nrows:
+        if nrows < len(lines[4:]):
+            print ' ... skipping %d of %d lines' % (len(lines[4:])-nrows, len(lines[4:]))
+        # overwrite separators of each stamp in place so whole table
+        # is just numbers: "2011-12-01 00:01:59",6507,... -> 2011,12,01,00,01,59,6507,...
+        text = ''.join(rows).replace('\r', '')
+        lens = numpy.array([len(l) for l in rows]) - numpy.array([l.endswith('\r\n') for l in rows])
+        starts = numpy.zeros((nrows,), dtype=int)
+        starts[1:] = numpy.cumsum(lens)[:-1]
+        buf = numpy.frombuffer(bytearray(text), dtype='u1').copy()
+        for k, c in ((0,' '), (5,','), (8,','), (11,','), (14,','), (17,','), (20,' ')):
+            buf[starts+k] = ord(c)
+        text = buf.tostring().replace('"NAN"', 'nan').replace('\n', ',')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            a = numpy.fromstring(text, dtype=float, sep=',')
+        if a.size == nrows*(ncol+5):
+            a = a.reshape((nrows, ncol+5))
+            ymdhms = a[:,0:6].astype('int64')
+            es = utc_shift(ymd2es(*ymdhms.T), utc_offset)
+            block = a[:,6:]
+
+    if block is None:
+        # ragged, text columns or odd stamps, so split fields
+        (names, cells) = split_toa5(lines)
+        es = str2es(cells[:,0], utc_offset)
+        block = str2float(cells[:,1:])
+        good = es >= 0
+        es = es[good]
+        block = block[good]
+
+    return (names, es, block)
+
+def avp_block(rows, ncol):
+    """ Sample rows (lists of str) with ncol numbers to float array, others dropped"""
+    good = [row for row in rows if len(row)==ncol]
+    block = numpy.zeros((0, ncol), dtype=float)
+    if good:
+        block = str2float(numpy.array(good))
+        # a field that is not a number
+        block = block[~numpy.isnan(block).any(axis=1)]
+    if len(block) < len(rows):
+        print ' ... skipping %d bad data lines' % (len(rows)-len(block))
+    return block
+
+def avp_casts(lines, ncol):
+    """Split Automated Vertical Profiler (AVP) lines into casts in one pass
+
+    A cast starts at its "Profile Time:" line and ends at the next one,
+    at a blank line after its samples or at the end of lines.  Header
+    lines (Name: value) are kept by lower case name.  Sample lines
+    (starting with a digit) are split on blanks, '/' and ':', and each
+    cast is converted to numbers in one call.  Lines with ^Z and other
+    lines (e.g. Error messages) are skipped.
+
+    :Parameters:
+        lines : list of str or raw2proc.RawMap
+            AVP YSI 6600 data file, e.g.
+
+            Profile Time: 00:30:00
+            Profile Date: 08/18/2008
+            Profile Depth: 255.0 cm
+            Profile Location: Stones Bay Serial No: 00016B79, ID: AVP1_SERDP
+            08/18/08 00:30:06 26.94  41.87  26.81   0.134  8.00     3.4   4.5   6.60
+
+        ncol : int
+            Numbers in a sample line (e.g. 14 is mm dd yy HH MM SS and 8 params)
+
+    :Returns:
+        casts : generator of (header, block)
+            header : dict of str, e.g. {'profile time' : '00:30:00', ...}
+            block : numpy.array of float (nsamples, ncol)
+            Sample lines without ncol numbers are not in block.
+
+    Example
+    -------
+    >>> for (header, block) in avp_casts(lines, 14):
+    ...     es = mdy2es(block[:,0:6])
+    """
+    header = {}
+    rows = []
+    for line in lines:
+        s = line.strip()
+        if not s:
+            # each profile separated by empty line (if any)
+            if rows:
+                yield (header, avp_block(rows, ncol))
+                header = {}
+                rows = []
+        elif '\x1a' in s:
+            continue
+        elif s[0].isdigit():
+            rows.append(s.replace('/', ' ').replace(':', ' ').split())
+        elif ':' in s:
+            (name, value) = s.split(':', 1)
+            name = name.strip().lower()
+            if name == 'profile time' and (header or rows):
+                yield (header, avp_block(rows, ncol))
+                header = {}
+                rows = []
+            header[name] = value.strip()
+    if header or rows:
+        yield (header, avp_block(rows, ncol))
+
+def avp_numbers(value):
+    """ Numbers in AVP header value, e.g. '08/18/2008' -> [8., 18., 2008.]"""
+    return [float(s) for s in re.findall(r'-?\d*\.?\d+', value)]
+
+def avp_profile_es(header, utc_offset=0):
+    """ Epoch seconds of cast from its Profile Date and Time header, -1 if not valid"""
+    (mm, dd, yyyy) = (avp_numbers(header.get('profile date', '')) + [-1]*3)[0:3]
+    (HH, MM, SS) = (avp_numbers(header.get('profile time', '')) + [-1]*3)[0:3]
+    if not ymd_ok(yyyy, mm, dd, HH, MM, SS):
+        return -1
+    return int(utc_shift(ymd2es(yyyy, mm, dd, HH, MM, SS), utc_offset))
+
+def avp_samples(blocks, ncol, nbins=None, utc_offset=0, dmy=False):
+    """Stack sample blocks of AVP casts with sample time and number in cast
+
+    Samples without a valid date are dropped and not counted in their
+    cast.
+
+    :Parameters:
+        blocks : list of numpy.array (nsamples, ncol)
+            Sample blocks from avp_casts(), columns mm dd yy HH MM SS first
+        ncol : int
+            Numbers in a sample line (as for avp_casts())
+
+    :Other Parameters:
+        nbins : int
+            Most samples kept per cast (default all)
+        utc_offset : float
+            Hours added to sample time to make it UTC
+        dmy : bool
+            Read stamps that are not a valid mm/dd/yy as dd/mm/yy
+
+    :Returns:
+        icast : numpy.array of int
+            Cast (index of blocks) of each sample
+        j : numpy.array of int
+            Sample number in its cast
+        stime : numpy.array of int64
+            Sample time in epoch seconds
+        block : numpy.array (nsamples, ncol)
+            Samples of all casts in order
+
+    Example
+    -------
+    >>> (icast, j, stime, block) = avp_samples(blocks, 14, nbins)
+    >>> data['wtemp'][icast, j] = block[:,6]
+    """
+    if not blocks:
+        e = numpy.zeros((0,), dtype=int)
+        return (e, e, e.astype('int64'), numpy.zeros((0, ncol), dtype=float))
+    block = numpy.concatenate(blocks)
+    icast = numpy.repeat(numpy.arange(len(blocks)), [len(b) for b in blocks])
+    stime = utc_shift(mdy2es(block[:,0:6], dmy), utc_offset)
+    ok = stime >= 0
+    if not ok.all():
+        print ' ... skipping %d lines, ill-formed date' % (~ok).sum()
+        (icast, stime, block) = (icast[ok], stime[ok], block[ok])
+    # casts are in order, so first sample of each cast is where its index starts
+    j = numpy.arange(len(icast)) - numpy.searchsorted(icast, icast)
+    if nbins is not None:
+        nj = numpy.bincount(icast, minlength=len(blocks))
+        for n in nj[nj>nbins]:
+            print 'Sample number (' + str(n) + \
+                  ') in profile exceeds maximum value ('+ \
+                  str(nbins) + ') in config'
+        keep = j < nbins
+        (icast, j, stime, block) = (icast[keep], j[keep], stime[keep], block[keep])
+    return (icast, j, stime, block)
+
+def depth_bins(sensor_info, water_depth=None):
+    """Bin edges (m, positive up) to grid profiles from surface to bottom
+
+    sensor_info['bin_edges'] if in config, else every
+    sensor_info['bin_size'] from zero at sea-surface down past
+    water_depth (e.g. platform_info['mean_water_depth']), or
+    sensor_info['nbins'] bins if water depth not known.  Edges only
+    depend on config so every file of a month has the same bins.
+    """
+    if 'bin_edges' in sensor_info:
+        return numpy.asarray(sensor_info['bin_edges'], dtype=float)
+    bin_size = float(sensor_info['bin_size'])
+    if water_depth is None:
+        nbins = sensor_info['nbins']
+    else:
+        nbins = int(numpy.ceil(round(abs(water_depth)/bin_size, 6)))
+    return -bin_size*numpy.arange(nbins+1)
+
+def bin_profiles(z, values, edges):
+    """Grid profiles into depth bins, all casts at once
+
+    Each sample gets its bin by a search of the sorted edges and the
+    sum, count and sum of squared deviations of every (cast, bin) come
+    from bincount of the flat (cast, bin) index.
+
+    :Parameters:
+        z : numpy.array (ncast, nsamples)
+            Height of each sample (m, positive up), NaN if no sample
+        values : dict of numpy.array (ncast, nsamples)
+            Samples of each variable at z
+        edges : numpy.array (nbins+1,)
+            Bin edges, increasing or decreasing.  Bin k is from
+            edges[k] (included) to edges[k+1].
+
+    :Returns:
+        zbin : numpy.array (nbins,)
+            Bin centers
+        grid : dict of tuple
+            For each name of values (mean, count, std), each
+            numpy.array (ncast, nbins).  Mean and std (population) are
+            NaN where no sample in bin.
+
+    Example
+    -------
+    >>> edges = depth_bins(sensor_info, platform_info['mean_water_depth'])
+    >>> (zbin, grid) = bin_profiles(data['z'], {'wtemp' : data['wtemp']}, edges)
+    >>> (data['wtemp_mean'], data['wtemp_n'], data['wtemp_std']) = grid['wtemp']
+    """
+    z = numpy.asarray(z, dtype=float)
+    edges = numpy.asarray(edges, dtype=float)
+    ncast = len(z)
+    nbins = len(edges)-1
+    zbin = (edges[:-1]+edges[1:])/2.
+    # search increasing edges (flip sign if decreasing)
+    sign = (edges[-1] < edges[0]) and -1. or 1.
+    with numpy.errstate(invalid='ignore'):
+        ibin = numpy.searchsorted(sign*edges, sign*z.ravel(), side='right') - 1
+    inbin = (ibin >= 0) & (ibin < nbins) & ~numpy.isnan(z.ravel())
+    icast = numpy.repeat(numpy.arange(ncast), z.size//max(ncast, 1))
+    k = icast*nbins + ibin
+
+    grid = {}
+    for name in values:
+        x = numpy.asarray(values[name], dtype=float).ravel()
+        ok = inbin & ~numpy.isnan(x)
+        n = numpy.bincount(k[ok], minlength=ncast*nbins)
+        total = numpy.bincount(k[ok], weights=x[ok], minlength=ncast*nbins)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            mean = total/n
+            ss = numpy.bincount(k[ok], weights=(x[ok]-mean[k[ok]])**2,
+                                minlength=ncast*nbins)
+            std = numpy.sqrt(ss/n)
+        grid[name] = (mean.reshape((ncast, nbins)),
+                      n.reshape((ncast, nbins)),
+                      std.reshape((ncast, nbins)))
+    return (zbin, grid)
+
+# most recently used interpolation weights of point sets (see griddata_weights())
+GRIDDATA_CACHE_SIZE = 32
+griddata_cache = OrderedDict()
+
+def griddata_weights(x, y, xi, yi):
+    """Linear interpolation weights from scattered points to a mesh
+
+    Delaunay triangulation of points (x, y) and barycentric weights
+    of each mesh point (xi, yi) in its triangle.  These are kept by a
+    hash of the point set and mesh, so hours with the same points (e.g.
+    CODAR totals grid) triangulate only once.
+
+    :Parameters:
+        x, y : numpy.array (npts,)
+            Scattered points
+        xi, yi : numpy.array (ny, nx)
+            Mesh (e.g. from numpy.meshgrid)
+
+    :Returns:
+        (idx, w) : tuple of numpy.array (ny*nx, 3)
+            Index into points of the triangle vertices and their
+            weights for each mesh point, w is NaN outside the convex hull
+    """
+    import hashlib
+    x = numpy.ascontiguousarray(x, dtype=float)
+    y = numpy.ascontiguousarray(y, dtype=float)
+    px = numpy.ascontiguousarray(xi, dtype=float).ravel()
+    py = numpy.ascontiguousarray(yi, dtype=float).ravel()
+    h = hashlib.sha1()
+    for a in (x, y, px, py):
+        h.update(str(a.shape))
+        h.update(a.tostring())
+    key = h.hexdigest()
+    try:
+        # pop and put back to mark as most recently used
+        (idx, w) = griddata_cache.pop(key)
+    except KeyError:
+        from matplotlib.tri import Triangulation
+        tri = Triangulation(x, y)
+        # flat triangles between collinear points (e.g. along edges of a
+        # regular grid of totals) make the trifinder fail and hold no area
+        (i0, i1, i2) = tri.triangles.T
+        area = (x[i1]-x[i0])*(y[i2]-y[i0]) - (x[i2]-x[i0])*(y[i1]-y[i0])
+        tri.set_mask(numpy.abs(area) <= 1e-9*numpy.abs(area).max())
+        t = tri.get_trifinder()(px, py)
+        inside = t >= 0
+        idx = numpy.zeros((len(px), 3), dtype=int)
+        idx[inside] = tri.triangles[t[inside]]
+        # barycentric coordinates of mesh point in its triangle
+        (x0, x1, x2) = x[idx].T
+        (y0, y1, y2) = y[idx].T
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            det = (y1-y2)*(x0-x2) + (x2-x1)*(y0-y2)
+            w0 = ((y1-y2)*(px-x2) + (x2-x1)*(py-y2))/det
+            w1 = ((y2-y0)*(px-x2) + (x0-x2)*(py-y2))/det
+        w = numpy.array([w0, w1, 1-w0-w1]).T
+        w[~inside] = numpy.nan
+        if len(griddata_cache) >= GRIDDATA_CACHE_SIZE:
+            griddata_cache.popitem(last=False)
+    griddata_cache[key] = (idx, w)
+    return (idx, w)
+
+def griddata(x, y, z, xi, yi):
+    """Linear interpolation of scattered points to a mesh
+
+    Same as matplotlib.mlab.griddata(x, y, z, xi, yi, interp='linear')
+    but NaN (not masked) outside convex hull of points.  Several
+    fields on the same points (e.g. u and v, or every hour) interpolate
+    in one call, each mesh point a weighted sum of 3 points (see
+    griddata_weights()).
+
+    :Parameters:
+        x, y : numpy.array (npts,)
+            Scattered points
+        z : numpy.array (npts,) or (..., npts)
+            Values at points, last axis along points
+        xi, yi : numpy.array (ny, nx)
+            Mesh (e.g. from numpy.meshgrid)
+
+    :Returns:
+        zi : numpy.array (ny, nx) or (..., ny, nx)
+
+    Example
+    -------
+    >>> (ui, vi) = griddata(lon, lat, numpy.array([u, v]), xmesh, ymesh)
+    """
+    (idx, w) = griddata_weights(x, y, xi, yi)
+    z = numpy.asarray(z, dtype=float)
+    zi = (z[..., idx]*w).sum(axis=-1)
+    return zi.reshape(z.shape[:-1] + numpy.shape(xi))
+
+class LineFile(object):
+    """File-like read() over lines already loaded (see raw2proc.load_data())
+
+    For readers that take a file object (e.g. iterparse) so lines are
+    not joined into one more copy of the file.
+    """
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def read(self, size=-1):
+        # one line at a time, an empty string only at the end
+        for line in self.lines:
+            if line:
+                return line
+        return ''
+
+def andi_fields(elem):
+    """ {name : value} of attributes and leaf children of XML element,
+    names lowercase without namespace (e.g. 'Descr' -> 'descr')"""
+    fields = dict([(k.rpartition('}')[2].lower(), v) for (k, v) in elem.items()])
+    for child in elem:
+        if len(child) == 0:
+            fields[child.tag.rpartition('}')[2].lower()] = child.text or ''
+    return fields
+
+def andi_int(values):
+    """ str array to int as int(str(s).partition(':')[0]) (e.g. status
+    '0:OK' is 0), NaN cast to int for anything that is not a number"""
+    x = str2float([s.partition(':')[0] for s in values])
+    return numpy.array(x, dtype=int)
+
+# digits of YYYY?MM?DD?hh?mm?ss read at fixed offsets by andi_es()
+ANDI_STAMP_DIGITS = (0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18)
+
+def andi_es(stamps, start, utc_offset, name):
+    """Epoch seconds of Spongenet stamps YYYY-MM-DD hh:mm:ss at offset start
+
+    Digits are read at fixed offsets of the 19 characters from start
+    whatever the separators (e.g. 2010/04/01T12:00:00), as the
+    parsers did before read_andi().  A stamp that is cut short or has
+    no digit where one is expected is -1, and the number of these is
+    printed.
+    """
+    cut = [s[start:start+19] for s in stamps]
+    ok = numpy.array([len(s) == 19 for s in cut], dtype=bool)
+    chars = numpy.array([s.ljust(19) for s in cut], dtype='S19').view('S1').reshape((len(cut), 19))
+    digits = chars[:,ANDI_STAMP_DIGITS]
+    ok &= ((digits >= '0') & (digits <= '9')).all(axis=1)
+    # rebuild as ISO 8601 for str2es()
+    chars[:,[4, 7]] = '-'
+    chars[:,10] = ' '
+    chars[:,[13, 16]] = ':'
+    chars[~ok] = ''
+    es = str2es(chars.view('S19').ravel(), utc_offset)
+    nbad = (es < 0).sum()
+    if nbad:
+        print ' ... %d of %d %s stamps not read' % (nbad, len(es), name)
+    return es
+
+def andi_arrays(cols, sensor_info, points):
+    """ Fields of Devices read by read_andi() (lists of str) to arrays"""
+    utc_offset = sensor_info['utc_offset']
+    data = {
+        # sample time at the platform and the package
+        'time' : andi_es(cols['time'], 0, utc_offset, 'Time'),
+        'ptime' : andi_es(cols['data_time'], 0, utc_offset, 'Data Time'),
+        # platform (after 9 char prefix) and package session time
+        'session' : andi_es(cols['sessionid'], 9, utc_offset, 'SessionID'),
+        'psession' : andi_es(cols['data_sessionid'], 0, utc_offset, 'Data SessionID'),
+        'record' : andi_int(cols['recordnumber']),
+        'status' : andi_int(cols['status']),
+        'pstatus' : andi_int(cols['pstatus']),
+        }
+    for (name, dtype) in points:
+        d = sensor_info[name+'_description']
+        data[name] = numpy.array(str2float(cols[d]), dtype=dtype)
+    return data
+
+# Devices read by read_andi() before converting their fields to arrays
+ANDI_BATCH_SIZE = 10000
+
+def read_andi(sources, sensor_info, points):
+    """Stream Aanderaa (AADI) real-time XML of a Spongenet platform
+
+    Each Device element is one sample.  Only fields of the sensor
+    (SensorData with ID of sensor_info['id_number']) and its points
+    (by Descr, see sensor_info[name+'_description']) are kept, each
+    Device is dropped once read and fields are converted to arrays
+    ANDI_BATCH_SIZE Devices at a time, so memory does not grow with the
+    document.  Names are matched without namespace and case, whether
+    attribute or child element:
+
+       Device : Time, SessionID, RecordNumber, Status
+          Data : Time, SessionID (as data_time, data_sessionid)
+             SensorData : ID, Status
+                Point : Descr, Value
+
+    :Parameters:
+        sources : list of str or file object
+            XML file names or open files (e.g. LineFile(lines))
+        sensor_info : dict
+            Config of package, 'id_number', 'utc_offset' and the
+            description of each point
+        points : tuple of (name, dtype)
+            Variables to read (e.g. (('pressure', float),))
+
+    :Returns:
+        data : dict of numpy.array
+            time, ptime (platform and package sample time), session,
+            psession (epoch seconds, -1 if not read), record, status,
+            pstatus and each of points, NaN (cast to dtype) if missing
+    """
+    from xml.etree.cElementTree import iterparse
+    sensor_id = sensor_info['id_number']
+    descr = [sensor_info[name+'_description'] for (name, dtype) in points]
+    keys = ('time', 'data_time', 'sessionid', 'data_sessionid',
+            'recordnumber', 'status', 'pstatus')
+    cols = dict([(k, []) for k in keys + tuple(descr)])
+    parts = []
+
+    for source in sources:
+        stack = []
+        try:
+            for (event, elem) in iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                if elem.tag.rpartition('}')[2].lower() != 'device':
+                    continue
+                fields = andi_fields(elem)
+                values = {}
+                for child in elem:
+                    if child.tag.rpartition('}')[2].lower() != 'data':
+                        continue
+                    for (k, v) in andi_fields(child).items():
+                        fields['data_'+k] = v
+                    for sensor in child:
+                        if len(sensor) == 0:
+                            continue
+                        sf = andi_fields(sensor)
+                        if sf.get('id') != sensor_id:
+                            continue
+                        fields['pstatus'] = sf.get('status', '')
+                        for point in sensor:
+                            pf = andi_fields(point)
+                            if 'descr' in pf:
+                                values[pf['descr']] = pf.get('value', point.text or '')
+                for k in keys:
+                    cols[k].append(fields.get(k, ''))
+                for d in descr:
+                    cols[d].append(values.get(d, ''))
+                if len(cols['time']) >= ANDI_BATCH_SIZE:
+                    parts.append(andi_arrays(cols, sensor_info, points))
+                    for k in cols:
+                        cols[k] = []
+                # done with this sample, so free it
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+        except SyntaxError, e:
+            # cElementTree ParseError
+            print ' ... %s in XML, skipping rest of %s' % (e, getattr(source, 'name', source))
+
+    if cols['time'] or not parts:
+        parts.append(andi_arrays(cols, sensor_info, points))
+    return dict([(k, numpy.concatenate([part[k] for part in parts])) for k in parts[0]])
+
 def filt_datetime_test(input_string, remove_ext=True):
     """
     Following the template, (YY)YYMMDDhhmmss
@@ -166,205 +940,217 @@ def filt_datetime_test(input_string, remove_ext=True):
 
 
 
-def filt_datetime(input_string, gran=False, remove_ext=True):
-    """
-    Following the template, (YY)YYMMDDhhmmss
-    and versions with of this with decreasing time precision,
-    find the most precise, reasonable string match and
-    return its datetime object.
+# filt_datetime() templates, (YY)YYMMDDhhmmss and versions of this with
+# decreasing time precision.  Compiled once at import.
+#
+# YYYYMMDDhhmmss and should handle most cases of the stamp
+# other forms this should pass
+# YY_MM_DD_hh:mm:ss
+# YYYY_MM_DD_hh:mm:ss
+# YYYY,MM,DD,hh,mm,ss
+# YY,MM,DD,hh,mm,ss
+
+case1_regex = r"""
+# case 1: YYYYMMDDhhmmss 
+(\d{4})     # 2- or 4-digit YEAR (e.g. '07' or '2007')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH (e.g. '12')
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY of month (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit MINUTE (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit SECOND (e.g. '10')
+"""
 
-    gran=False don't return granularity number
-    
-    
-    """
+case2_regex = r"""
+# case 2: YYYYMMDDhhmm (no seconds) 
+(\d{4})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit MINUTE 
+"""
 
-    # remove any trailing filename extension
-    from os.path import splitext
-    import re
-    if remove_ext:
-        (s, e) = splitext(input_string)
-        input_string = s
-    
-    # YYYYMMDDhhmmss and should handle most cases of the stamp
-    # other forms this should pass
-    # YY_MM_DD_hh:mm:ss
-    # YYYY_MM_DD_hh:mm:ss
-    # YYYY,MM,DD,hh,mm,ss
-    # YY,MM,DD,hh,mm,ss
-
-    case1_regex = r"""
-    # case 1: YYYYMMDDhhmmss 
-    (\d{4})     # 2- or 4-digit YEAR (e.g. '07' or '2007')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH (e.g. '12')
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY of month (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit MINUTE (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit SECOND (e.g. '10')
-    """
+case3_regex = r"""
+# case 3: YYYYMMDDhh (no seconds, no minutes)
+(\d{4})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR 
+"""
 
-    case2_regex = r"""
-    # case 2: YYYYMMDDhhmm (no seconds) 
-    (\d{4})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit MINUTE 
-    """
+case4_regex = r"""
+# case 4: YYYYMMDD (no time values, just date)
+(\d{4})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+"""
 
-    case3_regex = r"""
-    # case 3: YYYYMMDDhh (no seconds, no minutes)
-    (\d{4})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR 
-    """
+case5_regex = r"""
+# case 5: YYYYMM (no time values, just month year)
+(\d{4})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+"""
 
-    case4_regex = r"""
-    # case 4: YYYYMMDD (no time values, just date)
-    (\d{4})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    """
+case6_regex = r"""
+# case 6: YYMMDDhhmmss 
+(\d{2})     # 2- or 4-digit YEAR (e.g. '07' or '2007')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH (e.g. '12')
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY of month (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit MINUTE (e.g. '10')
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit SECOND (e.g. '10')
+"""
 
-    case5_regex = r"""
-    # case 5: YYYYMM (no time values, just month year)
-    (\d{4})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    """
+case7_regex = r"""
+# case 7: YYMMDDhhmm (no seconds) 
+(\d{2})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
+(\d{2})           # 2-digit MINUTE 
+"""
 
-    case6_regex = r"""
-    # case 6: YYMMDDhhmmss 
-    (\d{2})     # 2- or 4-digit YEAR (e.g. '07' or '2007')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH (e.g. '12')
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY of month (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit MINUTE (e.g. '10')
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit SECOND (e.g. '10')
-    """
+case8_regex = r"""
+# case 8: YYMMDDhh (no seconds, no minutes)
+(\d{2})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
+(\d{2})           # 2-digit HOUR 
+"""
 
-    case7_regex = r"""
-    # case 7: YYMMDDhhmm (no seconds) 
-    (\d{2})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or ':')
-    (\d{2})           # 2-digit MINUTE 
-    """
+case9_regex = r"""
+# case 9: YYMMDD (no time values, just date)
+(\d{2})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+\D?               # optional 1 character non-digit separator
+(\d{2})           # 2-digit DAY 
+"""
 
-    case8_regex = r"""
-    # case 8: YYMMDDhh (no seconds, no minutes)
-    (\d{2})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or 'T')
-    (\d{2})           # 2-digit HOUR 
-    """
+case10_regex = r"""
+# case 10: YYMM (no time values, just month year)
+(\d{2})     # 2- or 4-digit YEAR 
+\D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
+(\d{2})           # 2-digit MONTH 
+"""
 
-    case9_regex = r"""
-    # case 9: YYMMDD (no time values, just date)
-    (\d{2})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    \D?               # optional 1 character non-digit separator
-    (\d{2})           # 2-digit DAY 
-    """
+##  Verbose regular expressions require use of re.VERBOSE flag.
+##  so we can use multiline regexp
 
-    case10_regex = r"""
-    # case 10: YYMM (no time values, just month year)
-    (\d{2})     # 2- or 4-digit YEAR 
-    \D?               # optional 1 character non-digit separator (e.g. ' ' or '-')
-    (\d{2})           # 2-digit MONTH 
-    """
+# cases are ordered from precise to more coarse resolution of time
+FILT_DATETIME_CASES = (case1_regex, case2_regex, case3_regex, case4_regex, case5_regex,
+                       case6_regex, case7_regex, case8_regex, case9_regex)
+FILT_DATETIME_PATTERNS = tuple([re.compile(c, re.VERBOSE) for c in FILT_DATETIME_CASES])
 
-    ##  Verbose regular expressions require use of re.VERBOSE flag.
-    ##  so we can use multiline regexp
-
-    # cases are ordered from precise to more coarse resolution of time
-    cases = [case1_regex, case2_regex, case3_regex, case4_regex, case5_regex, case6_regex, case7_regex, case8_regex, case9_regex]
-    patterns = [re.compile(c, re.VERBOSE) for c in cases]
-    matches = [p.search(input_string) for p in patterns]
-
-    # for testing, try to computer datetime objects
-    # just because there is a match does not mean it makes sense
-    for ind in range(len(matches)):
-        if bool(matches[ind]):
-            # print matches[ind].groups()
-            bits = matches[ind].groups()
-            values = [int(yi) for yi in bits]
-            # check for 2-digit year 
-            if values[0] < 50:
-                values[0] += 2000
-            elif values[0]>=50 and values[0]<100:
-                values[0] += 1900
-            #
-            # we must have at least 3 arg input to datetime
-            if len(values)==1:
-                values.extend([1,1]) # add First of January
-            elif len(values)==2:
-                values.extend([1]) # add first day of month
-
-            #
-            # compute dt
-            try:
-                dt = datetime(*values)
-            except ValueError, e:
-                # value error if something not valid for datetime
-                # e.g. month 1...12, something parsed wrong
-                dt = None
-            else:
-                # absolute difference in days from now (UTC)
-                z = dt - datetime.utcnow()
-                daysdiff = abs(z.days)
-                # if this date unreasonable (>10 years*365), throw it out
-                # garbage was parsed
-                if daysdiff > 3600:
-                    dt = None                
-        else:
-            dt = None
-        # place datetime object or None within sequence of matches
-        matches[ind] = dt
+# memo of filt_datetime() results, least recently used dropped first
+FILT_DATETIME_CACHE_SIZE = 65536
+filt_datetime_cache = OrderedDict()
+
+def filt_datetime(input_string, gran=False, remove_ext=True):
+    """
+    Following the template, (YY)YYMMDDhhmmss
+    and versions with of this with decreasing time precision,
+    find the most precise, reasonable string match and
+    return its datetime object.
 
-    # find the first (most precise) date match since there might be more than
-    # as we searched more coarse templates, but now we have thrown out 
+    gran=False don't return granularity number
     
-    b = [bool(x) for x in matches]
+    Results are memoized on input string (usually the file basename)
+    so repeated lookups of the same file only cost a dict lookup.
+    """
+    key = (input_string, remove_ext)
     try:
-        ind = b.index(True)
-    except ValueError, e:
+        # pop and put back to mark as most recently used
+        (dt, ind) = filt_datetime_cache.pop(key)
+    except KeyError:
+        (dt, ind) = match_datetime(input_string, remove_ext)
+        if len(filt_datetime_cache) >= FILT_DATETIME_CACHE_SIZE:
+            filt_datetime_cache.popitem(last=False)
+    filt_datetime_cache[key] = (dt, ind)
+
+    if dt is None:
+        if remove_ext:
+            input_string = os.path.splitext(input_string)[0]
         print 'filt_datetime: No date found in ', input_string
-        dt = None
+        return None
+    if gran:
+        return dt,ind
     else:
-       dt = matches[ind]
-       if gran:
-           return dt,ind
-       else:
-           return dt
+        return dt
+
+def match_datetime(input_string, remove_ext=True):
+    """ Uncached work of filt_datetime() returning (dt, granularity)
+
+    Patterns are tried from most to least precise and the first one
+    that makes a reasonable datetime is returned.  (None, None) if no
+    date found.
+    """
+    # remove any trailing filename extension
+    if remove_ext:
+        input_string = os.path.splitext(input_string)[0]
+
+    now_dt = None
+    for ind, p in enumerate(FILT_DATETIME_PATTERNS):
+        m = p.search(input_string)
+        if not m:
+            continue
+        values = [int(yi) for yi in m.groups()]
+        # check for 2-digit year 
+        if values[0] < 50:
+            values[0] += 2000
+        elif values[0]>=50 and values[0]<100:
+            values[0] += 1900
+        #
+        # we must have at least 3 arg input to datetime
+        if len(values)==1:
+            values.extend([1,1]) # add First of January
+        elif len(values)==2:
+            values.extend([1]) # add first day of month
+        #
+        # compute dt
+        # just because there is a match does not mean it makes sense
+        try:
+            dt = datetime(*values)
+        except ValueError, e:
+            # value error if something not valid for datetime
+            # e.g. month 1...12, something parsed wrong
+            continue
+        # absolute difference in days from now (UTC)
+        if now_dt is None:
+            now_dt = datetime.utcnow()
+        daysdiff = abs((dt - now_dt).days)
+        # if this date unreasonable (>10 years*365), throw it out
+        # garbage was parsed
+        if daysdiff > 3600:
+            continue
+        return (dt, ind)
+    return (None, None)
 
 def display_time_diff(diff):
     """Display time difference in HH:MM:DD using number weeks (W)
@@ -555,8 +1341,8 @@ def proc2latest(pi, si, yyyy_mm):
         print ' ... ... latest : %s ' % (ofn,)
         # get dt from current month file
         (es, units) = nc_get_time(ifn)
-        dt = [es2dt(e) for e in es]
-        last_dt = dt[-1]
+        es = numpy.asarray(es)
+        last_dt = es2dt(es[-1])
     else:
         # no input then remove output if exists and exit
         print " ... ... latest: NO latest file created"
@@ -565,16 +1351,14 @@ def proc2latest(pi, si, yyyy_mm):
         return
 
     # determine which index of data is within the specified timeframe (last 2 days)
-    n = len(dt)
-    idx = numpy.array([False for i in range(n)])
-    for i, val in enumerate(dt):
-        if val>last_dt-timedelta(days=2) and val<=last_dt+timedelta(seconds=360):
-            idx[i] = True
-    dt = numpy.array(dt)
-    dt = dt[idx]
+    idx = (es > es[-1]-2*86400) & (es <= es[-1]+360)
+    # only read records from first in timeframe on
+    ii = idx.nonzero()[0]
+    recs = slice(ii[0], ii[-1]+1)
+    idx = idx[recs]
 
     # read in data and unpack tuple
-    d = nc_load(ifn, si['latest_vars'])
+    d = nc_load(ifn, si['latest_vars'], recs=recs)
     global_atts, var_atts, dim_inits, var_inits, var_data = d
     list_of_record_vars = nc_find_record_vars(ifn)
 
@@ -585,7 +1369,7 @@ def proc2latest(pi, si, yyyy_mm):
     dim_inits = list(dim_inits)
     for i in range(len(dim_inits)):
         if dim_inits[i][1]==0:
-            dim_inits[i] = ('ntime', len(dt))        
+            dim_inits[i] = ('ntime', idx.sum())        
     dim_inits = tuple(dim_inits)
 
     # subset data
@@ -598,7 +1382,7 @@ def proc2latest(pi, si, yyyy_mm):
             var_data[i]=(vn, vd[idx])
     var_data = tuple(var_data)
 
-    global_atts['start_date'] = dt[0].strftime('%Y-%m-%d %H:%M:%S')
+    global_atts['start_date'] = es2dt(es[recs][idx][0]).strftime('%Y-%m-%d %H:%M:%S')
     d = (global_atts, var_atts, dim_inits, var_inits, var_data)
 
     # write latest data
@@ -640,8 +1424,8 @@ def proc2csv(pi, si, yyyy_mm):
         print ' ... ... csv : %s ' % (ofn,)
         # get dt from current month file
         (es, units) = nc_get_time(ifn)
-        dt = [es2dt(e) for e in es]
-        last_dt = dt[-1]
+        es = numpy.asarray(es)
+        last_dt = es2dt(es[-1])
     else:
         # no input then report fact csv file 
         print ' ... ... csv: NO csv data reported '
@@ -649,17 +1433,15 @@ def proc2csv(pi, si, yyyy_mm):
         f.close()
         return
     
-    # determine which index of data is within the specified timeframe (last 2 days)
-    n = len(dt)
-    idx = numpy.array([False for i in range(n)])
-    for i, val in enumerate(dt):
-        if val>last_dt-timedelta(days=1) and val<=last_dt+timedelta(seconds=360):
-            idx[i] = True
-    dt = numpy.array(dt)
-    dt = dt[idx]
+    # determine which index of data is within the specified timeframe (last day)
+    idx = (es > es[-1]-86400) & (es <= es[-1]+360)
+    # only read records from first in timeframe on
+    ii = idx.nonzero()[0]
+    recs = slice(ii[0], ii[-1]+1)
+    idx = idx[recs]
 
     # read in data and unpack tuple
-    d = nc_load(ifn, si['csv_vars'])
+    d = nc_load(ifn, si['csv_vars'], recs=recs)
     global_atts, var_atts, dim_inits, var_inits, var_data = d
 
     # dts = es2dt(dt[-1])
@@ -28,6 +28,7 @@ __author__ = "Sara Haines <sara_haines@unc.edu>"
 import sys
 import os
 import re
+import mmap
 import traceback
 
 # for production use:
@@ -58,17 +59,304 @@ def load_data(inFile):
         print 'File does not exist: '+ inFile
     return lines
 
+class RawReader(object):
+    """Read complete lines of a raw file as a stream
+
+    The first nheader lines are kept as header (see header()) and
+    data lines are read from byte offset (or just after the header)
+    one at a time, so the whole file is never held in memory.  If
+    tail, a last line still being written (no newline yet) is left for
+    the next read, otherwise it is read like any other line.
+
+    Example
+    -------
+    >>> reader = RawReader(fn, offset, nheader=4, tail=True)
+    >>> for lines in reader.chunks(32*1024*1024):
+    ...     data = parse(pi, si, lines)
+    >>> offset = reader.end
+
+    """
+    def __init__(self, fn, offset=0, nheader=0, tail=False):
+        self.fn = fn
+        self.tail = tail
+        f = open(fn, 'r')
+        self._header = [f.readline() for i in range(nheader)]
+        f.close()
+        if [line for line in self._header if not line.endswith('\n')]:
+            # header not complete yet, so no data either
+            self._header = []
+            self.start = None
+            self.end = 0
+        else:
+            # byte offset of first data line to read
+            self.start = max(offset, sum([len(line) for line in self._header]))
+            # byte offset after last complete line read
+            self.end = self.start
+
+    def header(self):
+        """ Header lines (peek without reading any data line)"""
+        return list(self._header)
+
+    def __iter__(self):
+        """ Iterate data lines (complete ones if tail), advancing self.end"""
+        if self.start is None:
+            return
+        f = open(self.fn, 'r')
+        f.seek(self.start)
+        for line in f:
+            if self.tail and not line.endswith('\n'):
+                break
+            self.end += len(line)
+            yield line
+        f.close()
+
+    def chunks(self, nbytes=None):
+        """Lists of header lines followed by data lines of up to nbytes
+
+        If nbytes is None, all data lines are in one list.  Nothing is
+        yielded if there are no complete data lines.
+        """
+        lines = []; size = 0
+        for line in self:
+            lines.append(line)
+            size += len(line)
+            if nbytes and size >= nbytes:
+                yield self.header() + lines
+                lines = []; size = 0
+        if lines:
+            yield self.header() + lines
+
+class RawMap(object):
+    """Memory-mapped raw file read as a list of lines
+
+    The file is mapped read-only and line boundaries are found from
+    its newlines, so no str is made for a line until it is indexed.
+    A parser can use it like the list from load_data() (len, index,
+    slice and iterate) or read many lines of numbers at once with
+    floats(), which works on files larger than memory.
+
+    Example
+    -------
+    >>> lines = RawMap(fn)
+    >>> len(lines)
+    9700
+    >>> Sxx = lines.floats(0, 97).reshape((97, 90))
+
+    """
+    # bytes of map searched for newlines at a time
+    scan_bytes = 64*1024*1024
+
+    def __init__(self, fn):
+        self.fn = fn
+        f = open(fn, 'rb')
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # cannot map empty file
+            self._map = ''
+        f.close()
+        # byte offset after last line (as RawReader.end)
+        self.end = size
+        # byte offset of start of each line and end of last one
+        ends = [numpy.zeros((1,), dtype=numpy.int64)]
+        for start in range(0, size, self.scan_bytes):
+            buf = numpy.frombuffer(self._map[start:start+self.scan_bytes],
+                                   dtype=numpy.uint8)
+            ends.append(numpy.flatnonzero(buf==ord('\n')).astype(numpy.int64)+start+1)
+        self._bounds = numpy.concatenate(ends)
+        if self._bounds[-1] != size:
+            # last line has no newline
+            self._bounds = numpy.append(self._bounds, size)
+
+    def __len__(self):
+        return len(self._bounds)-1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('line index out of range')
+        return self._map[self._bounds[i]:self._bounds[i+1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, start=0, stop=None):
+        """ Lines start to stop (not included) as one str"""
+        (start, stop, step) = slice(start, stop).indices(len(self))
+        return self._map[self._bounds[start]:self._bounds[max(start, stop)]]
+
+    def floats(self, start=0, stop=None, sep=' '):
+        """ Numbers in lines start to stop as one flat array of floats
+
+        Fields are separated by sep or any whitespace (so newlines end a
+        field too).  Lines must hold numbers only.
+        """
+        return numpy.fromstring(self.text(start, stop), dtype=float, sep=sep)
+
+    def close(self):
+        if hasattr(self._map, 'close'):
+            self._map.close()
+
+def load_mmap(inFile):
+    """Map raw file as RawMap, like load_data() without reading it"""
+    lines=None
+    if os.path.exists(inFile):
+        lines = RawMap(inFile)
+        if len(lines)<=0:
+            print 'Empty file: '+ inFile           
+    else:
+        print 'File does not exist: '+ inFile
+    return lines
+
+def manifest_filename(si):
+    """Manifest of raw files already processed into si['proc_filename']"""
+    (base, ext) = os.path.splitext(si['proc_filename'])
+    return os.path.join(si['proc_dir'], '.%s.manifest' % base)
+
+def load_manifest(mfn):
+    """Read raw file manifest
+
+    Each line is size read, mtime (before the read), byte offset
+    consumed and raw file name.  Size read is the offset consumed, so
+    a file that grew during the read or has an unterminated last line
+    is larger than listed and is checked again.
+
+    :Returns:
+       manifest : dict
+           {filename : (size, mtime, offset)}, empty if no manifest yet
+    """
+    manifest = {}
+    if os.path.exists(mfn):
+        f = open(mfn, 'r')
+        for line in f:
+            try:
+                (size, mtime, offset, fn) = line.rstrip('\n').split(' ', 3)
+                manifest[fn] = (int(size), float(mtime), int(offset))
+            except ValueError:
+                print ' ... ... skipping bad manifest line in %s' % mfn
+        f.close()
+    return manifest
+
+def save_manifest(mfn, manifest):
+    """Write raw file manifest (see load_manifest())"""
+    tmp = mfn+'.tmp'
+    f = open(tmp, 'w')
+    for fn in sorted(manifest.keys()):
+        (size, mtime, offset) = manifest[fn]
+        f.write('%d %r %d %s\n' % (size, mtime, offset, fn))
+    f.close()
+    os.rename(tmp, mfn)
+
+def select_raw(raw_files, manifest, tail=False):
+    """Limit raw files to those new or changed since listed in manifest
+
+    Files with same size and mtime as in manifest (all of file read)
+    are skipped without being opened.  If tail, a file with more bytes
+    than consumed last time is read from that offset, otherwise
+    changed files are read whole.  A tailed file not modified since
+    last time (same mtime) is finished, so its last line is read even
+    without a newline.
+
+    :Returns:
+       (new_files, offsets, stats, finished) : list, dict, dict, list
+           Files to process, {filename : start offset},
+           {filename : (size, mtime)} of every raw file before reading
+           and files to read to the end (see process())
+    """
+    new_files = []; offsets = {}; stats = {}; finished = []
+    for fn in raw_files:
+        st = os.stat(fn)
+        stats[fn] = (st.st_size, st.st_mtime)
+        if fn in manifest:
+            (size, mtime, offset) = manifest[fn]
+            if stats[fn] == (size, mtime) and offset >= size:
+                continue
+            if tail and st.st_size >= offset:
+                new_files.append(fn)
+                offsets[fn] = offset
+                if st.st_mtime == mtime:
+                    # no longer written, rest is a last line with no newline
+                    finished.append(fn)
+                continue
+        new_files.append(fn)
+        offsets[fn] = 0
+    return (new_files, offsets, stats, finished)
+
 def import_parser(name):
     mod = __import__('parsers')
     parser = getattr(mod, name)
     return parser
 
+# processor modules loaded in this process
+# {mod_name : (module, (parser, creator, updater))}
+processor_registry = {}
+# seconds to import each processor module (see processor_import_report())
+processor_import_times = {}
+
+def load_processor(mod_name):
+    """Import processor module once per process and time the import
+
+    :Returns:
+       (mod, (parser, creator, updater)) : tuple
+    """
+    import time
+    if mod_name not in processor_registry:
+        t0 = time.time()
+        mod = __import__(mod_name)
+        processor_import_times[mod_name] = time.time() - t0
+        parser = getattr(mod, 'parser')
+        creator = getattr(mod, 'creator')
+        updater = getattr(mod, 'updater')
+        processor_registry[mod_name] = (mod, (parser, creator, updater))
+    return processor_registry[mod_name]
+
 def import_processors(mod_name):
-    mod = __import__(mod_name)
-    parser = getattr(mod, 'parser')
-    creator = getattr(mod, 'creator')
-    updater = getattr(mod, 'updater')
-    return (parser, creator, updater)
+    return load_processor(mod_name)[1]
+
+def get_raw_header_lines(mod_name):
+    """Number of header lines for reading a growing raw file from its
+    last offset, None if processor needs whole file every time"""
+    mod = load_processor(mod_name)[0]
+    return getattr(mod, 'raw_header_lines', None)
+
+def get_raw_mmap(mod_name):
+    """Whether processor takes a memory-mapped raw file (see RawMap)
+    instead of a list of lines"""
+    mod = load_processor(mod_name)[0]
+    return getattr(mod, 'raw_mmap', False)
+
+def get_batch_parser(mod_name):
+    """Parser of processor for many raw files in one call, None if it
+    parses one file at a time"""
+    mod = load_processor(mod_name)[0]
+    return getattr(mod, 'batch_parser', None)
+
+def get_fixed_vars(mod_name):
+    """Keys of parsed data that hold one value for all records (e.g.
+    bin depths or spectral frequencies), empty if every array is per
+    record"""
+    mod = load_processor(mod_name)[0]
+    return tuple(getattr(mod, 'fixed_vars', ()))
+
+def processor_import_report(import_times=None):
+    """Print import time of processor modules, slowest first
+
+    By default those loaded so far in this process.  Time of a module
+    includes any dependency it was first to import (e.g. numpy), so
+    order of loading matters.
+    """
+    if import_times is None:
+        import_times = processor_import_times
+    times = sorted(import_times.items(), key=lambda x: -x[1])
+    print ' ... processor import times'
+    for (mod_name, secs) in times:
+        print ' ... ... %-40s %8.3f s' % (mod_name, secs)
+    print ' ... ... %-40s %8.3f s' % ('total', sum([t for m, t in times]))
     
 
 def get_config(name):
@@ -100,7 +388,148 @@ def get_config_dates(pi):
         config_end_dt = now_dt
     return (config_start_dt, config_end_dt)
 
-def find_configs(platform, yyyy_mm, config_dir=''):
+# config registry for each config_dir (see load_config_registry())
+config_registry = {}
+
+# on-disk copy of config registry, so a cron run need not import every
+# config to find out what to process (see load_config_index())
+config_index_dir = os.path.expanduser('~/.raw2proc')
+CONFIG_INDEX_VERSION = 1
+
+def config_index_filename(config_dir):
+    """ Config index file for config_dir, named by hash of its path"""
+    import hashlib
+    key = hashlib.md5(os.path.abspath(config_dir)).hexdigest()
+    return os.path.join(config_index_dir, 'config_index_%s.pkl' % key)
+
+def load_config_index(config_dir):
+    """Config registry entries saved by save_config_index()
+
+    :Returns:
+       configs : dict
+           {cn : entry} (see config_entry()), empty if no index or
+           saved by another version
+    """
+    import cPickle
+    fn = config_index_filename(config_dir)
+    try:
+        f = open(fn, 'rb')
+        (version, configs) = cPickle.load(f)
+        f.close()
+    except (IOError, EOFError, ValueError, TypeError, cPickle.UnpicklingError):
+        return {}
+    if version != CONFIG_INDEX_VERSION:
+        return {}
+    return configs
+
+def save_config_index(config_dir, configs):
+    """ Save config registry entries for next run (see load_config_index())"""
+    import cPickle
+    fn = config_index_filename(config_dir)
+    try:
+        if not os.path.exists(config_index_dir):
+            os.makedirs(config_index_dir)
+        tmp = '%s.%d' % (fn, os.getpid())
+        f = open(tmp, 'wb')
+        cPickle.dump((CONFIG_INDEX_VERSION, configs), f, 2)
+        f.close()
+        os.rename(tmp, fn)
+    except (IOError, OSError), e:
+        print ' ... ... NOTE: config index not saved: %s' % e
+
+def config_entry(cn, path, mtime, changed=False):
+    """ Summary of a config file kept in registry"""
+    if changed and cn in sys.modules:
+        # config file changed since first imported
+        reload(sys.modules[cn])
+    pi = get_config(cn+'.platform_info')
+    asi = get_config(cn+'.sensor_info')
+    start_dt = end_dt = None
+    if pi['config_start_date']:
+        start_dt = filt_datetime(pi['config_start_date'])
+    if pi['config_end_date']:
+        end_dt = filt_datetime(pi['config_end_date'])
+    return {'cn' : cn,
+            'path' : path,
+            'mtime' : mtime,
+            'platform' : cn.split('_config_')[0],
+            'id' : pi['id'],
+            'packages' : list(pi['packages']),
+            'sensors' : list(asi.keys()),
+            'start_dt' : start_dt,
+            'end_dt' : end_dt,
+            }
+
+def config_entry_dates(c):
+    """ Start and end datetime of config entry, now if not set (see get_config_dates())"""
+    now_dt = datetime.utcnow()
+    return (c['start_dt'] or now_dt, c['end_dt'] or now_dt)
+
+def load_config_registry(config_dir=defconfigs):
+    """Index of all config files in config_dir
+
+    Each config is imported only if not in the on-disk config index
+    (see load_config_index()) or the mtime of its file changed, so
+    usually no config is imported to build the registry.  Configs of
+    each platform are sorted by start so overlapping configs are found
+    by bisection (see find_configs()).
+
+    :Returns:
+       reg : dict
+           'configs' : {cn : entry} (see config_entry())
+           'index' : {platform : (starts, max_ends, entries)} and
+                     {(platform, package) : (starts, max_ends, entries)}
+    """
+    import glob
+    if config_dir not in config_registry:
+        config_registry[config_dir] = {'configs' : load_config_index(config_dir),
+                                       'index' : None}
+    reg = config_registry[config_dir]
+    configs = reg['configs']
+    changed = False
+    paths = glob.glob(os.path.join(config_dir, '*_config_*.py'))
+    found = {}
+    for path in paths:
+        cn = os.path.splitext(os.path.basename(path))[0]
+        found[cn] = path
+        mtime = os.path.getmtime(path)
+        if cn not in configs:
+            configs[cn] = config_entry(cn, path, mtime)
+            changed = True
+        elif configs[cn]['mtime'] != mtime:
+            configs[cn] = config_entry(cn, path, mtime, changed=True)
+            changed = True
+    for cn in configs.keys():
+        if cn not in found:
+            del configs[cn]
+            changed = True
+    if changed:
+        save_config_index(config_dir, configs)
+    if changed or reg['index'] is None:
+        reg['index'] = index_configs(configs.values())
+    return reg
+
+def index_configs(entries):
+    """ Interval index of config entries by platform and (platform, package)"""
+    groups = {}
+    for c in entries:
+        groups.setdefault(c['platform'], []).append(c)
+        for package in c['packages']:
+            groups.setdefault((c['platform'], package), []).append(c)
+    index = {}
+    for key, group in groups.items():
+        # undefined start sorts last (it is now when looked up, see
+        # find_configs()) and undefined end is open-ended
+        group.sort(key=lambda c: (c['start_dt'] or datetime.max, c['cn']))
+        starts = [c['start_dt'] or datetime.max for c in group]
+        max_ends = []
+        for c in group:
+            end_dt = c['end_dt'] or datetime.max
+            max_ends.append(max(max_ends[-1], end_dt) if max_ends else end_dt)
+        index[key] = (starts, max_ends, group)
+    return index
+
+def find_configs(platform, yyyy_mm, config_dir='', package=None):
     """Find which configuration files for specified platform and month
 
     :Parameters:
@@ -109,32 +538,42 @@ def find_configs(platform, yyyy_mm, config_dir=''):
        yyyy_mm : string
            Year and month of data to process (e.g. '2007_07')
 
+    :Other Parameters:
+       package : string
+           Only configs with this package (e.g. 'adcp')
+
     :Returns:
        cns : list of str
            List of configurations that overlap with desired month
            If empty [], no configs were found
     """
-    import glob
-    # list of config files based on platform
-    configs = glob.glob(os.path.join(config_dir, platform + '_config_*.py'))
-    configs.sort()
+    from bisect import bisect_left, bisect_right
     # determine when month starts and ends
     (prev_month, this_month, next_month) = find_months(yyyy_mm)
     month_start_dt = this_month
     month_end_dt = next_month - timedelta(seconds=1)
     # print month_start_dt; print month_end_dt
-    # 
+
+    reg = load_config_registry(config_dir)
+    key = platform
+    if package:
+        key = (platform, package)
+    if key not in reg['index']:
+        return []
+    (starts, max_ends, entries) = reg['index'][key]
+    # configs starting after month, or all ending before it, cannot overlap
+    hi = bisect_right(starts, month_end_dt)
+    lo = bisect_left(max_ends, month_start_dt)
+    # configs without start (last) start now, so always check them
+    undated = max(hi, bisect_left(starts, datetime.max))
     cns = []
-    for config in configs:
-        cn = os.path.splitext(os.path.basename(config))[0]
-        pi = get_config(cn+'.platform_info')
-        (config_start_dt, config_end_dt) = get_config_dates(pi)
-        if (config_start_dt <= month_start_dt or config_start_dt <= month_end_dt) and \
-               (config_end_dt >= month_start_dt or config_end_dt >= month_end_dt):
-            cns.append(cn)
+    for c in entries[lo:hi] + entries[undated:]:
+        (config_start_dt, config_end_dt) = config_entry_dates(c)
+        if config_start_dt <= month_end_dt and config_end_dt >= month_start_dt:
+            cns.append(c['cn'])
+    cns.sort()
     return cns
 
-
 def find_active_configs(config_dir=defconfigs):
     """Find which configuration files are active
 
@@ -143,19 +582,10 @@ def find_active_configs(config_dir=defconfigs):
            List of configurations that overlap with desired month
            If empty [], no configs were found
     """
-    import glob
-    # list of all config files 
-    configs = glob.glob(os.path.join(config_dir, '*_config_*.py'))
-    cns = []
-    for config in configs:
-        # datetime from filename 
-        cn = os.path.splitext(os.path.basename(config))[0]
-        pi = get_config(cn+'.platform_info')
-        if pi['config_end_date'] == None:
-            cns.append(cn)
+    reg = load_config_registry(config_dir)
+    cns = [cn for cn, c in reg['configs'].items() if c['end_dt'] is None]
     return cns
 
-
 def uniqify(seq):
     seen = {}
     result = []
@@ -176,17 +606,8 @@ def get_all_platforms(config_dir=defconfigs):
        pids : list of str
            Sorted list of all the platforms
     """
-    import glob
-    # list of all config files 
-    configs = glob.glob(os.path.join(config_dir, '*_config_*.py'))
-    configs.sort()
-    pids = []
-    for config in configs:
-        # datetime from filename 
-        cn = os.path.splitext(os.path.basename(config))[0]
-        pi = get_config(cn+'.platform_info')
-        if pi['id']:
-            pids.append(pi['id'])
+    reg = load_config_registry(config_dir)
+    pids = [c['id'] for c in reg['configs'].values() if c['id']]
     pids = uniqify(pids)
     pids.sort()
     return pids
@@ -198,20 +619,20 @@ def get_all_packages(platform, config_dir=defconfigs):
        sids : list of str
            Sorted list of all the sensor ids for package
     """
-    import glob
-    # list of all config files 
-    configs = glob.glob(os.path.join(config_dir, platform + '_config_*.py'))
-    configs.sort()
-    #
     sids = []
-    for config in configs:
-        cn = os.path.splitext(os.path.basename(config))[0]
-        pi = get_config(cn+'.platform_info')
-        sids.extend(list(pi['packages']))
+    for c in get_platform_entries(platform, config_dir):
+        sids.extend(c['packages'])
     sids = uniqify(sids)
     sids.sort()
     return sids
 
+def get_platform_entries(platform, config_dir=defconfigs):
+    """ Registry entries of all configs for a platform, sorted by name"""
+    reg = load_config_registry(config_dir)
+    entries = [c for c in reg['configs'].values() if c['platform'] == platform]
+    entries.sort(key=lambda c: c['cn'])
+    return entries
+
 def get_all_platform_configs(platform, config_dir=defconfigs):
     """Get all the config files for a platform
 
@@ -219,15 +640,7 @@ def get_all_platform_configs(platform, config_dir=defconfigs):
        cns : list of config names
            Sorted list of all the sensor ids for package
     """
-    import glob
-    # list of all config files 
-    configs = glob.glob(os.path.join(config_dir, platform + '_config_*.py'))
-    configs.sort()
-    #
-    cns = []
-    for config in configs:
-        cn = os.path.splitext(os.path.basename(config))[0]
-        cns.append(cn)
+    cns = [c['cn'] for c in get_platform_entries(platform, config_dir)]
     return cns
 
 def get_config_packages(cn):
@@ -287,7 +700,7 @@ def create_spin_list(plats, packs, dates, config_dir=defconfigs):
     platforms = []
     if type(plats) == str:
         if plats.upper() == 'ALL':
-            platforms = get_all_platforms()
+            platforms = get_all_platforms(config_dir)
         else:
             platforms = [plats] # make one platform iterable
     else: platforms = plats
@@ -302,7 +715,7 @@ def create_spin_list(plats, packs, dates, config_dir=defconfigs):
         packages = []
         if type(packs) == str:
             if packs.upper() == 'ALL':
-                packages = get_all_packages(platform)
+                packages = get_all_packages(platform, config_dir)
             else:
                 packages = [packs] # make one package iterable
         else: packages = packs
@@ -313,12 +726,10 @@ def create_spin_list(plats, packs, dates, config_dir=defconfigs):
             months = []
             if type(dates) == str:
                 if dates.upper() == 'ALL':
-                    cns = get_all_platform_configs(platform)
                     months = []
-                    for cn in cns:
-                        pi = get_config(cn+'.platform_info')
-                        (dts, dte) = get_config_dates(pi)
-                        if package in pi['packages']:
+                    for c in get_platform_entries(platform, config_dir):
+                        (dts, dte) = config_entry_dates(c)
+                        if package in c['packages']:
                             months.extend(list_months(dts, dte))
                 else:
                     months = [dates] # make on date iterable
@@ -327,11 +738,9 @@ def create_spin_list(plats, packs, dates, config_dir=defconfigs):
                 # if dates has two datetime types
                 if type(dates[0]) == type(dates[1]) == type(datetime.utcnow()):
                     dt1, dt2 = dates
-                    cns = get_all_platform_configs(platform)
                     months = []
-                    for cn in cns:
-                        pi = get_config(cn+'.platform_info')
-                        (dts, dte) = get_config_dates(pi)
+                    for c in get_platform_entries(platform, config_dir):
+                        (dts, dte) = config_entry_dates(c)
 
                         if dts<=dt1 and dt1<=dte: a = dt1
                         elif dt1<=dts and dt1<=dte: a = dts
@@ -342,7 +751,7 @@ def create_spin_list(plats, packs, dates, config_dir=defconfigs):
                         if dte<dt1 or dt2<dts:
                             continue
                         # list only months that are in configs for wide date range
-                        if package in pi['packages']:
+                        if package in c['packages']:
                             months.extend(list_months(a,b))
                 # else if string in list
                 elif type(dates[0]) == str:
@@ -420,7 +829,8 @@ def which_raw(pi, raw_files, dts):
     return new_list
         
 
-def raw2proc(proctype, platform=None, package=None, yyyy_mm=None):
+def raw2proc(proctype, platform=None, package=None, yyyy_mm=None, workers=1, timeout=None,
+             import_report=False):
     """
     Process data either in auto-mode or manual-mode
 
@@ -439,6 +849,16 @@ def raw2proc(proctype, platform=None, package=None, yyyy_mm=None):
        yyyy_mm : string
            Year and month of data to process (e.g. '2007_07')
 
+    :Other Parameters:
+       workers : int
+           Number of processes used in auto- or spin-mode (default 1, serial)
+       timeout : float
+           Seconds before a (config, package) unit is terminated in
+           auto-mode (default None, no limit)
+       import_report : bool
+           Print import time of each processor module at the end of
+           auto-mode (see processor_import_report())
+
     Examples
     --------
     >>> raw2proc(proctype='manual', platform='bogue', package='adcp', yyyy_mm='2007_06')
@@ -457,13 +877,16 @@ def raw2proc(proctype, platform=None, package=None, yyyy_mm=None):
     
     Not a good idea but this will reprocess all the data from level0 
     >>> raw2proc('spin', 'ALL', 'ALL', 'ALL')
+
+    unless spread across a pool of processes, one month per worker
+    >>> raw2proc('spin', 'ALL', 'ALL', 'ALL', workers=16)
           
     """
     print '\nStart time for raw2proc: %s\n' % start_dt.strftime("%Y-%b-%d %H:%M:%S UTC")
 
     if proctype == 'auto':
         print 'Processing in auto-mode, all platforms, all packages, latest data'
-        auto()
+        auto(workers=workers, timeout=timeout, import_report=import_report)
     elif proctype == 'manual':
         if platform and package and yyyy_mm:
             print 'Processing in manual-mode ...'
@@ -481,9 +904,11 @@ def raw2proc(proctype, platform=None, package=None, yyyy_mm=None):
             print ' ...  platform ids : %s' % platform
             print ' ... package names : %s' % package
             print ' ...        months : %s' % yyyy_mm
+            print ' ...       workers : %d' % workers
             print ' ...   starting at : %s' % start_dt.strftime("%Y-%m-%d %H:%M:%S UTC")
             spin_list = create_spin_list(platform, package, yyyy_mm)
-            spin(spin_list)
+            results = spin(spin_list, workers=workers)
+            spin_summary(results)
         else:
             print "raw2proc: Spin operation requires platform(s), package(s), and month(s)"
             print "   >>> raw2proc(proctype='spin', platform='b1', package='ALL', yyyy_mm='ALL')"
@@ -494,7 +919,7 @@ def raw2proc(proctype, platform=None, package=None, yyyy_mm=None):
         print 'raw2proc: requires either auto or manual operation'
 
 
-def auto():
+def auto(workers=1, timeout=None, import_report=False):
     """Process all platforms, all packages, latest data
 
     Notes
@@ -510,65 +935,359 @@ def auto():
            yyyy_mm is the current month
            load this months netcdf, if new month, create this months netcdf
            update modified date and append new data in netcdf
-           
+
+    :Other Parameters:
+       workers : int
+           Number of (config, package) units run at once, each in its
+           own process.  If 1 (default) and no timeout, run serially
+           in this process.
+       timeout : float or None
+           Seconds a unit may run before its process is terminated.
+           If set, units run in their own processes even when
+           workers is 1.  None (default) waits indefinitely.
+       import_report : bool
+           Print import time of each processor module after the
+           summary, slowest import of the module by any unit
+
+    :Returns:
+       results : list of dict
+           One result per (config, package) unit (see auto_item())
     """
     yyyy_mm = this_month()
-    months = find_months(yyyy_mm)
-    month_start_dt = months[1]
-    month_end_dt = months[2] - timedelta(seconds=1)
 
     configs = find_active_configs(config_dir=defconfigs)
+    results = []
     if configs:
-        # for each configuration 
+        # one unit of work for each sensor package of each configuration
+        # (from config index, each config is imported only by its units)
+        reg = load_config_registry(defconfigs)
+        units = []
         for cn in configs:
-            print ' ... config file : %s' % cn
-            pi = get_config(cn+'.platform_info')
-            asi = get_config(cn+'.sensor_info')
-            platform = pi['id']
-            (pi['config_start_dt'], pi['config_end_dt']) = get_config_dates(pi)
-
-            # for each sensor package
-            for package in asi.keys():
-                try: # if package files, try next package
-                    print ' ... package name : %s' % package
-                    si = asi[package]
-                    si['proc_filename'] = '%s_%s_%s.nc' % (platform, package, yyyy_mm)
-                    ofn = os.path.join(si['proc_dir'], si['proc_filename'])
-                    si['proc_start_dt'] = month_start_dt
-                    si['proc_end_dt'] = month_end_dt
-                    if os.path.exists(ofn):
-                        # get last dt from current month file
-                        (es, units) = nc_get_time(ofn)
-                        last_dt = es2dt(es[-1])
-                        # if older than month_start_dt use it instead to only process newest data
-                        if last_dt>=month_start_dt:
-                            si['proc_start_dt'] = last_dt
-
-                    (raw_files, raw_dts) = find_raw(si, yyyy_mm)
-                    raw_files = which_raw(pi, raw_files, raw_dts)
-                    if raw_files:
-                        process(pi, si, raw_files, yyyy_mm)
-                    else:
-                        print ' ... ... NOTE: no new raw files found'
-
-                    # update latest data for SECOORA commons
-                    if 'latest_dir' in si.keys():
-                        # print ' ... ... latest : %s ' % si['latest_dir']
-                        proc2latest(pi, si, yyyy_mm)
-
-                    if 'csv_dir' in si.keys():
-                        proc2csv(pi, si, yyyy_mm)
-                except:
-                    traceback.print_exc()
+            units.extend([(cn, package) for package in reg['configs'][cn]['sensors']])
+
+        if workers<=1 and not timeout:
+            last_cn = None
+            for unit in units:
+                if unit[0] != last_cn:
+                    last_cn = unit[0]
+                    print ' ... config file : %s' % last_cn
+                results.append(auto_item(unit, yyyy_mm))
+        else:
+            # units in their own processes, so a stalled one can be terminated
+            results = run_units(units, yyyy_mm, max(workers, 1), timeout)
+        auto_summary(results)
+        if import_report:
+            import_times = {}
+            for r in results:
+                for (mod_name, secs) in r['import_times'].items():
+                    import_times[mod_name] = max(secs, import_times.get(mod_name, 0.))
+            processor_import_report(import_times)
     #
     else:
         print ' ... ... NOTE: No active platforms'
+    return results
+
+def auto_package(cn, package, yyyy_mm):
+    """Process latest data of one package of an active config
+
+    :Returns:
+       (nfiles, nrecs) : tuple of int
+           Number of raw files parsed and records written (see process())
+    """
+    months = find_months(yyyy_mm)
+    month_start_dt = months[1]
+    month_end_dt = months[2] - timedelta(seconds=1)
 
-def spin(spin_list):
-    """ wrapper to run manual() for multiple months"""
-    for item in spin_list:
-        platform, package, yyyy_mm = item
-        raw2proc('manual',platform, package, yyyy_mm)
+    pi = get_config(cn+'.platform_info')
+    asi = get_config(cn+'.sensor_info')
+    platform = pi['id']
+    (pi['config_start_dt'], pi['config_end_dt']) = get_config_dates(pi)
+
+    nfiles = 0; nrecs = 0
+    print ' ... package name : %s' % package
+    si = asi[package]
+    si['proc_filename'] = '%s_%s_%s.nc' % (platform, package, yyyy_mm)
+    ofn = os.path.join(si['proc_dir'], si['proc_filename'])
+    si['proc_start_dt'] = month_start_dt
+    si['proc_end_dt'] = month_end_dt
+    if os.path.exists(ofn):
+        # get last dt from current month file
+        (es, units) = nc_get_last_time(ofn)
+        # if older than month_start_dt use it instead to only process newest data
+        if es is not None and es2dt(es)>=month_start_dt:
+            si['proc_start_dt'] = es2dt(es)
+
+    (raw_files, raw_dts) = find_raw(si, yyyy_mm)
+    raw_files = which_raw(pi, raw_files, raw_dts)
+
+    # skip raw files unchanged since last run, only new lines of growing ones
+    mfn = manifest_filename(si)
+    manifest = {}
+    if os.path.exists(ofn):
+        manifest = load_manifest(mfn)
+    nheader = get_raw_header_lines(si['process_module'])
+    (new_files, offsets, stats, finished) = select_raw(raw_files, manifest, nheader is not None)
+    manifest = dict([(fn, manifest[fn]) for fn in raw_files if fn in manifest])
+
+    if new_files:
+        (nfiles, nrecs) = process(pi, si, new_files, yyyy_mm, offsets, nheader,
+                                  finished=finished)
+        for fn in new_files:
+            # size as read, so bytes added during the read are read next time
+            manifest[fn] = (offsets[fn], stats[fn][1], offsets[fn])
+        if os.path.exists(ofn):
+            save_manifest(mfn, manifest)
+    else:
+        print ' ... ... NOTE: no new raw files found'
+
+    # update latest data for SECOORA commons
+    if 'latest_dir' in si.keys():
+        # print ' ... ... latest : %s ' % si['latest_dir']
+        proc2latest(pi, si, yyyy_mm)
+
+    if 'csv_dir' in si.keys():
+        proc2csv(pi, si, yyyy_mm)
+    return (nfiles, nrecs)
+
+def run_captured(result, quiet, func, *args):
+    """Call func(*args) -> (nfiles, nrecs) and record outcome in result
+
+    Any exception is caught (if package fails, try next) and its
+    traceback kept in result['error'].  If quiet, printed output is
+    captured in result['log'] instead of written to stdout.
+    """
+    import time
+    from StringIO import StringIO
+    stdout = sys.stdout
+    if quiet:
+        sys.stdout = StringIO()
+    t0 = time.time()
+    try:
+        try:
+            (result['nfiles'], result['nrecs']) = func(*args)
+            result['status'] = 'ok'
+        except:
+            result['status'] = 'error'
+            result['error'] = traceback.format_exc()
+            if not quiet:
+                traceback.print_exc()
+    finally:
+        if quiet:
+            result['log'] = sys.stdout.getvalue()
+            sys.stdout = stdout
+    result['wall_time'] = time.time() - t0
+    return result
+
+def new_result(**kwargs):
+    """ empty result for one unit of work """
+    result = {'nfiles' : 0,
+              'nrecs' : 0,
+              'wall_time' : 0.,
+              'status' : None,
+              'error' : None,
+              'log' : '',
+              'import_times' : {},
+              }
+    result.update(kwargs)
+    return result
+
+def auto_item(unit, yyyy_mm, quiet=False):
+    """Run auto_package() for one (config, package) and report result
+
+    :Returns:
+       result : dict
+           config, package, nfiles, nrecs, wall_time, status ('ok',
+           'error', 'timeout' or 'lost'), error, log and import_times
+    """
+    cn, package = unit
+    result = new_result(config=cn, package=package)
+    loaded = set(processor_import_times)
+    run_captured(result, quiet, auto_package, cn, package, yyyy_mm)
+    # processors this unit was first to import (in this process)
+    result['import_times'] = dict([(mod_name, secs) for (mod_name, secs) in
+                                   processor_import_times.items() if mod_name not in loaded])
+    return result
+
+def _auto_worker(unit, yyyy_mm, conn):
+    """ process target: auto_item() with result sent back on conn"""
+    conn.send(auto_item(unit, yyyy_mm, quiet=True))
+    conn.close()
+
+# seconds a unit past its timeout gets to exit after SIGTERM before SIGKILL
+TERMINATE_GRACE = 5.
+
+def run_units(units, yyyy_mm, workers, timeout=None):
+    """Run auto_item() for each unit with at most workers processes at once
+
+    Each (config, package) unit gets its own process and pipe so one
+    that stalls (e.g. a hung NFS read of raw_dir) can be terminated
+    after timeout seconds without holding up the others.  A process
+    that ignores SIGTERM and SIGKILL (uninterruptible read) is left
+    behind, not waited for.
+
+    :Returns:
+       results : list of dict
+           One result per unit in same order as units
+    """
+    import time
+    import signal
+    import multiprocessing
+    pending = list(units)
+    running = {}
+    done = {}
+
+    while pending or running:
+        while pending and len(running) < workers:
+            unit = pending.pop(0)
+            (conn, child_conn) = multiprocessing.Pipe(False)
+            p = multiprocessing.Process(target=_auto_worker, args=(unit, yyyy_mm, child_conn))
+            p.daemon = True
+            p.start()
+            child_conn.close()
+            running[unit] = (p, conn, time.time())
+        time.sleep(0.1)
+        now = time.time()
+        for unit, (p, conn, t0) in running.items():
+            # check liveness before polling so a result sent just before exit is not missed
+            alive = p.is_alive()
+            result = None
+            if conn.poll():
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    pass
+            if result is not None:
+                p.join()
+                done[unit] = result
+            elif not alive:
+                p.join()
+                done[unit] = new_result(config=unit[0], package=unit[1], status='lost',
+                                        error='process exited (code %s) with no result' % p.exitcode,
+                                        wall_time=now-t0)
+            elif timeout and now-t0 > timeout:
+                p.terminate()
+                p.join(TERMINATE_GRACE)
+                error = 'terminated after %g seconds' % timeout
+                if p.is_alive():
+                    os.kill(p.pid, signal.SIGKILL)
+                    p.join(TERMINATE_GRACE)
+                if p.is_alive():
+                    # stuck in kernel, so neither wait now nor at exit
+                    multiprocessing.current_process()._children.discard(p)
+                    error += ', still running (pid %d) after SIGKILL' % p.pid
+                done[unit] = new_result(config=unit[0], package=unit[1], status='timeout',
+                                        error=error, wall_time=now-t0)
+            else:
+                continue
+            conn.close()
+            del running[unit]
+
+    return [done[unit] for unit in units]
+
+def auto_summary(results):
+    """ print one line per auto result and the errors at the end"""
+    print '\nAuto summary:'
+    print ' %-30s %-10s %7s %9s %9s  %s' % \
+          ('config', 'package', 'files', 'records', 'seconds', 'status')
+    for r in results:
+        print ' %-30s %-10s %7d %9d %9.1f  %s' % \
+              (r['config'], r['package'], r['nfiles'], r['nrecs'],
+               r['wall_time'], r['status'])
+    bad = [r for r in results if r['status'] != 'ok']
+    for r in bad:
+        print '\n ... %s %s %s:' % (r['config'], r['package'], r['status'])
+        print r['error']
+    print ' ... %d of %d units not ok' % (len(bad), len(results))
+
+def spin_item(item, quiet=False):
+    """Run manual() for one (platform, package, yyyy_mm) and report result
+
+    :Parameters:
+       item : tuple
+           (platform, package, yyyy_mm) as listed by create_spin_list()
+
+    :Other Parameters:
+       quiet : boolean flag
+           If True, capture printed output in result['log'] instead of
+           writing it to stdout (used by spin workers)
+
+    :Returns:
+       result : dict
+           platform, package, yyyy_mm, nfiles (raw files parsed),
+           nrecs (records written), wall_time (seconds), status ('ok'
+           or 'error'), error (traceback text or None) and log
+           (captured output)
+    """
+    platform, package, yyyy_mm = item
+    result = new_result(platform=platform, package=package, yyyy_mm=yyyy_mm)
+    return run_captured(result, quiet, manual, platform, package, yyyy_mm)
+
+def _spin_worker(item):
+    """ pool target: spin_item() with output captured per item"""
+    return spin_item(item, quiet=True)
+
+def spin(spin_list, workers=1):
+    """ wrapper to run manual() for multiple months
+
+    Each (platform, package, yyyy_mm) in spin_list is processed by
+    exactly one worker, since manual() removes and rebuilds the
+    monthly netCDF (platform_package_yyyy_mm.nc) on its own.
+
+    :Parameters:
+       spin_list : list of three-tuple (platform, package, yyyy_mm)
+
+    :Other Parameters:
+       workers : int
+           Number of processes in pool.  If 1 (default) run serially
+           in this process with output printed as it goes.
+
+    :Returns:
+       results : list of dict
+           One result per unique spin_list item in same order (see spin_item())
+    """
+    # duplicates would have two workers writing the same monthly file
+    spin_list = uniqify([tuple(item) for item in spin_list])
+    if workers<=1 or len(spin_list)<=1:
+        results = []
+        for item in spin_list:
+            platform, package, yyyy_mm = item
+            print '\nProcessing in manual-mode ...'
+            print ' ...  platform id : %s' % platform
+            print ' ... package name : %s' % package
+            print ' ...        month : %s' % yyyy_mm
+            results.append(spin_item(item))
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes=min(workers, len(spin_list)))
+        try:
+            results = pool.map(_spin_worker, spin_list, chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        pool.join()
+    return results
+
+def spin_summary(results):
+    """ print one line per spin result and the errors at the end"""
+    print '\nSpin summary:'
+    print ' %-14s %-10s %-8s %7s %9s %9s  %s' % \
+          ('platform', 'package', 'month', 'files', 'records', 'seconds', 'status')
+    nerr = 0
+    for r in results:
+        if r['error']:
+            status = 'FAILED'
+            nerr += 1
+        else:
+            status = 'ok'
+        print ' %-14s %-10s %-8s %7d %9d %9.1f  %s' % \
+              (r['platform'], r['package'], r['yyyy_mm'], r['nfiles'],
+               r['nrecs'], r['wall_time'], status)
+    for r in results:
+        if r['error']:
+            print '\n ... %s %s %s failed:' % (r['platform'], r['package'], r['yyyy_mm'])
+            print r['error']
+    print ' ... %d of %d items failed' % (nerr, len(results))
 
 def manual(platform, package, yyyy_mm):
     """Process data for specified platform, sensor package, and month
@@ -580,6 +1299,10 @@ def manual(platform, package, yyyy_mm):
     2. for each config for specific platform
            if have package in config
                which raw files
+
+    :Returns:
+       (nfiles, nrecs) : tuple of int
+           Number of raw files parsed and records written (see process())
     """
     months = find_months(yyyy_mm)
     month_start_dt = months[1]
@@ -587,6 +1310,7 @@ def manual(platform, package, yyyy_mm):
    
     configs = find_configs(platform, yyyy_mm, config_dir=defconfigs)
 
+    nfiles = 0; nrecs = 0
     if configs:
         # for each configuration 
         for index in range(len(configs)):
@@ -616,14 +1340,14 @@ def manual(platform, package, yyyy_mm):
                 # this added just in case data repeated in data files
                 if os.path.exists(ofn):
                     # get last dt from current month file
-                    (es, units) = nc_get_time(ofn)
-                    last_dt = es2dt(es[-1])
+                    (es, units) = nc_get_last_time(ofn)
                     # if older than month_start_dt use it instead to only process newest data
-                    if last_dt>=month_start_dt:
-                        si['proc_start_dt'] = last_dt
+                    if es is not None and es2dt(es)>=month_start_dt:
+                        si['proc_start_dt'] = es2dt(es)
 
                 if raw_files:
-                    process(pi, si, raw_files, yyyy_mm)
+                    (n, m) = process(pi, si, raw_files, yyyy_mm)
+                    nfiles += n; nrecs += m
                 else:
                     print ' ... ... NOTE: no raw files found for %s %s for %s' % (package, platform, yyyy_mm)
                 
@@ -631,44 +1355,281 @@ def manual(platform, package, yyyy_mm):
                 print ' ... ... NOTE: %s not operational on %s for %s' % (package, platform, yyyy_mm)                
     else:
         print ' ... ... ... NOTE: %s not operational for %s' % (platform, yyyy_mm)
-    
+    return (nfiles, nrecs)
+
+
+def record_keys(data, fixed_vars=()):
+    """Keys of parsed data with one value (or row) per sample time
 
-def process(pi, si, raw_files, yyyy_mm):
+    Every array is a record variable except 'in' and those the
+    processor declares in fixed_vars (see get_fixed_vars()).
+    """
+    return sorted([k for k in data.keys() if k != 'in' and \
+                   k not in fixed_vars and \
+                   type(data[k]) == numpy.ndarray and data[k].ndim > 0])
+
+def same_layout(a, b, fixed_vars=()):
+    """Whether records of parsed data a and b can be concatenated
+
+    Both need the same keys, the same record variables with the same
+    shape per record, and equal values for everything else (e.g. bin
+    depths).
+    """
+    if sorted(a.keys()) != sorted(b.keys()):
+        return False
+    keys = record_keys(a, fixed_vars)
+    if keys != record_keys(b, fixed_vars):
+        return False
+    for k in keys:
+        if a[k].shape[1:] != b[k].shape[1:]:
+            return False
+    for k in a.keys():
+        if k in keys or k == 'in':
+            continue
+        try:
+            if type(a[k]) == numpy.ndarray or type(b[k]) == numpy.ndarray:
+                if not numpy.array_equal(a[k], b[k]):
+                    return False
+            elif a[k] != b[k]:
+                return False
+        except (ValueError, TypeError):
+            return False
+    return True
+
+def merge_records(batch, last_es=None, written=None, fixed_vars=()):
+    """Concatenate records of parsed data, sorted by time
+
+    Only the first record of each time is kept.  Records not later
+    than last_es (last time in netCDF before this run) or with a time
+    in written (already appended this run) are dropped.
+
+    :Parameters:
+       batch : list of dict
+           Parsed data of same layout (see same_layout()) with only
+           records to be written
+
+    :Other Parameters:
+       fixed_vars : tuple of str
+           Keys that are not record variables (see record_keys())
+
+    :Returns:
+       data : dict
+           All records with data['in'] set True for each
+    """
+    data = dict(batch[0])
+    keys = record_keys(data, fixed_vars)
+    if len(batch) > 1:
+        for k in keys:
+            data[k] = numpy.concatenate([d[k] for d in batch])
+    es = data['time']
+    order = numpy.argsort(es, kind='mergesort')
+    keep = numpy.ones((len(es),), dtype=bool)
+    keep[1:] = es[order][1:] != es[order][:-1]
+    if last_es is not None:
+        keep &= es[order] > last_es
+    if written is not None and len(written):
+        keep &= ~numpy.in1d(es[order], written)
+    idx = order[keep]
+    for k in keys:
+        data[k] = data[k][idx]
+    data['in'] = numpy.ones((len(idx),), dtype=bool)
+    return data
+
+def write_records(ofn, pi, si, data, create, update):
+    """Create or append monthly netCDF with records in data
+
+    New file is netCDF-4 if sensor config has 'nc_storage' (chunking
+    and compression, see nc4compat), otherwise netCDF-3.  Variables
+    of update that an existing file does not have (e.g. added to the
+    processor after the file was created) are left out.
+    """
+    if os.path.exists(ofn):
+        (global_atts, var_atts, var_data) = update(pi,si,data)
+        names = nc_var_names(ofn)
+        missing = [name for (name, values) in var_data if name not in names]
+        if missing:
+            print ' ... not in %s, not appended: %s' % (os.path.basename(ofn), ', '.join(missing))
+            var_data = [(name, values) for (name, values) in var_data if name in names]
+        nc_update(ofn, (global_atts, var_atts, var_data))
+    else:
+        ct = create(pi,si,data)
+        nc_create(ofn, ct, si.get('nc_storage'))
+
+# bytes of parsed records held by process() before appending to netCDF
+BATCH_MEMORY_BUDGET = 256*1024*1024
+# bytes of raw lines parsed at a time by processors that define
+# raw_header_lines (see process())
+RAW_CHUNK_BYTES = 32*1024*1024
+
+def process(pi, si, raw_files, yyyy_mm, offsets=None, nheader=None, budget=None,
+            chunk_bytes=None, finished=None):
+    """Parse raw files and create or append monthly netCDF
+
+    Records in the month from all raw files are gathered and written
+    with one create or update of the netCDF, sorted by time and
+    without repeated times.  If they use more than budget bytes, or a
+    raw file parses to a different layout (e.g. other number of
+    bins), what is gathered so far is written first.
+
+    Raw files of processors that define raw_header_lines (e.g. CR1000
+    tables) are streamed (see RawReader) and parsed chunk_bytes of
+    lines at a time, each chunk with the header in front, so memory
+    per file is capped however large the file.  Other raw files are
+    read whole (see load_data()).  Processors with a batch_parser (e.g.
+    one spectrum per file) are given a list of raw files at a time,
+    about chunk_bytes of them, instead of lines of one file.
+
+    :Other Parameters:
+       offsets : dict
+           {filename : byte offset} to start reading each raw file
+           (see select_raw()), updated to offset of last complete
+           line read.  If None, each file is read whole, last line
+           included even if it has no newline.
+       nheader : int
+           Header lines to put in front of lines read from an offset
+           (default raw_header_lines of processor module)
+       budget : int
+           Memory budget in bytes (default BATCH_MEMORY_BUDGET)
+       chunk_bytes : int
+           Bytes of raw lines per parse (default RAW_CHUNK_BYTES)
+       finished : list
+           Raw files read from an offset that are no longer written,
+           so their last line is read even without a newline
+
+    :Returns:
+       (nfiles, nrecs) : tuple of int
+           Number of raw files parsed and records written
+    """
+    if budget is None:
+        budget = BATCH_MEMORY_BUDGET
+    if chunk_bytes is None:
+        chunk_bytes = RAW_CHUNK_BYTES
+    if nheader is None:
+        nheader = get_raw_header_lines(si['process_module'])
+    use_mmap = get_raw_mmap(si['process_module'])
+    batch_parse = get_batch_parser(si['process_module'])
+    fixed = get_fixed_vars(si['process_module'])
     # tailored data processing for different input file formats and control over output
     (parse, create, update) = import_processors(si['process_module'])
-    for fn in raw_files:
-        # sys.stdout.write('... %s ... ' % fn)
-        # attach file name to sensor info so parser can use it, if needed
-        si['fn'] = fn
-        lines = load_data(fn)
-        if lines:
-            data = parse(pi, si, lines)
-            # determine which index of data is within the specified timeframe (usually the month)
-            n = len(data['dt'])
-            data['in'] = numpy.array([False for i in range(n)])
-
-            for index, val in enumerate(data['dt']):
-                if val>=pi['config_start_dt'] and \
-                       val>=si['proc_start_dt'] and \
-                       val<=si['proc_end_dt'] and \
-                       val<=pi['config_end_dt']:
-                    data['in'][index] = True
-                    
-            # if any records are in the month then write to netcdf
-            if data['in'].any():
-                sys.stdout.write(' ... %s ... ' % fn)
-                sys.stdout.write('%d\n' % len(data['in'].nonzero()[0]))
-                ofn = os.path.join(si['proc_dir'], si['proc_filename'])
-                # update or create netcdf 
-                if os.path.exists(ofn):
-                    ut = update(pi,si,data)
-                    nc_update(ofn, ut)
-                else:
-                    ct = create(pi,si,data)
-                    nc_create(ofn, ct)
+    ofn = os.path.join(si['proc_dir'], si['proc_filename'])
+    last_es = None
+    if os.path.exists(ofn):
+        (last_es, units) = nc_get_last_time(ofn)
+    batch = []; nbytes = 0; written = []
+
+    def flush(batch):
+        # write gathered records, return number written
+        data = merge_records(batch, last_es, numpy.concatenate(written or [[]]),
+                             fixed)
+        n = len(data['time'])
+        if n:
+            write_records(ofn, pi, si, data, create, update)
+            written.append(data['time'])
+        return n
+
+    nfiles = [0]
+    def parts():
+        # (name, data) of each parse of raw files
+        if batch_parse is not None:
+            # several raw files in one parse, about chunk_bytes at a time
+            group = []; size = 0
+            for fn in list(raw_files) + [None]:
+                if fn is not None and not os.path.exists(fn):
+                    print 'File does not exist: '+ fn
+                    continue
+                if group and (fn is None or size >= chunk_bytes):
+                    nfiles[0] += len(group)
+                    name = group[0] + (len(group)>1 and ' ... %d files' % len(group) or '')
+                    si['fn'] = group[0]
+                    yield (name, batch_parse(pi, si, group))
+                    group = []; size = 0
+                if fn is not None:
+                    group.append(fn)
+                    size += os.path.getsize(fn)
+                    if offsets is not None:
+                        offsets[fn] = os.path.getsize(fn)
+            return
+        for fn in raw_files:
+            # sys.stdout.write('... %s ... ' % fn)
+            # attach file name to sensor info so parser can use it, if needed
+            si['fn'] = fn
+            reader = None; rawmap = None; offset = 0
+            if nheader is None and use_mmap:
+                # processor takes whole file at once, mapped not read
+                rawmap = lines = load_mmap(fn)
+                if offsets is not None:
+                    offsets[fn] = rawmap and rawmap.end or 0
+                chunks = [lines or []]
+            elif nheader is None:
+                # processor needs whole file at once
+                lines = load_data(fn)
+                if offsets is not None:
+                    offsets[fn] = sum([len(line) for line in lines or []])
+                chunks = [lines or []]
+            elif os.path.exists(fn):
+                if offsets is not None:
+                    offset = offsets[fn]
+                # only hold back a line still being written when tailing
+                tail = offsets is not None and fn not in (finished or [])
+                reader = RawReader(fn, offset, nheader, tail=tail)
+                chunks = reader.chunks(chunk_bytes)
+            else:
+                print 'File does not exist: '+ fn
+                continue
+
+            parsed = False
+            for lines in chunks:
+                if not lines:
+                    continue
+                parsed = True
+                yield (fn, parse(pi, si, lines))
+
+            if reader and offsets is not None:
+                offsets[fn] = reader.end
+            if rawmap is not None:
+                rawmap.close()
+            if parsed:
+                nfiles[0] += 1
+            elif not offset:
+                # if no lines, file was empty
+                print " ... skipping file %s" % (fn,)
+
+    nrecs = 0
+    for (fn, data) in parts():
+        # determine which index of data is within the specified timeframe (usually the month)
+        start_dts = (pi['config_start_dt'], si['proc_start_dt'])
+        end_dts = (si['proc_end_dt'], pi['config_end_dt'])
+        if 'time' in data:
+            data['in'] = es_mask(data['time'], start_dts, end_dts)
         else:
-            # if no lines, file was empty
-            print " ... skipping file %s" % (fn,)
+            dt = numpy.asarray(data['dt'], dtype=object)
+            data['in'] = (dt>=max(start_dts)) & (dt<=min(end_dts))
+
+        # if any records are in the month then write to netcdf
+        if data['in'].any():
+            sys.stdout.write(' ... %s ... ' % fn)
+            sys.stdout.write('%d\n' % len(data['in'].nonzero()[0]))
+            if 'time' not in data:
+                # no epoch seconds to sort by, so write as parsed
+                nrecs += len(data['in'].nonzero()[0])
+                write_records(ofn, pi, si, data, create, update)
+                continue
+            # keep only records in the month
+            keys = record_keys(data, fixed)
+            i = data['in']
+            for k in keys:
+                data[k] = data[k][i]
+            data['in'] = data['in'][i]
+            if batch and (not same_layout(batch[0], data, fixed) or \
+                          nbytes >= budget):
+                nrecs += flush(batch)
+                batch = []; nbytes = 0
+            batch.append(data)
+            nbytes += sum([data[k].nbytes for k in keys])
+
+    if batch:
+        nrecs += flush(batch)
+    return (nfiles[0], nrecs)
 
     
 # globals
@@ -676,8 +1637,21 @@ start_dt = datetime.utcnow()
 start_dt.replace(microsecond=0)
 
 if __name__ == "__main__":
+    # processors do "from raw2proc import *", so let them find this
+    # module instead of loading raw2proc.py a second time
+    sys.modules.setdefault('raw2proc', sys.modules['__main__'])
     import optparse
-    raw2proc('auto')
+    parser = optparse.OptionParser(usage='%prog [options]',
+                                   description='Process latest data of all active configs (auto-mode)')
+    parser.add_option('-w', '--workers', type='int', default=1,
+                      help='(config, package) units run at once, each in its own process (default 1, serial)')
+    parser.add_option('-t', '--timeout', type='float', default=None,
+                      help='seconds a unit may run before it is terminated (default no limit)')
+    parser.add_option('--import-report', action='store_true', default=False,
+                      help='print import time of each processor module at the end')
+    (opts, args) = parser.parse_args()
+    raw2proc('auto', workers=opts.workers, timeout=opts.timeout,
+             import_report=opts.import_report)
 
     # for testing 
     # proctype='manual'; platform='bogue'; package='adcp'; yyyy_mm='2007_07'
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""bench_filt_datetime
+
+Time procutil.filt_datetime() over a synthetic corpus of 100k raw
+filenames, against the original per-call compile of all nine patterns.
+
+   cold : precompiled patterns, first (most precise) match, empty memo
+   warm : same names again, answered from the memo
+
+Results of all three must agree.
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import re
+import time
+import random
+from os.path import splitext
+from datetime import datetime, timedelta
+
+import procutil
+from procutil import filt_datetime, FILT_DATETIME_CASES
+
+def filt_datetime_ref(input_string, gran=False, remove_ext=True):
+    """filt_datetime() as before patterns were precompiled and memoized"""
+    if remove_ext:
+        (s, e) = splitext(input_string)
+        input_string = s
+    patterns = [re.compile(c, re.VERBOSE) for c in FILT_DATETIME_CASES]
+    matches = [p.search(input_string) for p in patterns]
+    for ind in range(len(matches)):
+        if bool(matches[ind]):
+            values = [int(yi) for yi in matches[ind].groups()]
+            if values[0] < 50:
+                values[0] += 2000
+            elif values[0]>=50 and values[0]<100:
+                values[0] += 1900
+            if len(values)==2:
+                values.extend([1])
+            try:
+                dt = datetime(*values)
+            except ValueError, e:
+                dt = None
+            else:
+                z = dt - datetime.utcnow()
+                if abs(z.days) > 3600:
+                    dt = None
+        else:
+            dt = None
+        matches[ind] = dt
+    b = [bool(x) for x in matches]
+    try:
+        ind = b.index(True)
+    except ValueError, e:
+        return None
+    if gran:
+        return matches[ind], ind
+    return matches[ind]
+
+def make_corpus(n=100000, seed=0):
+    """ filenames in the styles found in level0 (adcp bursts, loggernet, dspec)"""
+    random.seed(seed)
+    t0 = datetime.utcnow() - timedelta(days=3*365)
+    templates = ('adcp_%Y_%m_%d_%H%M.dat',
+                 'DSpec%Y%m%d%H%M.txt',
+                 'CR1000_B1_Met_%Y_%m.dat',
+                 'ysi_%y%m%d%H%M%S.txt',
+                 'b1_gps_%Y%m%d.dat')
+    names = []
+    for i in range(n):
+        dt = t0 + timedelta(minutes=10*i)
+        names.append(dt.strftime(random.choice(templates)))
+    return names
+
+def bench(func, names, **kwargs):
+    t = time.time()
+    result = [func(fn, **kwargs) for fn in names]
+    return (time.time()-t, result)
+
+if __name__ == "__main__":
+    names = make_corpus()
+    print 'corpus: %d filenames' % len(names)
+
+    (t_ref, r_ref) = bench(filt_datetime_ref, names, gran=True)
+    # memo large enough to hold the whole corpus
+    procutil.FILT_DATETIME_CACHE_SIZE = len(names)
+    procutil.filt_datetime_cache.clear()
+    (t_cold, r_cold) = bench(filt_datetime, names, gran=True)
+    (t_warm, r_warm) = bench(filt_datetime, names, gran=True)
+
+    print '  original : %8.3f s' % t_ref
+    print '      cold : %8.3f s  (%5.1fx)' % (t_cold, t_ref/t_cold)
+    print '      warm : %8.3f s  (%5.1fx)' % (t_warm, t_ref/t_warm)
+    print '     match : %s' % (r_ref == r_cold == r_warm)
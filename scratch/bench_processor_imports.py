@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""bench_processor_imports
+
+Report import time of every processor module (proc_*.py), each in a
+fresh python after raw2proc is imported, slowest first.  Shared
+dependencies of raw2proc (numpy, pycdf, procutil, ncutil) are timed
+separately as the baseline.  Processors that fail to import name the
+missing dependency.
+
+Usage:
+
+   python bench_processor_imports.py [raw2proc_dir]
+
+"""
+
+import sys
+import os
+import glob
+import subprocess
+
+CHILD = """
+import sys, time
+t0 = time.time()
+import raw2proc
+t1 = time.time()
+try:
+    raw2proc.load_processor(%(mod_name)r)
+    print '%%.4f %%.4f ok' %% (t1-t0, raw2proc.processor_import_times[%(mod_name)r])
+except ImportError, e:
+    print '%%.4f nan %%s' %% (t1-t0, str(e).replace(' ', '_'))
+"""
+
+def time_import(mod_name, src_dir):
+    p = subprocess.Popen([sys.executable, '-c', CHILD % {'mod_name' : mod_name}],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         cwd=src_dir)
+    (out, err) = p.communicate()
+    try:
+        (base, secs, status) = out.strip().split('\n')[-1].split(' ', 2)
+        return (float(base), float(secs), status.replace('_', ' '))
+    except ValueError:
+        return (float('nan'), float('nan'), err.strip().split('\n')[-1])
+
+if __name__ == "__main__":
+    src_dir = os.path.abspath(sys.argv[1:] and sys.argv[1] or
+                              os.path.join(os.path.dirname(__file__), '..'))
+    mod_names = sorted([os.path.splitext(os.path.basename(fn))[0]
+                        for fn in glob.glob(os.path.join(src_dir, 'proc_*.py'))])
+    results = []
+    bases = []
+    for mod_name in mod_names:
+        (base, secs, status) = time_import(mod_name, src_dir)
+        bases.append(base)
+        results.append((secs, mod_name, status))
+    # failed imports (nan) last
+    results.sort(key=lambda r: (r[0] != r[0], -r[0]))
+
+    bases.sort()
+    print 'import raw2proc (median) : %8.3f s' % bases[len(bases)//2]
+    for (secs, mod_name, status) in results:
+        if status == 'ok':
+            print '%-40s %8.3f s' % (mod_name, secs)
+        else:
+            print '%-40s %8s   %s' % (mod_name, '-', status)
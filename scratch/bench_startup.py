@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""bench_startup
+
+Time a cron start of raw2proc auto mode, from launching python to the
+first raw file lookup (find_raw) or, with --parse, the first raw file
+read (load_data, load_mmap or RawReader.chunks).
+
+   cold : no saved config index, every config is imported
+   warm : config index saved by the cold run, only configs of active
+          packages are imported by their own units
+
+Usage:
+
+   python bench_startup.py [config_dir] [--parse] [--runs N]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+CHILD = """
+import os, sys, time
+t0 = float(sys.argv[1])
+sys.path.insert(0, %(config_dir)r)
+import raw2proc
+raw2proc.defconfigs = %(config_dir)r
+raw2proc.config_index_dir = %(index_dir)r
+def first(*args, **kwargs):
+    sys.__stdout__.write('%%.3f\\n' %% (time.time()-t0))
+    sys.__stdout__.flush()
+    os._exit(0)
+for name in %(hooks)r:
+    # e.g. 'RawReader.chunks' is replaced on the class
+    path = name.split('.')
+    obj = raw2proc
+    for attr in path[:-1]:
+        obj = getattr(obj, attr)
+    setattr(obj, path[-1], first)
+raw2proc.raw2proc('auto')
+sys.__stdout__.write('nan\\n')
+"""
+
+def run_once(config_dir, index_dir, hooks):
+    code = CHILD % {'config_dir' : config_dir, 'index_dir' : index_dir,
+                    'hooks' : hooks}
+    t0 = time.time()
+    p = subprocess.Popen([sys.executable, '-c', code, repr(t0)],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         cwd=os.path.dirname(os.path.abspath(__file__))+'/..')
+    (out, err) = p.communicate()
+    lines = out.strip().split('\n')
+    try:
+        return float(lines[-1])
+    except ValueError:
+        print err
+        return float('nan')
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    hooks = ('find_raw',)
+    if '--parse' in args:
+        args.remove('--parse')
+        hooks = ('load_data', 'load_mmap', 'RawReader.chunks')
+    runs = 5
+    if '--runs' in args:
+        i = args.index('--runs')
+        runs = int(args[i+1])
+        del args[i:i+2]
+    config_dir = os.path.abspath(args and args[0] or
+                                 os.path.join(os.path.dirname(__file__), '..'))
+
+    print 'config dir : %s' % config_dir
+    print '     until : first call of %s' % ' or '.join(hooks)
+    cold = []; warm = []
+    for i in range(runs):
+        index_dir = tempfile.mkdtemp()
+        cold.append(run_once(config_dir, index_dir, hooks))
+        warm.append(run_once(config_dir, index_dir, hooks))
+        shutil.rmtree(index_dir)
+
+    print '      cold : %8.3f s  (median of %d)' % (median(cold), runs)
+    print '      warm : %8.3f s  (%5.1fx)' % (median(warm), median(cold)/median(warm))
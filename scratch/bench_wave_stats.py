@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""bench_wave_stats
+
+Time waveutil.wave_stats() on a month of hourly synthetic RDI Dspec
+spectra (128 freq x 90 dir) against the per-burst statistics the RDI
+Dspec and Nortek wds parsers computed before, and check that every
+parameter agrees.
+
+Usage:
+
+   python bench_wave_stats.py [nbursts]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import time
+import numpy
+
+from waveutil import wave_stats, FSWELL, FUPPER
+
+def first(f, imax):
+    """f[imax] of boolean imax shorter than f (missing entries False)"""
+    return f[numpy.flatnonzero(imax)]
+
+def wave_stats_burst(f, D, Sxx, Df, Dtheta, fswell=FSWELL, fupper=FUPPER):
+    """Statistics of one burst Sxx(freq, dir) as computed per burst before"""
+    iswell = f<=fswell
+    iwind = (f>fswell) * (f<=fupper)
+    iall = f<=fupper
+    Sf = Sxx.sum(axis=1)*Dtheta
+    Stheta = Sxx[iall].sum(axis=0)*Df
+    Stheta_s = Sxx[iswell].sum(axis=0)*Df
+    Stheta_w = Sxx[iwind].sum(axis=0)*Df
+    m0 = Sf[iall].sum()*Df
+    m1 = (f[iall]*Sf[iall]).sum()*Df
+    m0s = Sf[iswell].sum()*Df
+    m1s = (f[iswell]*Sf[iswell]).sum()*Df
+    m0w = Sf[iwind].sum()*Df
+    m1w = (f[iwind]*Sf[iwind]).sum()*Df
+    Tp = 1/(first(f, Sf[iall]==Sf[iall].max())[0])
+    Tps = 1/(first(f, Sf[iswell]==Sf[iswell].max())[0])
+    nswell = len(f[iswell])
+    false_swell = numpy.array([False for i in range(nswell)])
+    imax = numpy.concatenate((false_swell, Sf[iwind]==Sf[iwind].max()))
+    Tpw = 1/(first(f, imax)[0])
+    ac1 = numpy.cos(D*numpy.pi/180)
+    as1 = numpy.sin(D*numpy.pi/180)
+    Dms = []
+    for St in (Stheta, Stheta_s, Stheta_w):
+        Dm = numpy.arctan2((as1*St*Dtheta).sum(), (ac1*St*Dtheta).sum())*180/numpy.pi
+        if Dm<0: Dm = Dm+360.
+        Dms.append(Dm)
+    Dps = []
+    for imax in (Sf[iall]==Sf[iall].max(),
+                 Sf[iswell]==Sf[iswell].max(),
+                 numpy.concatenate((false_swell, Sf[iwind]==Sf[iwind].max()))):
+        rows = Sxx[numpy.flatnonzero(imax),:]
+        idir = numpy.squeeze(rows==rows.max())
+        if len(idir.shape)==2: idir = idir[0]
+        Dps.append(D[idir][0])
+    return {'Sf' : Sf, 'Stheta' : Stheta, 'Stheta_swell' : Stheta_s,
+            'Stheta_wind' : Stheta_w,
+            'Hs' : 4*numpy.sqrt(m0), 'Hs_swell' : 4*numpy.sqrt(m0s),
+            'Hs_wind' : 4*numpy.sqrt(m0w),
+            'Tm' : m0/m1, 'Tm_swell' : m0s/m1s, 'Tm_wind' : m0w/m1w,
+            'Tp' : Tp, 'Tp_swell' : Tps, 'Tp_wind' : Tpw,
+            'Dm' : Dms[0], 'Dm_swell' : Dms[1], 'Dm_wind' : Dms[2],
+            'Dp' : Dps[0], 'Dp_swell' : Dps[1], 'Dp_wind' : Dps[2]}
+
+if __name__ == "__main__":
+    nbursts = len(sys.argv)>1 and int(sys.argv[1]) or 24*31
+    nfreq = 128; ndir = 90
+    Df = 1./nfreq; f = numpy.arange(1, nfreq+1)*Df
+    Dtheta = 360./ndir; D = numpy.arange(ndir)*Dtheta
+    rs = numpy.random.RandomState(0)
+    Sxx = rs.rand(nbursts, nfreq, ndir)/360.
+
+    t0 = time.time()
+    ref = [wave_stats_burst(f, D, Sxx[j], Df, Dtheta) for j in range(nbursts)]
+    t_ref = time.time()-t0
+    t0 = time.time()
+    stats = wave_stats(f, D, Sxx, Df, Dtheta)
+    t_new = time.time()-t0
+
+    ok = True
+    for k in sorted(stats.keys()):
+        expect = numpy.array([r[k] for r in ref])
+        same = numpy.allclose(stats[k], expect, rtol=1e-12)
+        ok = ok and same
+        if not same:
+            print ' ... %s differs' % k
+    print '   bursts : %d (%d freq x %d dir)' % (nbursts, nfreq, ndir)
+    print 'per burst : %8.3f s' % t_ref
+    print '  batched : %8.3f s  (%5.1fx)' % (t_new, t_ref/t_new)
+    print '   agrees : %s' % ok
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""check_avp_bins
+
+Grid synthetic AVP casts (see check_avp_casts.py) and check that
+
+   1. the <var>_mean, <var>_n and <var>_std of the v1 and v2 CDL2
+      parsers (procutil.bin_profiles()) match a loop over every cast and
+      depth bin
+   2. every sample in the water column is counted in a bin
+   3. v2_CDL1 bin averages match the parser it replaced, also when a
+      sample has a date that cannot be read (it is still binned)
+   4. how long it takes to grid a month of casts
+
+Usage:
+
+   python check_avp_bins.py [ncasts] [nsamples]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import time
+import numpy
+
+from old_parsers import REPO, old_module
+sys.path.insert(0, REPO)
+from procutil import depth_bins, bin_profiles
+import proc_avp_ysi_6600_v1_CDL2
+import proc_avp_ysi_6600_v2_CDL1
+import proc_avp_ysi_6600_v2_CDL2
+from check_avp_casts import FIXES, make_casts, compare
+
+def loop_bins(z, x, edges):
+    """ mean, count and std of x in each (cast, bin), one at a time"""
+    (ncast, nbins) = (len(z), len(edges)-1)
+    mean = numpy.ones((ncast, nbins))*numpy.nan
+    n = numpy.zeros((ncast, nbins), dtype=int)
+    std = numpy.ones((ncast, nbins))*numpy.nan
+    for c in range(ncast):
+        for k in range(nbins):
+            # edges go down from the surface, edges[k] is in bin k
+            with numpy.errstate(invalid='ignore'):
+                sel = (z[c] <= edges[k]) & (z[c] > edges[k+1]) & ~numpy.isnan(x[c])
+            n[c,k] = sel.sum()
+            if n[c,k]:
+                mean[c,k] = x[c][sel].mean()
+                std[c,k] = x[c][sel].std()
+    return (mean, n, std)
+
+if __name__ == "__main__":
+    ncasts = len(sys.argv)>1 and int(sys.argv[1]) or 40
+    nsamples = len(sys.argv)>2 and int(sys.argv[2]) or 90
+    pi = {'mean_water_depth' : -4.0, 'water_depth' : 4.0}
+    si = {'fn' : 'avp_2008_08_06.dat', 'nbins' : 150, 'bin_size' : 0.1,
+          'utc_offset' : 5}
+    edges = depth_bins(si, pi['mean_water_depth'])
+    ok = True
+
+    for (mod, v1) in ((proc_avp_ysi_6600_v2_CDL2, False),
+                      (proc_avp_ysi_6600_v1_CDL2, True)):
+        data = mod.parser(pi, si, make_casts(ncasts, nsamples, v1=v1))
+        bad = []
+        for name in mod.GRID_VARS:
+            (mean, n, std) = loop_bins(data['z'], data[name], edges)
+            if not (numpy.allclose(data[name+'_mean'], mean, equal_nan=True) and
+                    numpy.array_equal(data[name+'_n'], n) and
+                    numpy.allclose(data[name+'_std'], std, equal_nan=True)):
+                bad.append(name)
+        with numpy.errstate(invalid='ignore'):
+            inside = (data['z'] > edges[-1]) & ~numpy.isnan(data['wtemp'])
+        if data['wtemp_n'].sum() != inside.sum():
+            bad.append('%d of %d samples binned' % (data['wtemp_n'].sum(), inside.sum()))
+        ok &= not bad
+        print '%-34s %s' % (mod.__name__, bad and 'DIFF %s' % (bad,) or 'ok')
+
+    # v2_CDL1 with the month of one sample made 99
+    mod = proc_avp_ysi_6600_v2_CDL1
+    old_mod = old_module(mod.__name__, fixes=FIXES[mod.__name__])
+    lines = make_casts(ncasts, nsamples, cdl1=True)
+    k = [i for (i, line) in enumerate(lines) if line[:3] == '08/'][nsamples]
+    lines[k] = '99' + lines[k][2:]
+    si1 = dict(si, nbins=8, bin_size=0.5)
+    bad = compare(mod.parser(pi, si1, list(lines)), old_mod.parser(pi, si1, list(lines)))
+    ok &= not bad
+    print '%-34s %s' % (mod.__name__+' bad date', bad and 'DIFF %s' % (bad,) or 'ok')
+
+    z = -4*numpy.random.rand(48*31, 150)
+    x = numpy.random.rand(48*31, 150)
+    t0 = time.time()
+    bin_profiles(z, {'wtemp' : x}, edges)
+    print 'gridding %d casts of %d samples took %.3f s' % (z.shape + (time.time()-t0,))
+    print ok and 'all ok' or 'FAILED'
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""check_avp_casts
+
+Make a file of synthetic AVP YSI 6600 casts (blank lines between some
+casts and not others, a ^Z line, a line with a bad number, casts of
+different lengths, with and without "Profile Depth:") and check that
+the proc_avp_ysi_6600_* parsers (procutil.avp_casts()) return the
+same as the parsers they replaced (see old_parsers.py), apart from
+
+   1. no 'dt' object array
+   2. moving_point has no NaN rows left at the end for skipped lines
+
+Usage:
+
+   python check_avp_casts.py [ncasts] [nsamples]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import time
+import random
+import numpy
+
+from old_parsers import REPO, old_module
+# not the older copy of proc_avp_ysi_6600_v2_moving_point kept in scratch
+sys.path.insert(0, REPO)
+import proc_avp_ysi_6600_v1_CDL2
+import proc_avp_ysi_6600_v2_CDL1
+import proc_avp_ysi_6600_v2_CDL2
+import proc_avp_ysi_6600_v2_moving_point
+
+# first commit indexed the datetime filt_datetime() returns
+FIXES = {
+    'proc_avp_ysi_6600_v2_CDL1' : (('filt_datetime(fn)[0]', 'filt_datetime(fn)'),),
+    }
+
+def make_casts(ncasts, nsamples, v1=False, cdl1=False, seed=0):
+    """ lines of an AVP file with ncasts casts of about nsamples each"""
+    r = random.Random(seed)
+    lines = cdl1 and [' \r\n'] or ['AVP header\r\n', ' \r\n']
+    t0 = 1218000000
+    for c in range(ncasts):
+        t = t0 + c*1800
+        tm = time.gmtime(t)
+        if (c % 3 or cdl1) and c != 0:
+            lines.append(' \r\n')
+        lines.append('Profile Time: %02d:%02d:%02d\r\n' % tm[3:6])
+        lines.append('Profile Date: %02d/%02d/%04d\r\n' % (tm[1], tm[2], tm[0]))
+        if not v1 or c % 2:
+            lines.append('Profile Depth: %.1f cm\r\n' % (250 + r.random()*20))
+        lines.append('Voltage: %.2f\r\n' % (12 + r.random()))
+        lines.append('Profile Location: Stones Bay Serial No: 00016B79, ID: AVP1_SERDP\r\n')
+        for s in range(nsamples + r.randint(-5, 5)):
+            ts = time.gmtime(t + 6 + s)
+            stamp = '%02d/%02d/%02d %02d:%02d:%02d' % \
+                    (ts[1], ts[2], ts[0] % 100, ts[3], ts[4], ts[5])
+            depth = 0.1 + s*0.045 + r.random()*0.01
+            if v1:
+                lines.append('%s %5.2f %6.3f %6.2f %6.2f %7.3f %7.1f %5.1f\r\n' % \
+                             (stamp, 26+r.random(), 41+r.random(), 26.8, 6.6,
+                              depth, 3.4, 4.5+r.random()))
+            else:
+                lines.append('%s %5.2f %6.2f %6.2f %7.3f %5.2f %7.1f %5.1f %5.2f\r\n' % \
+                             (stamp, 26+r.random(), 41+r.random(), 26.8, depth,
+                              8.0, 3.4, 4.5+r.random(), 6.6))
+            if s == 3 and c == 1 and not cdl1:
+                lines.append('\x1a\x1a\r\n')
+            if s == 4 and c == 2:
+                lines.append(stamp + ' 26.1 41.0 ## 0.3 8.0\r\n')
+    return lines
+
+def compare(new, old):
+    """ names of variables that differ"""
+    bad = []
+    for name in sorted(old):
+        if name == 'dt':
+            if name in new:
+                bad.append(name + ' (still returned)')
+            continue
+        a = numpy.asarray(new[name], dtype=float)
+        b = numpy.asarray(old[name], dtype=float)
+        if a.shape != b.shape or not numpy.allclose(a, b, equal_nan=True):
+            bad.append(name)
+    return bad
+
+if __name__ == "__main__":
+    ncasts = len(sys.argv)>1 and int(sys.argv[1]) or 30
+    nsamples = len(sys.argv)>2 and int(sys.argv[2]) or 50
+    pi = {'mean_water_depth' : -4.0, 'water_depth' : 4.0}
+    ok = True
+    for (mod, kw, nbins) in ((proc_avp_ysi_6600_v2_CDL2, {}, 60),
+                             (proc_avp_ysi_6600_v1_CDL2, {'v1' : True}, 60),
+                             (proc_avp_ysi_6600_v2_CDL1, {'cdl1' : True}, 8),
+                             (proc_avp_ysi_6600_v2_moving_point, {}, 60)):
+        old_mod = old_module(mod.__name__, fixes=FIXES.get(mod.__name__, ()))
+        lines = make_casts(ncasts, nsamples, **kw)
+        for utc_offset in (0, 5):
+            si = {'fn' : 'avp_2008_08_06.dat', 'nbins' : nbins,
+                  'bin_size' : 0.5, 'utc_offset' : utc_offset}
+            new = mod.parser(pi, si, list(lines))
+            old = old_mod.parser(pi, si, list(lines))
+            if mod is proc_avp_ysi_6600_v2_moving_point:
+                n = len(new['time'])
+                old = dict([(k, v[:n]) for (k, v) in old.items()])
+            bad = compare(new, old)
+            ok &= not bad
+            print '%-34s utc_offset %d %s' % (mod.__name__, utc_offset,
+                                              bad and 'DIFF %s' % (bad,) or 'ok')
+    print ok and 'all ok' or 'FAILED'
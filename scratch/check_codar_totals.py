@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""check_codar_totals
+
+Write a month of synthetic CODAR LLUV TOT4 files (most hours on the
+same totals points, every 7th hour with some points dropped) and a few
+odd ones (a second table after %TableEnd, a %TimeStamp that is not a
+date, a table with no rows, an empty file) and check that
+proc_codar_totals.batch_parser() (hours with the same points stacked
+in one griddata() call) gives
+
+   1. for each hour, the same u and v as interpolating that hour
+      alone, reading its table with numpy.loadtxt and a fresh
+      procutil.griddata() triangulation
+   2. the same as proc_codar_totals.parser() of each file
+   3. no record for the file with a bad stamp or the empty file, NaN
+      for the table with no rows
+
+and how long each takes.
+
+Usage:
+
+   python check_codar_totals.py [ndays]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import os
+import time
+import shutil
+import tempfile
+import numpy
+
+from old_parsers import REPO
+sys.path.insert(0, REPO)
+import procutil
+import proc_codar_totals
+
+PLATFORM_INFO = {'lat' : (33.5, 38.), 'lon' : (-76, -73.), 'nlat' : 83., 'nlon' : 45.}
+
+def lluv(stamp, seed, drop=0):
+    """ lines of LLUV TOT4 file of totals in a footprint off Cape Hatteras"""
+    r = numpy.random.RandomState(seed)
+    (lo, la) = numpy.meshgrid(numpy.arange(-75.9, -73.1, 0.066),
+                              numpy.arange(34.0, 37.5, 0.054))
+    (lo, la) = (lo.ravel(), la.ravel())
+    keep = ((lo+74.5)**2/1.2**2 + (la-35.8)**2/1.3**2) < 1
+    if drop:
+        keep &= r.rand(len(lo)) > drop
+    (lo, la) = (lo[keep], la[keep])
+    u = 30*numpy.sin(lo*3) + r.randn(len(lo))
+    v = 20*numpy.cos(la*4) + r.randn(len(lo))
+    lines = ['%CTF: 1.00\n', '%FileType: LLUV tots "CurrentMap"\n',
+             '%LLUVSpec: 1.17  2011 05 05\n', '%%TimeStamp: %s\n' % (stamp,),
+             '%TableType: LLUV TOT4\n', '%TableColumns: 14\n',
+             '%%TableRows: %d\n' % (len(lo),), '%TableStart:\n']
+    for k in range(len(lo)):
+        lines.append('%10.5f %10.5f %8.3f %8.3f 0 1.2 1.3 0.1 1.00 2.00 3.00 45.0 10.00 90.0\n' % \
+                     (lo[k], la[k], u[k], v[k]))
+    lines.append('%TableEnd:\n')
+    return lines
+
+def one_hour(platform_info, lines):
+    """ u, v (nlon, nlat) of one file on its own"""
+    (xi, yi) = proc_codar_totals.grid_axes(platform_info)
+    (xmesh, ymesh) = numpy.meshgrid(xi, yi)
+    end = [l for l in lines if not l.startswith('%') or l.startswith('%TableEnd')]
+    table = end[:end.index('%TableEnd:\n')]
+    if len(table) <= 2:
+        return (numpy.ones((len(xi), len(yi)))*numpy.nan,)*2
+    d = numpy.loadtxt(table)
+    procutil.griddata_cache.clear()
+    (ui, vi) = procutil.griddata(d[:,0], d[:,1], d[:,2:4].T, xmesh, ymesh)
+    return (ui.T, vi.T)
+
+def same(a, b):
+    return a.shape == b.shape and numpy.allclose(a, b, equal_nan=True)
+
+if __name__ == "__main__":
+    ndays = len(sys.argv)>1 and int(sys.argv[1]) or 30
+    pi = PLATFORM_INFO
+    si = {'utc_offset' : 0}
+    d = tempfile.mkdtemp()
+    try:
+        fns = []
+        for h in range(24*ndays):
+            stamp = '2013 11 %02d %02d 00 00' % (h//24+1, h % 24)
+            fns.append(os.path.join(d, 'TOTL_%04d.tuv' % (h,)))
+            open(fns[-1], 'w').writelines(lluv(stamp, h, drop=(h % 7 == 0) and 0.1 or 0))
+        nhours = len(fns)
+        odd = {
+            'second table' : lluv('2013 12 01 00 00 00', 5) + \
+                ['%TableType: LLUV RDL7\n', '%TableStart:\n', '1 2 3\n', '%TableEnd:\n'],
+            'bad stamp' : lluv('2013 02 30 00 00 00', 5),
+            'no rows' : lluv('2013 12 01 01 00 00', 6, drop=0.9999),
+            'empty file' : [],
+            }
+        for name in sorted(odd):
+            fns.append(os.path.join(d, name.replace(' ', '_') + '.tuv'))
+            open(fns[-1], 'w').writelines(odd[name])
+
+        procutil.griddata_cache.clear()
+        t0 = time.time()
+        data = proc_codar_totals.batch_parser(pi, si, fns)
+        t_batch = time.time() - t0
+
+        ok = True
+        t0 = time.time()
+        ref = [one_hour(pi, open(fn).readlines()) for fn in fns[:nhours]]
+        t_hours = time.time() - t0
+        good = len(data['time']) == nhours + 2 and \
+               all([same(data['u'][j], ref[j][0]) and same(data['v'][j], ref[j][1])
+                    for j in range(nhours)])
+        ok &= good
+        print '%-28s %s' % ('batch vs one hour at a time', good and 'ok' or 'DIFF')
+
+        good = True
+        for j in range(0, nhours, 11):
+            one = proc_codar_totals.parser(pi, si, open(fns[j]).readlines())
+            good &= one['time'][0] == data['time'][j] and \
+                    same(one['u'][0], data['u'][j]) and same(one['v'][0], data['v'][j])
+        ok &= good
+        print '%-28s %s' % ('batch vs parser', good and 'ok' or 'DIFF')
+
+        # odd files in sorted order: bad stamp and empty file dropped,
+        # then no rows and second table
+        one = proc_codar_totals.parser(pi, si, lluv('2013 12 01 00 00 00', 5))
+        good = numpy.array_equal(data['time'][nhours:], [1385859600, 1385856000]) and \
+               numpy.isnan(data['u'][nhours]).all() and \
+               same(data['u'][nhours+1], one['u'][0])
+        ok &= good
+        print '%-28s %s' % ('odd files', good and 'ok' or 'DIFF %s' % (data['time'][nhours:],))
+        print 'one hour at a time %.2f s, batch %.2f s' % (t_hours, t_batch)
+    finally:
+        shutil.rmtree(d)
+    print ok and 'all ok' or 'FAILED'
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""check_cr1000_toa5
+
+Parse small TOA5 tables (the examples in the proc_cr1000_* docstrings,
+each also with a "NAN" cell) with the one-pass proc_cr1000_* parsers
+(raw2proc.read_toa5) and with the line-by-line parsers they replaced
+(see old_parsers.py) and check that every variable the old parser
+returned comes out the same, apart from the changes made on purpose:
+
+   1. no 'dt' (or 'gps_dt') object arrays
+   2. "NAN" reads as NaN, where comp, ctd, flow and wq left -99999
+   3. gps_active is 1 for a valid fix (was left unset)
+   4. gps_mvar is east for "E" (the old test read the line end with it,
+      so every variation came out west)
+
+Lines with another number of fields than the header are skipped by
+read_toa5(), so each table here has as many as its header.
+
+Usage:
+
+   python check_cr1000_toa5.py
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import numpy
+
+from old_parsers import old_module
+
+HEADER = '"TOA5","CR1000_B1","CR1000","37541","CR1000.Std.21","CPU:Buoy.CR1","58723","%s"\n'
+
+# module : (table name, sensor_info, column names, rows)
+TABLES = {
+    'proc_cr1000_comp' : ('Comp_6Min', {},
+        ('Heading_Avg','Heading_Std','PITCH_Avg','PITCH_Std','PITCH_Max',
+         'ROLL_Avg','ROLL_Std','ROLL_Max'),
+        ('"2014-02-01 00:00:59",593,14.37,0.242,1.01,0.03,1.1,0.227,0.051,0.4',
+         '"2014-02-01 00:06:59",594,14.32,0.258,1.01,0.03,1.1,0.227,0.044,0.3',
+         '"2014-02-01 00:12:59",595,14.22,0.088,1.017,0.037,1.1,0.217,0.037,0.3',
+         '"2014-02-01 00:24:59",596,14.24,0.095,1,0.018,1.1,0.232,0.047,0.3')),
+    'proc_cr1000_ctd_v1' : ('CTD1_6Min', {},
+        ('ID','Temp','Cond','Depth'),
+        ('"2011-10-05 21:08:06",43,4085,24.5027,5.18209,3.347',
+         '"2011-10-05 21:14:06",44,4085,24.5078,5.18305,3.454',
+         '"2011-10-05 21:56:07",45,4085,24.5247,5.19257,3.423',
+         '"2011-10-05 22:02:06",46,4085,24.5105,5.18714,3.526')),
+    'proc_cr1000_ctd_v2' : ('CTD1_6Min', {},
+        ('ID','Temp','Cond','Depth','SampleDate','SampleTime','SampleNum'),
+        ('"2011-12-01 00:02:09",4449,3585,16.1596,4.15704,3.413," 30 Nov 2011"," 23:58:44","   4406 "',
+         '"2011-12-01 00:08:09",4450,3585,16.1783,4.15878,3.745," 01 Dec 2011"," 00:04:44","   4407 "',
+         '"2011-12-01 00:14:09",4451,3585,16.1638,4.15794,3.545," 01 Dec 2011"," 00:10:44","   4408 "',
+         '"2011-12-01 00:20:09",4452,3585,16.1632,4.15769,3.254," 01 Dec 2011"," 00:16:44","   4409 "')),
+    'proc_cr1000_flow' : ('Data15Min', {'press_offset' : 1.5},
+        ('RainIn_Tot','SontekWL','SontekFlow','WaterLevelFt','Flow'),
+        ('"2009-01-22 15:30:00",0,0,0,0,2.31,1.2',
+         '"2009-01-22 15:45:00",1,0,0,0,2.35,1.4',
+         '"2009-01-22 16:00:00",2,0.01,0,0,2.42,1.9',
+         '"2009-01-22 16:15:00",3,0,0,0,2.40,1.8')),
+    'proc_cr1000_gps' : ('GPS_1Hr', {},
+        ['GPSParseStr(%d)' % (k,) for k in range(1, 13)],
+        ('"2014-02-01 00:52:01",77,"$GPRMC","005155","A","3443.3939","N","07645.1690","W","000.0","000.0","010214","010.0","W"',
+         '"2014-02-01 01:52:01",78,"$GPRMC","015155","A","3443.3926","N","07645.1688","W","000.0","000.0","010214","010.0","W"',
+         '"2014-02-01 02:52:01",79,"$GPRMC","025155","A","3443.3927","N","07645.1686","W","000.2","000.0","010214","010.0","E"',
+         '"2014-02-01 03:52:01",80,"$GPRMC","035155","A","3443.3931","N","07645.1685","W","000.0","000.0","010214","010.0","W"')),
+    'proc_cr1000_met' : ('AMet_6Min', {},
+        ('Baro_mbar_Avg','RHumidity_Avg','RHumidity_Std','AirTempC_Avg',
+         'AirTempC_Std','Rain','Psp_Avg','Psp_Std','Pir_Wm2_Avg','Pir_Wm2_Std'),
+        ('"2012-11-01 00:00:59",4590,1014.3792,75.59,0.579,15.67,0.05,22.35,1197.037,45.58967,371.5126,0.9030571',
+         '"2012-11-01 00:06:59",4591,1014.37995,74.96,0.912,16.61,0.048,21,1071.813,129.5147,381.2539,0.2076943',
+         '"2012-11-01 00:12:59",4592,1014.3792,72.71,2.677,17.29,0.032,15.58,2056.658,0,381.1828,0.1402813',
+         '"2012-11-01 00:18:59",4593,1014.3791,72.63,0.928,17.67,0.041,19.64,1895.86,9.866026,381.0333,0.2442325')),
+    'proc_cr1000_sys' : ('Sys_1Hr', {},
+        ('P_Batt_Min','P_Batt_TMn','P_Batt_Max','P_Batt_TMx','P_Temp_Avg','P_RH_Avg'),
+        ('"2014-02-01 00:00:00",75,13,"2014-01-31 23:50:00",13.22,"2014-01-31 23:01:00",12.82,7.771',
+         '"2014-02-01 01:00:00",76,13.05,"2014-02-01 00:56:00",13.09,"2014-02-01 00:29:00",10.15,8.22',
+         '"2014-02-01 02:00:00",77,13.03,"2014-02-01 01:44:00",13.07,"2014-02-01 01:05:00",7.792,8.64',
+         '"2014-02-01 03:00:00",78,12.95,"2014-02-01 02:01:00",13.04,"2014-02-01 02:04:00",6.323,9.01')),
+    'proc_cr1000_wind' : ('AWind_6Min', {},
+        ('W1_SpeedAvg','W1_DirAvg','W1_SpeedMax','W1_SpeedStd',
+         'W2_SpeedAvg','W2_DirAvg','W2_SpeedMax','W2_SpeedStd'),
+        ('"2011-12-01 00:01:59",6507,8.32,319.1,10.09,0.781,8.15,310.9,10.09,0.832',
+         '"2011-12-01 00:07:59",6508,9.43,323.3,11.27,1.094,9.11,315.8,10.68,1.015',
+         '"2011-12-01 00:13:59",6509,9.94,308.6,12.35,1.077,9.74,301.3,11.96,1.027',
+         '"2011-12-01 00:19:59",6510,8.86,304.5,10.98,1.003,8.8,296.4,11.27,1.066')),
+    'proc_cr1000_wq' : ('DataHourly', {},
+        ('SondeTempC','SpCond','DOSat','DOmg','pH','Turb','BattVolt_Min'),
+        ('"2009-06-01 00:00:00",3066,20.54,0.551,7.17,10.3,30.5,0,12.88',
+         '"2009-06-01 01:00:00",3067,20.38,0.551,7.16,9.7,29.7,0,12.86',
+         '"2009-06-01 02:00:00",3068,20.18,0.55,7.15,9.2,30.1,0,12.84',
+         '"2009-06-01 03:00:00",3069,19.99,0.549,7.16,9.5,27.6,0,12.83')),
+    }
+
+# cell made "NAN" in the second row (0 is TIMESTAMP, 1 RECORD)
+NAN_CELL = {'proc_cr1000_gps' : None, 'proc_cr1000_sys' : 2}
+
+SKIP = ('dt', 'gps_dt')
+NAN_WAS_FILL = ('proc_cr1000_comp', 'proc_cr1000_ctd_v1', 'proc_cr1000_ctd_v2',
+                'proc_cr1000_flow', 'proc_cr1000_wq')
+
+def toa5(table, names, rows):
+    """ lines of a TOA5 file"""
+    cols = ['"TIMESTAMP"', '"RECORD"'] + ['"%s"' % (n,) for n in names]
+    return [HEADER % (table,),
+            ','.join(cols) + '\n',
+            ','.join(['"TS"', '"RN"'] + ['""']*len(names)) + '\n',
+            ','.join(['""']*len(cols)) + '\n'] + \
+           [row + '\n' for row in rows]
+
+def with_nan(rows, cell):
+    """ rows with cell of the second row made "NAN" """
+    sw = rows[1].split(',')
+    sw[cell] = '"NAN"'
+    return (rows[0], ','.join(sw)) + tuple(rows[2:])
+
+def compare(mod_name, new, old):
+    """ names of variables that differ"""
+    bad = []
+    for name in sorted(old):
+        if name in SKIP:
+            if name in new:
+                bad.append(name + ' (still returned)')
+            continue
+        a = numpy.asarray(new.get(name))
+        b = numpy.asarray(old[name])
+        if name == 'gps_active':
+            good = a.shape == b.shape and (a==1).all()
+        elif name == 'gps_mvar':
+            good = numpy.array_equal(numpy.abs(a), -b) and (a>0).any()
+        elif b.dtype.kind == 'f':
+            if mod_name in NAN_WAS_FILL:
+                b = numpy.where(b==-99999, numpy.nan, b)
+            good = a.shape == b.shape and numpy.allclose(a, b, equal_nan=True)
+        else:
+            good = numpy.array_equal(a, b)
+        if not good:
+            bad.append(name)
+    return bad
+
+if __name__ == "__main__":
+    ok = True
+    for mod_name in sorted(TABLES):
+        (table, si, names, rows) = TABLES[mod_name]
+        si = dict(si, fn='/seacoos/data/b1/cr1000/B1_%s_2014_02_01.dat' % (table,),
+                  utc_offset=0)
+        pi = {'id' : 'b1', 'lat' : 34.7, 'mvar' : -10.}
+        new_mod = __import__(mod_name)
+        old_mod = old_module(mod_name)
+        cases = [('', rows)]
+        cell = NAN_CELL.get(mod_name, 3)
+        if cell:
+            cases.append((' NAN', with_nan(rows, cell)))
+        for (label, case) in cases:
+            lines = toa5(table, names, case)
+            new = new_mod.parser(pi, si, lines)
+            old = old_mod.parser(pi, si, lines)
+            bad = compare(mod_name, new, old)
+            ok &= not bad
+            print '%-22s %s' % (mod_name+label, bad and 'DIFF %s' % (bad,) or 'ok')
+    print ok and 'all ok' or 'FAILED'
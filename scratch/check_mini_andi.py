@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""check_mini_andi
+
+Parse mini_andi_sample.xml (three Devices of a Spongenet platform with
+a pressure and an optode sensor; the second Device has no pressure
+Temperature point and the third has stamps with / separators) with the
+proc_mini_andi_* parsers and check that
+
+   1. the pressure record comes out as written in the sample
+   2. a stamp cut short is -1 and does not shift the other records
+   3. every variable equals what the parsers read before read_andi()
+      (per Device from spongenet.parse.Data, only if spongenet is
+      installed)
+
+Usage:
+
+   python check_mini_andi.py [sample.xml]
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import os
+import datetime
+import numpy
+
+import procutil
+import proc_mini_andi_pressure
+import proc_mini_andi_optode
+from largo_mini_andi_config_20100401 import sensor_info
+
+# pressure record in sample
+EXPECTED = {
+    'time' : [1270080000, 1270081800, 1270083600],
+    'ptime' : [1270080005, 1270081805, 1270083605],
+    'session' : [1270000000]*3,
+    'psession' : [1270000100]*3,
+    'record' : [0, 1, 2],
+    'status' : [0, 0, 0],
+    'pstatus' : [0, 1, 2],
+    'pressure' : [0.0763, 0.3809, 0.9091],
+    'temperature' : [0.7799, numpy.nan, 0.1332],
+    }
+
+def stamp_es(s, utc_offset):
+    """ epoch seconds of stamp by digits at fixed offsets, as before"""
+    dt = datetime.datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                           int(s[11:13]), int(s[14:16]), int(s[17:19]))
+    return procutil.dt2es(dt + datetime.timedelta(hours=utc_offset))
+
+def old_parser(si, points, lines):
+    """ each Device read as the parsers did before read_andi()"""
+    from spongenet.parse import Data
+    devices = Data(''.join(lines)).devices
+    n = len(devices)
+    data = {}
+    for name in ('time', 'ptime', 'session', 'psession'):
+        data[name] = numpy.array(numpy.ones((n,))*numpy.nan, dtype=long)
+    for name in ('record', 'status', 'pstatus'):
+        data[name] = numpy.array(numpy.ones((n,))*numpy.nan, dtype=int)
+    for (name, dtype) in points:
+        data[name] = numpy.array(numpy.ones((n,))*numpy.nan, dtype=dtype)
+    for (i, sample) in enumerate(devices):
+        data['time'][i] = stamp_es(sample['time'], si['utc_offset'])
+        data['ptime'][i] = stamp_es(sample['data_time'], si['utc_offset'])
+        data['session'][i] = stamp_es(sample['sessionid'][9:], si['utc_offset'])
+        data['psession'][i] = stamp_es(sample['data_sessionid'], si['utc_offset'])
+        try:
+            data['record'][i] = int(sample['recordnumber'])
+        except KeyError:
+            pass
+        try:
+            data['status'][i] = int(sample['status'].partition(':')[0])
+        except (KeyError, AttributeError):
+            pass
+        try:
+            data['pstatus'][i] = int(sample.sensors[si['id_number']]['status'].partition(':')[0])
+        except (KeyError, AttributeError):
+            pass
+        for (name, dtype) in points:
+            try:
+                data[name][i] = float(sample.sensors[si['id_number']].
+                                      points[si[name+'_description']]['value'])
+            except (KeyError, AttributeError):
+                pass
+    return data
+
+def same(a, b):
+    a = numpy.asarray(a); b = numpy.asarray(b)
+    if a.dtype.kind == 'f' or b.dtype.kind == 'f':
+        return a.shape == b.shape and numpy.allclose(a, b, equal_nan=True)
+    return numpy.array_equal(a, b)
+
+if __name__ == "__main__":
+    fn = len(sys.argv)>1 and sys.argv[1] or \
+         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mini_andi_sample.xml')
+    lines = open(fn).readlines()
+    ok = True
+
+    si = dict(sensor_info['pressure'], utc_offset=0)
+    data = proc_mini_andi_pressure.parser({}, si, lines)
+    for name in sorted(EXPECTED):
+        good = same(data[name], EXPECTED[name])
+        ok &= good
+        print '%-12s %s' % (name, good and 'ok' or 'DIFF %s' % data[name])
+
+    # first platform Time cut short
+    text = ''.join(lines).replace('<Time>2010-04-01T00:00:00</Time>',
+                                  '<Time>2010-04-01</Time>', 1)
+    cut = proc_mini_andi_pressure.parser({}, si, [text])
+    good = same(cut['time'], [-1]+EXPECTED['time'][1:]) and \
+           same(cut['pressure'], EXPECTED['pressure'])
+    ok &= good
+    print '%-12s %s' % ('cut stamp', good and 'ok' or 'DIFF %s' % cut['time'])
+
+    try:
+        import spongenet.parse
+    except ImportError:
+        print 'spongenet not installed, not compared with parsers before read_andi()'
+    else:
+        for (mod, name) in ((proc_mini_andi_pressure, 'pressure'),
+                            (proc_mini_andi_optode, 'optode_127')):
+            si = dict(sensor_info[name], utc_offset=5)
+            new = mod.parser({}, si, lines)
+            old = old_parser(si, mod.POINTS, lines)
+            for k in sorted(old):
+                good = same(new[k], old[k])
+                ok &= good
+                if not good:
+                    print '%s %s DIFF %s %s' % (mod.__name__, k, new[k], old[k])
+            print '%-12s %s' % (mod.__name__, 'compared')
+    print ok and 'all ok' or 'FAILED'
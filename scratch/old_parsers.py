@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""old_parsers
+
+Load a processor module as it was at an earlier commit of this
+repository (by default the first one), so the check_*.py scripts can
+compare a parser with the one it replaced.  Needs git and the
+repository history.
+
+Example
+-------
+>>> old = old_module('proc_cr1000_met')
+>>> data = old.parser(platform_info, sensor_info, lines)
+
+"""
+
+import sys
+sys.path.append('/opt/env/haines/dataproc/raw2proc')
+import os
+import imp
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def git(*args):
+    p = subprocess.Popen(('git',) + args, cwd=REPO,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (out, err) = p.communicate()
+    if p.returncode:
+        raise RuntimeError('git %s: %s' % (' '.join(args), err.strip()))
+    return out
+
+def first_commit():
+    """ first commit of the repository"""
+    return git('rev-list', '--max-parents=0', 'HEAD').split()[-1]
+
+def old_module(mod_name, rev=None, fixes=()):
+    """Module mod_name as of commit rev (default first_commit())
+
+    fixes is a sequence of (old, new) strings replaced in the source
+    before it is run, for old code that no longer runs as is.
+    """
+    if rev is None:
+        rev = first_commit()
+    src = git('show', '%s:%s.py' % (rev, mod_name))
+    for (old, new) in fixes:
+        src = src.replace(old, new)
+    mod = imp.new_module(mod_name + '_old')
+    mod.__file__ = '%s:%s.py' % (rev[:7], mod_name)
+    exec compile(src, mod.__file__, 'exec') in mod.__dict__
+    return mod
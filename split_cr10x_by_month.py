@@ -172,7 +172,8 @@ def load_data(inFile):
 from raw2proc import *
 
 def test1(fn):
-    lines = load_data(fn)
+    # mapped, not read, so loggernet dumps larger than memory can be split
+    lines = load_mmap(fn)
     return parse_csi_loggernet(fn, lines)
 
 def spin():
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Wave Statistics from Directional Spectra
+
+Bulk wave parameters of a stack of directional spectra Sxx(time, freq,
+dir), all bursts in one call, as used by the RDI Dspec and Nortek wds
+processors.  Adapted from polar_waves_cur_rdi.m (Version 8 - February
+14, 2005) by George Voulgaris, with peak period and peak direction
+added by SH.
+
+Band limits can be set in sensor_info of config files (see
+wave_bands()):
+
+    fswell : highest swell freq (Hz), default 1/10. (T>10s)
+    fupper : highest wave freq (Hz), default 0.65 (T>~1.538s)
+
+"""
+
+import numpy
+
+# default upper freq of swell band and of all waves (Hz)
+FSWELL = 1/10.
+FUPPER = 0.65
+
+def wave_bands(sensor_info):
+    """ (fswell, fupper) band limits of sensor, defaults if not in config"""
+    return (sensor_info.get('fswell', FSWELL), sensor_info.get('fupper', FUPPER))
+
+def wave_stats(f, D, Sxx, Df, Dtheta, fswell=FSWELL, fupper=FUPPER):
+    """ Wave statistics of all, swell and wind bands for every burst
+
+      :Parameters:
+       f : numpy.array (nfreq,)
+         Frequencies (Hz), lowest first
+       D : numpy.array (ndir,)
+         Directions (deg from N)
+       Sxx : numpy.array (ntime, nfreq, ndir)
+         Directional spectra (m^2/Hz/deg)
+       Df, Dtheta : float
+         Frequency (Hz) and direction (deg) step
+
+      :Other Parameters:
+       fswell : float
+         Highest freq of swell band (Hz), wind band is above it
+       fupper : float
+         Highest freq of all waves (Hz)
+
+      :Returns:
+       stats : dict of numpy.array
+         Sf (ntime, nfreq), Stheta (ntime, ndir), Hs, Tm, Tp, Dm
+         and Dp (ntime,), all but Sf also with _swell and _wind band.
+         Tp and Dp are NaN for a burst missing any spectra in band.
+    """
+    iswell = f<=fswell                 # swell band
+    iwind = (f>fswell) & (f<=fupper)   # wind band
+    iall = f<=fupper                   # all wave freq upper limit
+
+    # compute non-directional spectrum by integrating over all angles
+    # Sxx(time, freq, dir)  sum axis=2 is along direction
+    Sf = Sxx.sum(axis=2)*Dtheta
+    stats = {'Sf' : Sf}
+
+    # mean direction of wave approach used by Kuik et al (1989)
+    ac1 = numpy.cos(D*numpy.pi/180)
+    as1 = numpy.sin(D*numpy.pi/180)
+    bursts = numpy.arange(len(Sxx))
+
+    for (mask, sfx) in ((iall, ''), (iswell, '_swell'), (iwind, '_wind')):
+        # freq are in order so band is a slice (a view, not a copy of Sxx)
+        ib = numpy.flatnonzero(mask)
+        if not len(ib):
+            # no freq of sensor in band
+            nan = numpy.ones((len(Sxx),), dtype=float)*numpy.nan
+            stats['Stheta'+sfx] = numpy.zeros((len(Sxx), len(D)), dtype=float)
+            for k in ('Hs', 'Tm', 'Tp', 'Dm', 'Dp'):
+                stats[k+sfx] = nan.copy()
+            continue
+        band = slice(ib[0], ib[-1]+1)
+        Sfb = Sf[:,band]
+
+        # Energy from band freq from each direction
+        # Sxx(time, freq, dir)  axis=1 is along freq
+        Stheta = Sxx[:,band].sum(axis=1)*Df
+
+        # zeroth- and first-moment from the non-directional spectrum
+        m0 = Sfb.sum(axis=1)*Df
+        m1 = (f[band]*Sfb).sum(axis=1)*Df
+
+        # Significant Wave Height (Hs) and Mean Wave Period (Tm)
+        Hs = 4*numpy.sqrt(m0)
+        Tm = m0/m1
+
+        # Peak Wave Period (Tp) at first max of Sf in band
+        # (offset by freq below band, e.g. wind above swell)
+        ipeak = ib[0] + Sfb.argmax(axis=1)
+        Tp = 1/f[ipeak]
+
+        # Mean Wave Direction (Dm)
+        ch0 = (ac1*Stheta*Dtheta).sum(axis=1)
+        sh0 = (as1*Stheta*Dtheta).sum(axis=1)
+        Dm = numpy.arctan2(sh0,ch0)*180/numpy.pi
+        Dm[Dm<0] = Dm[Dm<0]+360.
+
+        # Peak Wave Direction (Dp) defined as the direction which
+        # corresponds to the "Peak frequency", or Fp.  Peak frequency is the
+        # frequency at which the "Spectral density function" is at a
+        # maximum.  The spectral density function gives the dependence
+        # with frequency of the energy of the waves considered.  also
+        # known as the one-dimensional spectrum or energy spectrum.
+        # Definitions from Metocean Glossary
+        # http://www.ifremer.fr/web-com/glossary
+        Dp = D[Sxx[bursts,ipeak].argmax(axis=1)].astype(float)
+
+        # no peak if any spectra in band missing
+        bad = numpy.isnan(Sfb).any(axis=1)
+        Tp[bad] = numpy.nan
+        Dp[bad] = numpy.nan
+
+        stats['Stheta'+sfx] = Stheta
+        stats['Hs'+sfx] = Hs
+        stats['Tm'+sfx] = Tm
+        stats['Tp'+sfx] = Tp
+        stats['Dm'+sfx] = Dm
+        stats['Dp'+sfx] = Dp
+    return stats